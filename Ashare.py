@@ -1,5 +1,15 @@
 #-*- coding:utf-8 -*-    --------------Ashare 股票行情数据双核心版( https://github.com/mpquant/Ashare ) 
-import json,requests,datetime;      import pandas as pd  #
+import json,requests,datetime;      import numpy as np;      import pandas as pd  #
+from concurrent.futures import ThreadPoolExecutor
+
+TRANSPORT=None                                                            #可插拔传输层(录制/回放见transport.py)，None时直连
+def http_get(URL):                                                        #所有数据源请求统一入口，返回原始响应字节
+    return TRANSPORT.get(URL) if TRANSPORT is not None else requests.get(URL).content
+
+def set_transport(transport=None):  global TRANSPORT;  TRANSPORT=transport    #传None恢复直连
+
+CALENDAR=None                                                             #交易日历(见trade_calendar.py)，设置后日线按交易日数精确确定请求条数
+def set_calendar(calendar=None):  global CALENDAR;  CALENDAR=calendar       #传None恢复按自然日估算
 
 #腾讯日线
 def get_price_day_tx(code, end_date='', count=10, frequency='1d'):     #日线获取  
@@ -7,7 +17,7 @@ def get_price_day_tx(code, end_date='', count=10, frequency='1d'):     #日线
     if end_date:  end_date=end_date.strftime('%Y-%m-%d') if isinstance(end_date,datetime.date) else end_date.split(' ')[0]
     end_date='' if end_date==datetime.datetime.now().strftime('%Y-%m-%d') else end_date   #如果日期今天就变成空    
     URL=f'http://web.ifzq.gtimg.cn/appstock/app/fqkline/get?param={code},{unit},,{end_date},{count},qfq'     
-    st= json.loads(requests.get(URL).content);    ms='qfq'+unit;      stk=st['data'][code]   
+    st= json.loads(http_get(URL));    ms='qfq'+unit;      stk=st['data'][code]   
     buf=stk[ms] if ms in stk else stk[unit]       #指数返回不是qfqday,是day
     df=pd.DataFrame(buf,columns=['time','open','close','high','low','volume'],dtype='float')     
     df.time=pd.to_datetime(df.time);    df.set_index(['time'], inplace=True);   df.index.name=''          #处理索引 
@@ -18,7 +28,7 @@ def get_price_min_tx(code, end_date=None, count=10, frequency='1d'):    #分钟
     ts=int(frequency[:-1]) if frequency[:-1].isdigit() else 1           #解析K线周期数
     if end_date: end_date=end_date.strftime('%Y-%m-%d') if isinstance(end_date,datetime.date) else end_date.split(' ')[0]        
     URL=f'http://ifzq.gtimg.cn/appstock/app/kline/mkline?param={code},m{ts},,{count}' 
-    st= json.loads(requests.get(URL).content);       buf=st['data'][code]['m'+str(ts)] 
+    st= json.loads(http_get(URL));       buf=st['data'][code]['m'+str(ts)] 
     df=pd.DataFrame(buf,columns=['time','open','close','high','low','volume','n1','n2'])   
     df=df[['time','open','close','high','low','volume']]    
     df[['open','close','high','low','volume']]=df[['open','close','high','low','volume']].astype('float')
@@ -34,10 +44,11 @@ def get_price_sina(code, end_date='', count=10, frequency='60m'):    #新浪全
     if (end_date!='') & (frequency in ['240m','1200m','7200m']): 
         end_date=pd.to_datetime(end_date) if not isinstance(end_date,datetime.date) else end_date    #转换成datetime
         unit=4 if frequency=='1200m' else 29 if frequency=='7200m' else 1    #4,29多几个数据不影响速度
-        count=count+(datetime.datetime.now()-end_date).days//unit            #结束时间到今天有多少天自然日(肯定 >交易日)        
+        if CALENDAR is not None and frequency=='240m': count=count+CALENDAR.sessions_between(end_date,datetime.datetime.now())   #结束时间到今天的交易日数(未知部分按工作日估算)
+        else: count=count+(datetime.datetime.now()-end_date).days//unit            #结束时间到今天有多少天自然日(肯定 >交易日)        
         #print(code,end_date,count)    
     URL=f'http://money.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_MarketData.getKLineData?symbol={code}&scale={ts}&ma=5&datalen={count}' 
-    dstr= json.loads(requests.get(URL).content);       
+    dstr= json.loads(http_get(URL));       
     #df=pd.DataFrame(dstr,columns=['day','open','high','low','close','volume'],dtype='float') 
     df= pd.DataFrame(dstr,columns=['day','open','high','low','close','volume'])
     df['open'] = df['open'].astype(float); df['high'] = df['high'].astype(float);                          #转换数据类型
@@ -58,12 +69,110 @@ def get_price(code, end_date='',count=10, frequency='1d', fields=[]):        #
          if frequency in '1m': return get_price_min_tx(xcode,end_date=end_date,count=count,frequency=frequency)
          try:    return get_price_sina(  xcode,end_date=end_date,count=count,frequency=frequency)   #主力   
          except: return get_price_min_tx(xcode,end_date=end_date,count=count,frequency=frequency)   #备用
-        
-if __name__ == '__main__':    
+
+#腾讯实时行情快照，qt接口一次请求可带多个代码，按URL长度分批并发获取
+QT_URL='http://qt.gtimg.cn/q='
+QT_MAX_URL=1900                                                           #qt接口URL长度上限(留余量)
+QT_FIELDS={'name':1,'price':3,'pre_close':4,'open':5,'volume':6,'time':30,'change':31,'pct_chg':32,'high':33,'low':34,'amount':37}   #~分隔字段位置
+
+def _quote_chunks(codes, max_len=QT_MAX_URL):                              #按URL长度切分代码列表
+    chunks=[]; buf=[]; size=len(QT_URL)
+    for c in codes:
+        if buf and size+len(c)+1>max_len:  chunks.append(buf); buf=[]; size=len(QT_URL)
+        buf.append(c); size+=len(c)+1
+    if buf: chunks.append(buf)
+    return chunks
+
+def _get_quotes_tx(codes):                                                #单批次请求，返回原始字段行
+    text=http_get(QT_URL+','.join(codes)).decode('gbk',errors='ignore')
+    rows=[]
+    for line in text.split(';'):
+        if '="' not in line: continue
+        key,val=line.strip().split('="',1);   f=val.rstrip('"').split('~')
+        if len(f)>max(QT_FIELDS.values()): rows.append([key[2:]]+f)        #v_sh600000 -> sh600000，停牌/无效代码字段不全直接丢弃
+    return rows
+
+def get_quotes(codes, max_workers=8):                                     #批量实时行情，返回以代码为索引的一张列式表
+    xcodes=[c.replace('.XSHG','').replace('.XSHE','') for c in codes]
+    xcodes=['sh'+x if 'XSHG' in c else 'sz'+x if 'XSHE' in c else c for x,c in zip(xcodes,codes)]
+    chunks=_quote_chunks(list(dict.fromkeys(xcodes)))                     #去重后分批
+    if len(chunks)<=1: rows=_get_quotes_tx(chunks[0]) if chunks else []
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers,len(chunks))) as ex:  rows=[r for rs in ex.map(_get_quotes_tx,chunks) for r in rs]
+    cols=['code']+list(QT_FIELDS)
+    if not rows: return pd.DataFrame(columns=cols[1:],index=pd.Index([],name='code'))
+    df=pd.DataFrame([[r[0]]+[r[i+1] for i in QT_FIELDS.values()] for r in rows],columns=cols).set_index('code')
+    num=[c for c in QT_FIELDS if c not in ('name','time')]
+    df[num]=df[num].apply(pd.to_numeric,errors='coerce')
+    df['volume']=df['volume']*100;   df['amount']=df['amount']*10000      #手->股，万元->元，与K线接口单位保持一致
+    df['time']=pd.to_datetime(df['time'],format='%Y%m%d%H%M%S',errors='coerce')
+    return df
+
+#本地重采样：1m -> 5m/15m/30m/60m/1d，1d -> 1w/1M，按A股交易时段(9:30-11:30,13:00-15:00)切分，标签为K线结束时间
+MIN_FREQS={'1m':1,'5m':5,'15m':15,'30m':30,'60m':60,'1d':240}             #每根K线包含的交易分钟数，日线=240分钟
+MAX_1M_BARS=800                                                           #腾讯mkline 1m接口只提供最近几个交易日的数据(约800根)
+
+def _session_minute(idx):                                                 #K线结束时间 -> 当日第几个交易分钟(1..240)
+    m=np.asarray(idx.hour*60+idx.minute)                                  #9:30=570  11:30=690  13:00=780  15:00=900
+    return np.where(m<780, np.clip(m-570,1,120), np.clip(m-660,121,240)) #9:30集合竞价并入第一根，午休/盘后的零散数据并入相邻时段
+
+def _minute_label(L):                                                     #交易分钟序号 -> 当日分钟数(钟点)
+    return np.where(L<=120, 570+L, 660+L)
+
+def _ohlcv_reduce(df, key):                                               #按连续的分组键聚合OHLCV，数据须按时间升序
+    key=np.asarray(key);   starts=np.flatnonzero(np.r_[True, key[1:]!=key[:-1]]);   ends=np.r_[starts[1:],len(key)]-1
+    out={'open':df['open'].values[starts], 'close':df['close'].values[ends],
+         'high':np.maximum.reduceat(df['high'].values,starts), 'low':np.minimum.reduceat(df['low'].values,starts),
+         'volume':np.add.reduceat(df['volume'].values,starts)}
+    return pd.DataFrame({c:out[c] for c in df.columns if c in out}), starts, ends
+
+def resample(df, frequency='5m', count=None):                             #1m数据可合成5m~1d，日线数据可合成1w/1M
+    if df is None or df.empty: return df
+    idx=df.index;   days=idx.normalize().values.astype('datetime64[D]').astype('int64')   #自1970-01-01的天数
+    if frequency in ('1w','1M'):
+        if frequency=='1w': key=days-(days+3)%7                             #1970-01-01是周四，对齐到周一
+        else:               key=np.asarray(idx.year*12+idx.month)
+        out,starts,ends=_ohlcv_reduce(df,key);   out.index=idx[ends]            #周/月线标签为区间内最后一个交易日，与新浪接口一致
+    elif frequency in MIN_FREQS:
+        N=MIN_FREQS[frequency];   b=(_session_minute(idx)-1)//N             #当日第几根K线
+        out,starts,ends=_ohlcv_reduce(df,days*1000+b)
+        if N>=240: out.index=idx[ends].normalize()                           #日线标签为日期
+        else:      out.index=idx[ends].normalize()+pd.to_timedelta(_minute_label(np.minimum((b[ends]+1)*N,240)),unit='min')
+    else: raise ValueError(f'不支持的重采样周期: {frequency}')
+    out.index.name=''
+    return out[-count:] if count else out
+
+def get_price_multi(code, frequencies=('5m','15m','30m','60m','1d'), end_date='', count=10):   #多周期一次获取，本地合成
+    freqs=list(frequencies);   res={}
+    bad=[f for f in freqs if f not in MIN_FREQS and f not in ('1w','1M')]
+    if bad: raise ValueError(f'不支持的周期: {bad}')
+    mins=[f for f in freqs if f in MIN_FREQS and f!='1d'];   days=[f for f in freqs if f in ('1d','1w','1M')]
+    if mins:                                                              #1m能覆盖所需时间跨度的分钟周期由一次1m数据合成
+        local=[f for f in mins if count*MIN_FREQS[f]<=MAX_1M_BARS]
+        if local:
+            df=get_price(code,end_date=end_date,count=count*max(MIN_FREQS[f] for f in local),frequency='1m')
+            for f in local: res[f]=df[-count:] if f=='1m' else resample(df,f,count)
+        for f in mins:                                                    #跨度超出1m历史或合成结果不足count根的周期直接获取
+            if f not in res or (f!='1m' and len(res[f])<count): res[f]=get_price(code,end_date=end_date,count=count,frequency=f)
+        short=[f for f in mins if len(res[f])<count]
+        if short: print(f'警告: {code} {short} 只获取到 {[len(res[f]) for f in short]} 根K线，少于 {count} 根')
+    if days:                                                              #日/周/月由一次日线数据合成
+        n=count*(23 if '1M' in days else 5 if '1w' in days else 1)          #每月最多23个交易日，每周5个
+        df=get_price(code,end_date=end_date,count=n,frequency='1d')
+        for f in days: res[f]=df[-count:] if f=='1d' else resample(df,f,count)
+    return {f:res[f] for f in freqs}
+
+if __name__ == '__main__':
     df=get_price('sh000001',frequency='1d',count=10)      #支持'1d'日, '1w'周, '1M'月  
     print('上证指数日线行情\n',df)
     
     df=get_price('000001.XSHG',frequency='15m',count=10)  #支持'1m','5m','15m','30m','60m'
     print('上证指数分钟线\n',df)
 
-# Ashare 股票行情数据( https://github.com/mpquant/Ashare ) 
+    df=get_quotes(['sh000001','000001.XSHE','sh600000'])   #批量实时行情
+    print('实时行情快照\n',df)
+
+    dfs=get_price_multi('sh000001',frequencies=['5m','30m','60m'],count=10)   #一次1m请求本地合成多周期
+    print('上证指数60分钟线(由1m合成)\n',dfs['60m'])
+
+# Ashare 股票行情数据( https://github.com/mpquant/Ashare )
@@ -1,8 +1,11 @@
 # MyTT 麦语言-通达信-同花顺指标实现    https://github.com/mpquant/MyTT
 # V2.1 2021-6-6 新增 BARSLAST函数
 # V2.2 2021-6-8 新增 SLOPE,FORCAST线性回归，和回归预测函数
+# V2.3 0级核心函数改用 kernels.py 纯NumPy内核，统一ndarray进ndarray出(DIFF,SMA不再返回Series)
+# V2.4 新增 SLOPES,FORCASTS,BARSLASTS 全序列版本，滚动回归由分段锚定的累加和闭式求解 O(n)
   
 import numpy as np; import pandas as pd
+import kernels as _kn                   #滚动计算内核，按可用的加速包(bottleneck/numba)自动选择实现
 
 #------------------ 0级：核心工具函数 --------------------------------------------      
 def RD(N,D=3):   return np.round(N,D)        #四舍五入取3位小数 
@@ -12,46 +15,46 @@ def MAX(S1,S2):  return np.maximum(S1,S2)    #序列max
 def MIN(S1,S2):  return np.minimum(S1,S2)    #序列min
          
 def MA(S,N):           #求序列的N日平均值，返回序列                    
-    return pd.Series(S).rolling(N).mean().values
+    return _kn.ACTIVE['MA'](S,N)
 
 def REF(S, N=1):       #对序列整体下移动N,返回序列(shift后会产生NAN)    
-    return pd.Series(S).shift(N).values  
+    return _kn.ACTIVE['REF'](S,N)  
 
 def DIFF(S, N=1):      #前一个值减后一个值,前面会产生nan 
-    return pd.Series(S).diff(N)  #np.diff(S)直接删除nan，会少一行
+    return _kn.ACTIVE['DIFF'](S,N)  #np.diff(S)直接删除nan，会少一行
 
 def STD(S,N):           #求序列的N日标准差，返回序列    
-    return  pd.Series(S).rolling(N).std(ddof=0).values     
+    return  _kn.ACTIVE['STD'](S,N)     
 
 def IF(S_BOOL,S_TRUE,S_FALSE):          #序列布尔判断 res=S_TRUE if S_BOOL==True  else  S_FALSE
     return np.where(S_BOOL, S_TRUE, S_FALSE)
 
 def SUM(S, N):                          #对序列求N天累计和，返回序列         
-    return pd.Series(S).rolling(N).sum().values
+    return _kn.ACTIVE['SUM'](S,N)
 
 def HHV(S,N):                           # HHV(C, 5)  # 最近5天收盘最高价        
-    return pd.Series(S).rolling(N).max().values
+    return _kn.ACTIVE['HHV'](S,N)
 
 def LLV(S,N):                           # LLV(C, 5)  # 最近5天收盘最低价     
-    return pd.Series(S).rolling(N).min().values
+    return _kn.ACTIVE['LLV'](S,N)
 
 def EMA(S,N):         #指数移动平均,为了精度 S>4*N  EMA至少需要120周期       
-    return pd.Series(S).ewm(span=N, adjust=False).mean().values    
+    return _kn.ACTIVE['EMA'](S,N)    
 
 def SMA(S, N, M=1):   #中国式的SMA,至少需要120周期才精确         
-    K = pd.Series(S).rolling(N).mean()    #先求出平均值 (下面如果有不用循环的办法，能提高性能，望告知)
-    for i in range(N+1, len(S)):  K[i] = (M * S[i] + (N -M) * K[i-1]) / N  # 因为要取K[i-1]，所以 range(N+1, len(S))        
-    return K
+    return _kn.ACTIVE['SMA'](S,N,M)                 #先求N日平均值，从第N+1个开始递推，内核中分块闭式解向量化
 
 def AVEDEV(S,N):      #平均绝对偏差  (序列与其平均值的绝对差的平均值)   
-    avedev=pd.Series(S).rolling(N).apply(lambda x: (np.abs(x - x.mean())).mean())    
-    return avedev.values
+    return _kn.ACTIVE['AVEDEV'](S,N)
 
 def SLOPE(S,N,RS=False):               #返S序列N周期回线性回归斜率 (默认只返回斜率,不返回整个直线序列)
     M=pd.Series(S[-N:]);   poly = np.polyfit(M.index, M.values,deg=1);    Y=np.polyval(poly, M.index); 
     if RS: return Y[1]-Y[0],Y
     return Y[1]-Y[0]
 
+def SLOPES(S,N):                       #SLOPE的全序列版本: 每个周期的N周期线性回归斜率序列，O(n)
+    return _kn.rolling_slope(S,N)
+
   
 #------------------   1级：应用层函数(通过0级核心函数实现） ----------------------------------
 def COUNT(S_BOOL, N):                  # COUNT(CLOSE>O, N):  最近N天满足S_BOO的天数  True的天数
@@ -73,9 +76,15 @@ def BARSLAST(S_BOOL):                  #上一次条件成立到当前的周期
     M=np.argwhere(S_BOOL);             # BARSLAST(CLOSE/REF(CLOSE)>=1.1) 上一次涨停到今天的天数
     return len(S_BOOL)-int(M[-1])-1  if M.size>0 else -1
 
+def BARSLASTS(S_BOOL):                 #BARSLAST的全序列版本: 每个周期距上一次条件成立的周期数，从未成立为-1
+    return _kn.bars_last(S_BOOL)
+
 def FORCAST(S,N):                      #返S序列N周期回线性回归后的预测值
     K,Y=SLOPE(S,N,RS=True)
     return Y[-1]+K
+
+def FORCASTS(S,N):                     #FORCAST的全序列版本: 每个周期用最近N周期回归预测下一周期的值
+    return _kn.rolling_forecast(S,N)
   
 def CROSS(S1,S2):                      #判断穿越 CROSS(MA(C,5),MA(C,10))               
     CROSS_BOOL=IF(S1>S2, True ,False)   
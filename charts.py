@@ -0,0 +1,291 @@
+"""
+快速图表构建
+
+直接用字典和NumPy数组拼装与 plot_analysis 原先通过 go.Figure/add_trace/update_layout 生成的相同的图表JSON，
+不经过Plotly逐属性校验：
+- 数值序列按 Plotly 的类型化数组格式 {"dtype": "f8", "bdata": base64} 输出，与 go.Figure 序列化结果一致
+- plotly_white 模板JSON和加载plotly.js的脚本(含SRI哈希)只生成一次
+- 安装 orjson 时使用 orjson 序列化，否则使用标准库 json
+
+历史较长时(多年日线、分钟线)每张图表按点数预算降采样：最近 RECENT_BARS 根K线保持全分辨率，
+更早的部分分桶后每桶保留各条曲线最小值和最大值所在的点，峰谷不会被抹平，页面大小和浏览器渲染时间不随历史长度增长。
+同一图表的所有曲线使用同一组保留点，布林带填充(tonexty)、统一悬停和MACD/KDJ各线保持对齐。
+"""
+import base64
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 专业配色方案
+COLORS = {
+    'close': '#2E86AB',  # 深蓝色 - 收盘价
+    'ma5': '#A23B72',  # 玫瑰红 - MA5
+    'ma10': '#F18F01',  # 橙色 - MA10
+    'ma20': '#C73E1D',  # 深红色 - MA20
+    'boll': '#6C757D',  # 灰色 - 布林带
+    'macd_pos': '#28A745',  # 绿色 - MACD正值
+    'macd_neg': '#DC3545',  # 红色 - MACD负值
+    'dif': '#FF6B35',  # 橙红色 - DIF
+    'dea': '#7209B7',  # 紫色 - DEA
+    'k': '#0D6EFD',  # 蓝色 - K线
+    'd': '#FD7E14',  # 橙色 - D线
+    'j': '#198754',  # 绿色 - J线
+    'rsi': '#6F42C1',  # 深紫色 - RSI
+    'overbought': '#DC3545',  # 红色 - 超买线
+    'oversold': '#198754'  # 绿色 - 超卖线
+}
+
+GRID = {'showgrid': True, 'gridwidth': 1, 'gridcolor': 'rgba(128,128,128,0.2)'}
+LEGEND = {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'center', 'x': 0.5,
+          'bgcolor': 'rgba(255,255,255,0.9)', 'bordercolor': 'rgba(0,0,0,0.1)', 'borderwidth': 1}
+PRICE_HOVER = '<b>{name}</b><br>日期: %{{x}}<br>价格: ¥%{{y:.2f}}<extra></extra>'
+VALUE_HOVER = '<b>{name}</b><br>日期: %{{x}}<br>值: %{{y:{fmt}}}<extra></extra>'
+
+# 与 plotly.io.to_json 相同的转义，防止JSON中的字符串提前结束<script>
+_JSON_SWAP = (('<', '\\u003c'), ('>', '\\u003e'), ('/', '\\u002f'), ('\u2028', '\\u2028'), ('\u2029', '\\u2029'))
+
+# 每张图表(各曲线共用横轴)的点数上限，及保持全分辨率的最近K线数量
+POINT_BUDGET = 2000
+RECENT_BARS = 250
+
+_template_json: Optional[str] = None
+_plotlyjs_loader: Optional[str] = None
+
+
+def _dumps(obj: Any) -> str:
+    text = orjson.dumps(obj).decode('utf-8') if orjson is not None else \
+        json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    for unsafe, safe in _JSON_SWAP:
+        if unsafe in text:
+            text = text.replace(unsafe, safe)
+    return text
+
+
+def _typed(values) -> Dict[str, str]:
+    """数值序列转换为 plotly.js 类型化数组"""
+    arr = np.ascontiguousarray(values, dtype='<f8')
+    return {'dtype': 'f8', 'bdata': base64.b64encode(arr.tobytes()).decode('ascii')}
+
+
+def _dates(index: pd.Index) -> np.ndarray:
+    """日期索引转换为 plotly 序列化使用的ISO字符串"""
+    return np.datetime_as_string(pd.DatetimeIndex(index).values.astype('datetime64[s]'), unit='s')
+
+
+def downsample_indices(y, budget: Optional[int] = POINT_BUDGET, recent: int = RECENT_BARS) -> Optional[np.ndarray]:
+    """
+    保留极值的降采样
+
+    最近 recent 个点全部保留，其余点均分为若干桶，每桶保留各条序列最小值和最大值所在的位置。
+    传入多条序列时返回同一组下标(各序列极值位置的并集)，桶数按序列条数缩减，保留点数仍不超过预算。
+
+    Args:
+        y: 数值序列，或多条等长序列(二维，每行一条)
+        budget (int): 保留点数的上限，为空或序列不超过该长度时不降采样
+        recent (int): 保持全分辨率的最近点数，最多占预算的一半
+
+    Returns:
+        np.ndarray: 按顺序排列的保留点下标，无需降采样时为None
+    """
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    series, n = y.shape
+    if not budget or n <= budget:
+        return None
+    head = n - min(recent, budget // 2)
+    width = -(-head // max(1, (budget - (n - head)) // (2 * series)))
+    buckets = -(-head // width)
+    padded = np.full((series, buckets * width), np.nan)
+    padded[:, :head] = y[:, :head]
+    blocks = padded.reshape(series, buckets, width)
+    finite = np.isfinite(blocks).any(axis=2)
+    offsets = np.broadcast_to(np.arange(buckets) * width, finite.shape)[finite]
+    lows = np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=2)[finite] + offsets
+    highs = np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=2)[finite] + offsets
+    return np.unique(np.concatenate([lows, highs, np.arange(head, n)]))
+
+
+def template_json() -> str:
+    """plotly_white 模板的JSON，首次调用时生成"""
+    global _template_json
+    if _template_json is None:
+        import plotly.io as pio
+        _template_json = _dumps(pio.templates['plotly_white'].to_plotly_json())
+    return _template_json
+
+
+def plotlyjs_loader() -> str:
+    """从CDN加载plotly.js的脚本标签，与 to_html(include_plotlyjs='cdn') 输出相同"""
+    global _plotlyjs_loader
+    if _plotlyjs_loader is None:
+        import plotly.io as pio
+        html = pio.to_html({'data': [], 'layout': {}}, include_plotlyjs='cdn', full_html=False,
+                           validate=False, div_id='__plotly_loader__')
+        _plotlyjs_loader = html[len('<div>'):html.index('<div id="__plotly_loader__"')]
+    return _plotlyjs_loader
+
+
+def scatter(x: List[str], y, name: str, line: Dict[str, Any], hovertemplate: str, **extra) -> Dict[str, Any]:
+    return dict({'x': x, 'y': _typed(y), 'name': name, 'line': line, 'hovertemplate': hovertemplate,
+                 'type': 'scatter'}, **extra)
+
+
+def hline(y: float, line: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': 'line', 'line': line, 'x0': 0, 'x1': 1, 'xref': 'x domain', 'y0': y, 'y1': y, 'yref': 'y'}
+
+
+def hrect(y0: float, y1: float, fillcolor: str) -> Dict[str, Any]:
+    return {'type': 'rect', 'fillcolor': fillcolor, 'line': {'width': 0}, 'x0': 0, 'x1': 1, 'xref': 'x domain',
+            'y0': y0, 'y1': y1, 'yref': 'y'}
+
+
+def layout(title: str, height: int, yaxis: Dict[str, Any], **extra) -> Dict[str, Any]:
+    """各图表共用的布局，模板在序列化时拼入"""
+    return dict({
+        'title': {'text': title},
+        'height': height,
+        'showlegend': True,
+        'legend': LEGEND,
+        'hovermode': 'x unified',
+        'paper_bgcolor': '#FAFAFA',
+        'plot_bgcolor': 'white',
+        'xaxis': dict(GRID, tickformat='%Y-%m-%d'),
+        'yaxis': dict(GRID, **yaxis),
+    }, **extra)
+
+
+def figure_html(data: List[Dict[str, Any]], fig_layout: Dict[str, Any], filename: str,
+                include_plotlyjs: bool = False) -> str:
+    """
+    生成与 fig.to_html(full_html=False) 等效的HTML片段
+
+    Args:
+        data (List[Dict[str, Any]]): 轨迹
+        fig_layout (Dict[str, Any]): 布局(不含模板)
+        filename (str): 导出图片的文件名
+        include_plotlyjs (bool): 是否包含加载plotly.js的脚本，报告中第一个图表需要
+
+    Returns:
+        str: HTML片段
+    """
+    height = fig_layout['height']
+    config = {
+        'displayModeBar': True,
+        'displaylogo': False,
+        'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
+        'toImageButtonOptions': {'format': 'png', 'filename': filename, 'height': height, 'width': 1000, 'scale': 2},
+        'responsive': True,
+    }
+    div_id = str(uuid.uuid4())
+    layout_json = '{"template":' + template_json() + ',' + _dumps(fig_layout)[1:]
+    return (
+        '<div>' + (plotlyjs_loader() if include_plotlyjs else '')
+        + f'<div id="{div_id}" class="plotly-graph-div" style="height:{height}px; width:100%;"></div>'
+        + '<script type="text/javascript">window.PLOTLYENV=window.PLOTLYENV || {};'
+        + f'if (document.getElementById("{div_id}")) {{Plotly.newPlot("{div_id}",'
+        + f'{_dumps(data)},{layout_json},{_dumps(config)})}};</script></div>'
+    )
+
+
+def render_charts(df: pd.DataFrame, stock_name: str, code: str, budget: Optional[int] = POINT_BUDGET,
+                  recent: int = RECENT_BARS) -> str:
+    """
+    生成价格、MACD、KDJ、RSI四个独立图表的HTML
+
+    Args:
+        df (pd.DataFrame): calculate_indicators 的结果
+        stock_name (str): 股票名称
+        code (str): 股票代码
+        budget (int): 每张图表的点数上限(同一图表各曲线共用保留点)，为空时不降采样
+        recent (int): 保持全分辨率的最近K线数量
+
+    Returns:
+        str: 四个图表HTML片段拼接的结果
+    """
+    c = COLORS
+    dates = _dates(df.index)
+    charts = []
+
+    def sampler(columns):
+        """一张图表的取值函数：按该图表全部曲线的极值位置统一降采样，各曲线共用同一组日期"""
+        keep = downsample_indices(df[list(columns)].to_numpy(dtype=np.float64).T, budget, recent)
+        x = dates.tolist() if keep is None else dates[keep].tolist()
+
+        def xy(column):
+            values = df[column].to_numpy(dtype=np.float64)
+            return x, (values if keep is None else values[keep])
+        return xy
+
+    # 1. 价格走势与技术指标图
+    xy = sampler(('close', 'MA5', 'MA10', 'MA20', 'BOLL_UP', 'BOLL_LOW', 'BOLL_MID'))
+    price = [
+        scatter(*xy('close'), '收盘价', {'color': c['close'], 'width': 3}, PRICE_HOVER.format(name='收盘价')),
+        scatter(*xy('MA5'), 'MA5', {'color': c['ma5'], 'width': 2, 'dash': 'solid'}, PRICE_HOVER.format(name='MA5')),
+        scatter(*xy('MA10'), 'MA10', {'color': c['ma10'], 'width': 2, 'dash': 'solid'}, PRICE_HOVER.format(name='MA10')),
+        scatter(*xy('MA20'), 'MA20', {'color': c['ma20'], 'width': 2, 'dash': 'solid'}, PRICE_HOVER.format(name='MA20')),
+        scatter(*xy('BOLL_UP'), '布林上轨', {'color': c['boll'], 'width': 1, 'dash': 'dot'},
+                PRICE_HOVER.format(name='布林上轨')),
+        scatter(*xy('BOLL_LOW'), '布林下轨', {'color': c['boll'], 'width': 1, 'dash': 'dot'},
+                PRICE_HOVER.format(name='布林下轨'), fill='tonexty', fillcolor='rgba(108, 117, 125, 0.1)'),
+        scatter(*xy('BOLL_MID'), '布林中轨', {'color': c['boll'], 'width': 1, 'dash': 'dash'},
+                PRICE_HOVER.format(name='布林中轨')),
+    ]
+    current_price = float(df['close'].iloc[-1])
+    annotation = {
+        'x': str(dates[-1]), 'y': current_price, 'text': f"当前价格<br>¥{current_price:.2f}",
+        'showarrow': True, 'arrowhead': 2, 'arrowsize': 1, 'arrowwidth': 2, 'arrowcolor': '#2E86AB',
+        'bgcolor': 'rgba(46, 134, 171, 0.8)', 'bordercolor': '#2E86AB', 'borderwidth': 2,
+        'font': {'color': 'white', 'size': 10},
+    }
+    charts.append(figure_html(
+        price, layout(f'📈 {stock_name} ({code}) 价格走势与技术指标', 500,
+                      {'title': {'text': '价格 (¥)'}, 'tickformat': '.2f'}, annotations=[annotation]),
+        f'{stock_name}_{code}_price_analysis', include_plotlyjs=True))
+
+    # 2. MACD指标图
+    xy = sampler(('MACD', 'DIF', 'DEA'))
+    macd_x, macd = xy('MACD')
+    with np.errstate(invalid='ignore'):
+        macd_colors = np.where(macd >= 0, c['macd_pos'], c['macd_neg']).tolist()
+    macd_data = [
+        {'x': macd_x, 'y': _typed(macd), 'name': 'MACD柱', 'marker': {'color': macd_colors, 'line': {'width': 0}},
+         'opacity': 0.8, 'hovertemplate': VALUE_HOVER.format(name='MACD', fmt='.4f'), 'type': 'bar'},
+        scatter(*xy('DIF'), 'DIF快线', {'color': c['dif'], 'width': 2}, VALUE_HOVER.format(name='DIF', fmt='.4f')),
+        scatter(*xy('DEA'), 'DEA慢线', {'color': c['dea'], 'width': 2}, VALUE_HOVER.format(name='DEA', fmt='.4f')),
+    ]
+    charts.append(figure_html(
+        macd_data, layout(f'📊 {stock_name} ({code}) MACD指标', 400, {'title': {'text': 'MACD'}, 'tickformat': '.4f'}),
+        f'{stock_name}_{code}_macd_analysis'))
+
+    # 3. KDJ随机指标图
+    xy = sampler(('K', 'D', 'J'))
+    kdj = [
+        scatter(*xy(k), f'{k}值', {'color': c[k.lower()], 'width': 2.5}, VALUE_HOVER.format(name=f'{k}值', fmt='.2f'))
+        for k in ('K', 'D', 'J')
+    ]
+    charts.append(figure_html(
+        kdj, layout(f'📉 {stock_name} ({code}) KDJ随机指标', 400, {'title': {'text': 'KDJ (%)'}, 'tickformat': '.2f'},
+                    shapes=[hline(80, {'color': 'rgba(220, 53, 69, 0.5)', 'dash': 'dash', 'width': 1}),
+                            hline(20, {'color': 'rgba(25, 135, 84, 0.5)', 'dash': 'dash', 'width': 1})]),
+        f'{stock_name}_{code}_kdj_analysis'))
+
+    # 4. RSI相对强弱指标图
+    xy = sampler(('RSI',))
+    rsi = [scatter(*xy('RSI'), 'RSI', {'color': c['rsi'], 'width': 3}, VALUE_HOVER.format(name='RSI', fmt='.2f'))]
+    charts.append(figure_html(
+        rsi, layout(f'📋 {stock_name} ({code}) RSI相对强弱指标', 400,
+                    {'title': {'text': 'RSI'}, 'tickformat': '.2f', 'range': [0, 100]},
+                    shapes=[hline(70, {'color': c['overbought'], 'dash': 'dash', 'width': 2}),
+                            hline(30, {'color': c['oversold'], 'dash': 'dash', 'width': 2}),
+                            hrect(70, 100, 'rgba(220, 53, 69, 0.1)'),
+                            hrect(0, 30, 'rgba(25, 135, 84, 0.1)')]),
+        f'{stock_name}_{code}_rsi_analysis'))
+
+    return '\n'.join(charts)
@@ -0,0 +1,302 @@
+"""
+横截面分析
+
+把多只股票的日线对齐成 交易日 x 股票 的矩阵后，用矩阵运算(numpy/BLAS)一次性计算：
+- 收益率相关系数矩阵(最近窗口或按步长滚动)及全市场平均相关系数
+- 相对大盘指数的滚动Beta和相对强弱，板块(股票分组)等权指数的相对强弱
+- 市场宽度：站上MA20的比例、上涨/下跌家数和腾落线
+
+停牌日为NaN，相关系数按两只股票共同有数据的交易日计算；大矩阵按列分块计算以限制临时内存。
+
+用法:
+    import cross_section
+    result = cross_section.analyze(analyzer.data, groups={'银行': ['sh600000', 'sh601398']})
+    result['breadth'].tail(), result['beta'].sort_values()
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from trade_calendar import TradingCalendar
+
+DEFAULT_INDEX = 'sh000001'
+DEFAULT_CHUNK = 1024
+
+
+def align_panel(data: Dict[str, pd.DataFrame], field: str = 'close',
+                calendar: Optional[TradingCalendar] = None) -> pd.DataFrame:
+    """
+    把 {股票代码: K线数据}(如 StockAnalyzer.data)对齐为 交易日 x 股票 的矩阵
+
+    Args:
+        data (Dict[str, pd.DataFrame]): 日期索引的K线数据
+        field (str): 取值的列
+        calendar (TradingCalendar): 交易日历，默认以各数据出现过的日期作为交易日
+
+    Returns:
+        pd.DataFrame: 行为交易日、列为股票代码，缺失为NaN
+    """
+    frames = {code: df for code, df in data.items() if df is not None and len(df)}
+    if calendar is None:
+        calendar = TradingCalendar(np.concatenate([df.index.values.astype('datetime64[D]') for df in frames.values()]))
+    return calendar.panel(frames, field)
+
+
+def returns_matrix(prices: np.ndarray) -> np.ndarray:
+    """简单收益率矩阵，与价格矩阵同形状，首行及任一端缺失处为NaN"""
+    prices = np.asarray(prices, dtype=np.float64)
+    out = np.full_like(prices, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = prices[1:] / prices[:-1] - 1
+    return out
+
+
+def _rolling_sum(A: np.ndarray, window: int) -> np.ndarray:
+    """按列滚动求和(NaN按0计)，前window-1行为NaN"""
+    c = np.cumsum(np.nan_to_num(A), axis=0, dtype=np.float64)
+    out = c.copy()
+    out[window:] -= c[:-window]
+    out[:window - 1] = np.nan
+    return out
+
+
+def _chunks(idx: np.ndarray, chunk: int) -> Iterator[np.ndarray]:
+    for i in range(0, len(idx), chunk):
+        yield idx[i:i + chunk]
+
+
+def correlation_matrix(returns: np.ndarray, window: int = 60, chunk: int = DEFAULT_CHUNK,
+                       min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    最近window个交易日的收益率相关系数矩阵
+
+    窗口内没有缺失的股票标准化后用一次矩阵乘法得到相关系数；有缺失的股票按共同有数据的交易日
+    以掩码矩阵乘法计算。两者都按chunk列分块，临时内存约为 chunk x 股票数
+
+    Args:
+        returns (np.ndarray): 收益率矩阵(交易日 x 股票)
+        window (int): 窗口长度
+        chunk (int): 分块的列数
+        min_periods (int): 共同有数据的最少交易日数，默认为窗口长度的一半
+
+    Returns:
+        np.ndarray: 股票 x 股票 的相关系数矩阵，数据不足处为NaN
+    """
+    R = np.asarray(returns, dtype=np.float64)[-window:]
+    n_obs, n = R.shape
+    min_periods = min_periods or max(2, window // 2)
+    out = np.full((n, n), np.nan)
+    valid = ~np.isnan(R)
+    full = np.flatnonzero(valid.all(axis=0))
+    partial = np.flatnonzero(~valid.all(axis=0) & (valid.sum(axis=0) >= min_periods))
+
+    if len(full) and n_obs >= min_periods:
+        Z = R[:, full] - R[:, full].mean(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Z /= np.sqrt((Z * Z).sum(axis=0))
+        for block in _chunks(np.arange(len(full)), chunk):
+            out[np.ix_(full[block], full)] = Z[:, block].T @ Z
+
+    if len(partial):
+        X = np.where(valid, R, 0.0)
+        M = valid.astype(np.float64)
+        X2 = X * X
+        for block in _chunks(partial, chunk):
+            Xb, Mb = X[:, block], M[:, block]
+            cnt = Mb.T @ M
+            sx, sy = Xb.T @ M, Mb.T @ X
+            sxx, syy = (Xb * Xb).T @ M, Mb.T @ X2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cov = Xb.T @ X - sx * sy / cnt
+                corr = cov / np.sqrt((sxx - sx * sx / cnt) * (syy - sy * sy / cnt))
+            corr[cnt < min_periods] = np.nan
+            out[block, :] = corr
+            out[:, block] = corr.T
+
+    np.clip(out, -1.0, 1.0, out=out)
+    diag = np.flatnonzero(valid.sum(axis=0) >= min_periods)
+    out[diag, diag] = 1.0
+    return out
+
+
+def rolling_correlation(returns: np.ndarray, window: int = 60, step: int = 20,
+                        chunk: int = DEFAULT_CHUNK) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    按步长滚动计算相关系数矩阵，最后一个交易日总会被包含
+
+    Yields:
+        Tuple[int, np.ndarray]: (窗口结束的行号, 相关系数矩阵)
+    """
+    T = len(returns)
+    ends = list(range(T - 1, window - 1, -step))[::-1]
+    for end in ends:
+        yield end, correlation_matrix(returns[:end + 1], window, chunk)
+
+
+def mean_correlation(returns: np.ndarray, window: int = 60) -> np.ndarray:
+    """
+    每个交易日的全市场平均两两相关系数，不生成 股票 x 股票 矩阵
+
+    利用 sum_{i!=j} corr_ij = |sum_i z_i|^2 - sum_i |z_i|^2 (z为窗口内标准化收益)，
+    所有窗口的标准化权重一起通过一次矩阵乘法得到。缺失收益按0计
+
+    Returns:
+        np.ndarray: 长度为交易日数，前window-1个为NaN
+    """
+    X = np.nan_to_num(np.asarray(returns, dtype=np.float64))
+    T, n = X.shape
+    out = np.full(T, np.nan)
+    if T < window or n < 2:
+        return out
+    s1 = _rolling_sum(X, window)[window - 1:]
+    s2 = _rolling_sum(X * X, window)[window - 1:]
+    var = s2 - s1 * s1 / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv = np.where(var > 1e-18, 1 / np.sqrt(var), 0.0)               # 各窗口 x 股票 的标准化权重
+    U = X @ inv.T                                                         # U[t, k] = sum_i x_ti / s_ik
+    k = np.arange(T - window + 1)
+    t = k[:, None] + np.arange(window)
+    u = U[t, k[:, None]]                                                  # 各窗口内的 sum_i z_i(未去均值)
+    total = (u * u).sum(axis=1) - u.sum(axis=1) ** 2 / window
+    live = (inv > 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[window - 1:] = np.where(live > 1, (total - live) / (live * (live - 1.0)), np.nan)
+    return out
+
+
+def rolling_beta(returns: np.ndarray, index_returns: np.ndarray, window: int = 60,
+                 min_periods: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    各股票相对指数的滚动Beta和相关系数
+
+    Args:
+        returns (np.ndarray): 收益率矩阵(交易日 x 股票)
+        index_returns (np.ndarray): 指数收益率
+        window (int): 窗口长度
+        min_periods (int): 窗口内最少有效交易日数，默认为窗口长度的80%
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (Beta, 相关系数)，均为 交易日 x 股票
+    """
+    R = np.asarray(returns, dtype=np.float64)
+    x = np.asarray(index_returns, dtype=np.float64)[:, None]
+    m = (~np.isnan(R) & ~np.isnan(x)).astype(np.float64)
+    X, Y = np.where(m > 0, x, 0.0), np.where(m > 0, R, 0.0)
+    cnt = _rolling_sum(m, window)
+    sx, sy = _rolling_sum(X, window), _rolling_sum(Y, window)
+    sxx, syy, sxy = _rolling_sum(X * X, window), _rolling_sum(Y * Y, window), _rolling_sum(X * Y, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / cnt
+        var_x = sxx - sx * sx / cnt
+        beta = cov / var_x
+        corr = cov / np.sqrt(var_x * (syy - sy * sy / cnt))
+    short = ~(cnt >= (min_periods or int(window * 0.8)))
+    beta[short] = np.nan
+    corr[short] = np.nan
+    return beta, corr
+
+
+def relative_strength(prices: np.ndarray, benchmark: np.ndarray, window: int = 20) -> np.ndarray:
+    """
+    相对强弱：window日涨幅与基准同期涨幅之比减1，大于0表示跑赢基准
+
+    Returns:
+        np.ndarray: 交易日 x 股票，前window行为NaN
+    """
+    P = np.asarray(prices, dtype=np.float64)
+    B = np.asarray(benchmark, dtype=np.float64).reshape(len(P), -1)
+    out = np.full_like(P, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[window:] = (P[window:] / P[:-window]) / (B[window:] / B[:-window]) - 1
+    return out
+
+
+def group_returns(returns: np.ndarray, codes: Sequence[str],
+                  groups: Dict[str, List[str]]) -> Tuple[List[str], np.ndarray]:
+    """
+    各分组(板块)的等权收益率，停牌股票不计入当日均值
+
+    Returns:
+        Tuple[List[str], np.ndarray]: (分组名称, 交易日 x 分组 的收益率)
+    """
+    position = {code: i for i, code in enumerate(codes)}
+    names = list(groups)
+    W = np.zeros((len(codes), len(names)))
+    for j, name in enumerate(names):
+        W[[position[c] for c in groups[name] if c in position], j] = 1.0
+    R = np.asarray(returns, dtype=np.float64)
+    valid = ~np.isnan(R)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return names, (np.where(valid, R, 0.0) @ W) / (valid.astype(np.float64) @ W)
+
+
+def breadth(prices: np.ndarray, ma: int = 20) -> Dict[str, np.ndarray]:
+    """
+    市场宽度
+
+    Returns:
+        Dict[str, np.ndarray]: 站上MA的比例(%)、上涨家数、下跌家数、腾落线(上涨减下跌的累计值)
+    """
+    P = np.asarray(prices, dtype=np.float64)
+    cnt = _rolling_sum(~np.isnan(P), ma)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = np.where(cnt >= ma, _rolling_sum(P, ma) / cnt, np.nan)
+        valid = ~np.isnan(P) & ~np.isnan(avg)
+        above = np.where(valid, P > avg, False).sum(axis=1) / valid.sum(axis=1) * 100
+        change = np.full_like(P, np.nan)
+        change[1:] = P[1:] - P[:-1]
+    advancers = (change > 0).sum(axis=1)
+    decliners = (change < 0).sum(axis=1)
+    return {
+        'above_ma': above,
+        'advancers': advancers,
+        'decliners': decliners,
+        'ad_line': np.cumsum(advancers - decliners),
+    }
+
+
+def analyze(data: Dict[str, pd.DataFrame], index_code: str = DEFAULT_INDEX, window: int = 60,
+            rs_window: int = 20, groups: Optional[Dict[str, List[str]]] = None,
+            calendar: Optional[TradingCalendar] = None, correlation: bool = False) -> Dict[str, object]:
+    """
+    对已获取的多只股票数据做横截面分析
+
+    Args:
+        data (Dict[str, pd.DataFrame]): {股票代码: K线数据}，如 StockAnalyzer.data
+        index_code (str): 基准指数代码，需包含在data中才会计算Beta和相对强弱
+        window (int): 相关系数和Beta的窗口长度
+        rs_window (int): 相对强弱的周期
+        groups (Dict[str, List[str]]): 板块分组 {名称: [股票代码]}
+        calendar (TradingCalendar): 交易日历
+        correlation (bool): 是否返回最近窗口的相关系数矩阵
+
+    Returns:
+        Dict[str, object]: prices/breadth/mean_correlation 以及(有基准时) beta/index_correlation/
+        relative_strength，(有分组时) group_strength，(correlation=True时) correlation
+    """
+    panel = align_panel(data, calendar=calendar)
+    codes = [c for c in panel.columns if c != index_code]
+    dates = panel.index
+    prices = panel[codes].to_numpy()
+    returns = returns_matrix(prices)
+
+    result: Dict[str, object] = {
+        'prices': panel,
+        'breadth': pd.DataFrame(breadth(prices), index=dates),
+        'mean_correlation': pd.Series(mean_correlation(returns, window), index=dates),
+    }
+    if index_code in panel:
+        index_prices = panel[index_code].to_numpy()
+        beta, corr = rolling_beta(returns, returns_matrix(index_prices[:, None])[:, 0], window)
+        result['beta'] = pd.Series(beta[-1], index=codes)
+        result['index_correlation'] = pd.Series(corr[-1], index=codes)
+        result['relative_strength'] = pd.Series(relative_strength(prices, index_prices, rs_window)[-1], index=codes)
+        if groups:
+            names, group_ret = group_returns(returns, codes, groups)
+            group_prices = np.cumprod(1 + np.nan_to_num(group_ret), axis=0)
+            result['group_strength'] = pd.Series(relative_strength(group_prices, index_prices, rs_window)[-1],
+                                                 index=names)
+    if correlation:
+        result['correlation'] = pd.DataFrame(correlation_matrix(returns, window), index=codes, columns=codes)
+    return result
@@ -0,0 +1,161 @@
+"""
+列式结果导出
+
+把一次运行的K线、技术指标和交易信号写成固定结构的 Parquet 和 Arrow IPC 文件，
+供 notebook、BI 和其他服务直接读取，无需重新获取数据和计算指标：
+
+    <root>/bars/date=2026-10-16/part-0.parquet|.arrow        K线(date, code, open..volume)
+    <root>/indicators/date=2026-10-16/part-0.parquet|.arrow  技术指标(date, code, INDICATOR_COLUMNS)
+    <root>/signals/date=2026-10-16/part-0.parquet|.arrow     交易信号(date, code, seq, signal)
+
+按最新K线日期分区，同一交易日重复导出会覆盖。Arrow IPC 文件不压缩，
+可通过内存映射零拷贝读取：read_table(root, 'indicators', memory_map=True)。
+
+依赖 pyarrow(可选): pip install pyarrow
+
+用法:
+    python main.py --export public/data
+"""
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from main import INDICATOR_COLUMNS, generate_trading_signals
+
+EXPORT_SCHEMA_VERSION = '1'
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+TABLES = ('bars', 'indicators', 'signals')
+FORMATS = ('parquet', 'arrow')
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("导出 Parquet/Arrow 需要安装 pyarrow: pip install pyarrow")
+
+
+def schemas() -> Dict[str, 'pa.Schema']:
+    """各表的固定结构，列的顺序和类型不随数据变化"""
+    _require_pyarrow()
+    key = [pa.field('date', pa.date32(), nullable=False),
+           pa.field('code', pa.dictionary(pa.int32(), pa.string()), nullable=False)]
+    meta = {b'schema_version': EXPORT_SCHEMA_VERSION.encode()}
+    return {
+        'bars': pa.schema(key + [pa.field(c, pa.float64()) for c in BAR_COLUMNS], metadata=meta),
+        'indicators': pa.schema(key + [pa.field(c, pa.float64()) for c in INDICATOR_COLUMNS], metadata=meta),
+        'signals': pa.schema(key + [pa.field('seq', pa.int16(), nullable=False),
+                                    pa.field('signal', pa.string(), nullable=False)], metadata=meta),
+    }
+
+
+def _frame_table(frames: Dict[str, pd.DataFrame], columns: Iterable[str], schema: 'pa.Schema') -> 'pa.Table':
+    """多只股票的日期索引数据依次拼接为一张表，缺少的列为空值"""
+    codes = [c for c, df in frames.items() if df is not None and len(df)]
+    lengths = np.array([len(frames[c]) for c in codes], dtype=np.int64)
+    dates = np.concatenate([frames[c].index.values.astype('datetime64[D]') for c in codes]) if codes \
+        else np.zeros(0, 'datetime64[D]')
+    arrays = [pa.array(dates, pa.date32()),
+              pa.DictionaryArray.from_arrays(pa.array(np.repeat(np.arange(len(codes), dtype=np.int32), lengths)),
+                                             pa.array(codes, pa.string()))]
+    for column in columns:
+        values = [frames[c][column].to_numpy(dtype=np.float64) if column in frames[c]
+                  else np.full(len(frames[c]), np.nan) for c in codes]
+        data = np.concatenate(values) if values else np.zeros(0)
+        arrays.append(pa.array(data, pa.float64(), from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _signal_table(signals: Dict[str, List[str]], dates: Dict[str, object], schema: 'pa.Schema') -> 'pa.Table':
+    """交易信号表，每条信号一行，date 为产生信号的K线日期"""
+    codes = [c for c in signals for _ in signals[c]]
+    return pa.Table.from_arrays([
+        pa.array([dates[c] for c in codes], pa.date32()),
+        pa.array(codes, pa.string()).dictionary_encode().cast(schema.field('code').type),
+        pa.array([i for c in signals for i in range(len(signals[c]))], pa.int16()),
+        pa.array([s for c in signals for s in signals[c]], pa.string()),
+    ], schema=schema)
+
+
+def _write(table: 'pa.Table', path: str, fmt: str) -> None:
+    tmp = path + '.tmp'
+    if fmt == 'parquet':
+        pq.write_table(table, tmp, compression='zstd')
+    else:
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def export_run(analyzer, root: str = 'public/data', formats: Iterable[str] = FORMATS) -> Dict[str, List[str]]:
+    """
+    导出 StockAnalyzer 已获取的K线、技术指标和交易信号
+
+    Args:
+        analyzer (StockAnalyzer): 已获取数据的股票分析器，技术指标复用其缓存
+        root (str): 导出目录
+        formats: 'parquet' 和/或 'arrow'
+
+    Returns:
+        Dict[str, List[str]]: 表名 -> 写出的文件路径
+    """
+    _require_pyarrow()
+    frames = {code: analyzer.data[code] for code in analyzer.stock_codes if code in analyzer.data}
+    if not frames:
+        print("没有可导出的数据")
+        return {}
+    indicators, signals = {}, {}
+    for code in frames:
+        ind = analyzer.calculate_indicators(code)
+        if ind is not None:
+            indicators[code] = ind
+            signals[code] = generate_trading_signals(ind)
+
+    date = max(df.index[-1] for df in frames.values()).date()
+    schema = schemas()
+    tables = {
+        'bars': _frame_table(frames, BAR_COLUMNS, schema['bars']),
+        'indicators': _frame_table(indicators, INDICATOR_COLUMNS, schema['indicators']),
+        'signals': _signal_table(signals, {c: df.index[-1].date() for c, df in frames.items()}, schema['signals']),
+    }
+    written: Dict[str, List[str]] = {}
+    for name, table in tables.items():
+        directory = os.path.join(root, name, f'date={date:%Y-%m-%d}')
+        os.makedirs(directory, exist_ok=True)
+        for fmt in formats:
+            path = os.path.join(directory, f'part-0.{fmt}')
+            _write(table, path, fmt)
+            written.setdefault(name, []).append(path)
+    print(f"已导出 {len(frames)} 只股票的K线/指标/信号到 {root} (date={date:%Y-%m-%d}, {', '.join(formats)})")
+    return written
+
+
+def read_table(root: str, table: str, date: Optional[str] = None, memory_map: bool = True) -> 'pa.Table':
+    """
+    读取导出的表
+
+    Args:
+        root (str): 导出目录
+        table (str): 'bars' / 'indicators' / 'signals'
+        date (str): 分区日期 YYYY-MM-DD，默认为最新的分区
+        memory_map (bool): 优先读取 Arrow IPC 文件并内存映射(零拷贝)，否则读取 Parquet
+
+    Returns:
+        pa.Table: 数据表，可用 .to_pandas() 转换
+    """
+    _require_pyarrow()
+    base = os.path.join(root, table)
+    partitions = sorted(p for p in os.listdir(base) if p.startswith('date='))
+    if not partitions:
+        raise FileNotFoundError(f"{base} 中没有导出的分区")
+    directory = os.path.join(base, f'date={date}' if date else partitions[-1])
+    arrow_path = os.path.join(directory, 'part-0.arrow')
+    if memory_map and os.path.exists(arrow_path):
+        return pa.ipc.open_file(pa.memory_map(arrow_path, 'r')).read_all()
+    return pq.read_table(os.path.join(directory, 'part-0.parquet'))
@@ -0,0 +1,225 @@
+"""
+确定性技术特征提取
+
+在本地向量化计算支撑/压力位、成交量分布、MACD/RSI与价格的背离以及趋势统计，
+供大模型提示词直接引用，不再需要把完整的历史日线逐行发送给模型自行识别。
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import kernels as _kn
+
+
+def pivot_points(high: np.ndarray, low: np.ndarray, window: int = 5) -> Dict[str, np.ndarray]:
+    """
+    识别摆动高点/低点：高点严格高于左侧window根K线且不低于右侧window根K线，低点反之
+
+    最后window根K线右侧数据不足，不会被确认为拐点
+
+    Args:
+        high (np.ndarray): 最高价
+        low (np.ndarray): 最低价
+        window (int): 左右两侧比较的K线数量
+
+    Returns:
+        Dict[str, np.ndarray]: {'high': 高点位置, 'low': 低点位置}
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        left_max = _kn.shift(_kn.rolling_max(high, window), 1)
+        right_max = _kn.shift(_kn.rolling_max(high, window), -window)
+        left_min = _kn.shift(_kn.rolling_min(low, window), 1)
+        right_min = _kn.shift(_kn.rolling_min(low, window), -window)
+        is_high = (high > left_max) & (high >= right_max)
+        is_low = (low < left_min) & (low <= right_min)
+    return {'high': np.flatnonzero(is_high), 'low': np.flatnonzero(is_low)}
+
+
+def _cluster_levels(prices: np.ndarray, tolerance: float) -> List[Dict[str, float]]:
+    """把相对距离在tolerance以内的价格归为同一价位，返回 [{'price': 均价, 'touches': 次数}]"""
+    if len(prices) == 0:
+        return []
+    prices = np.sort(prices)
+    labels = np.concatenate(([0], np.cumsum(np.diff(prices) / prices[:-1] > tolerance)))
+    counts = np.bincount(labels)
+    means = np.bincount(labels, weights=prices) / counts
+    return [{'price': float(p), 'touches': int(c)} for p, c in zip(means, counts)]
+
+
+def support_resistance(df: pd.DataFrame, window: int = 5, tolerance: float = 0.015,
+                       max_levels: int = 3) -> Dict[str, List[Dict[str, float]]]:
+    """
+    由拐点聚类得到支撑位和压力位，按距离当前价由近到远排序
+
+    Args:
+        df (pd.DataFrame): 含 high/low/close 列的K线数据
+        window (int): 拐点识别窗口
+        tolerance (float): 价位合并的相对容差
+        max_levels (int): 支撑/压力各保留的价位数量
+
+    Returns:
+        Dict[str, List[Dict[str, float]]]: {'support': [...], 'resistance': [...]}
+    """
+    high, low = df['high'].to_numpy(dtype=np.float64), df['low'].to_numpy(dtype=np.float64)
+    close = float(df['close'].iloc[-1])
+    pivots = pivot_points(high, low, window)
+    levels = _cluster_levels(np.concatenate((high[pivots['high']], low[pivots['low']])), tolerance)
+    support = sorted((lv for lv in levels if lv['price'] < close), key=lambda lv: close - lv['price'])
+    resistance = sorted((lv for lv in levels if lv['price'] >= close), key=lambda lv: lv['price'] - close)
+    return {'support': support[:max_levels], 'resistance': resistance[:max_levels]}
+
+
+def volume_profile(df: pd.DataFrame, bins: int = 24, value_area: float = 0.7, top: int = 3) -> Dict[str, Any]:
+    """
+    成交量分布：按典型价格(高+低+收)/3把成交量分箱
+
+    Args:
+        df (pd.DataFrame): 含 high/low/close/volume 列的K线数据
+        bins (int): 价格分箱数量
+        value_area (float): 价值区域覆盖的成交量比例
+        top (int): 返回的高成交量价位数量
+
+    Returns:
+        Dict[str, Any]: 成交量最大价位(POC)、价值区域上下沿、高成交量价位
+    """
+    typical = ((df['high'] + df['low'] + df['close']) / 3).to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    ok = ~(np.isnan(typical) | np.isnan(volume))
+    hist, edges = np.histogram(typical[ok], bins=bins, weights=volume[ok])
+    centers = (edges[:-1] + edges[1:]) / 2
+    order = np.argsort(hist)[::-1]
+    covered = np.cumsum(hist[order]) / max(hist.sum(), 1e-12)
+    area = order[:int(np.searchsorted(covered, value_area)) + 1]
+    return {
+        'poc': float(centers[order[0]]),
+        'value_area_low': float(edges[area.min()]),
+        'value_area_high': float(edges[area.max() + 1]),
+        'high_volume_nodes': [float(centers[i]) for i in order[:top]],
+    }
+
+
+def divergences(price_high: np.ndarray, price_low: np.ndarray, indicator: np.ndarray,
+                pivots: Dict[str, np.ndarray], lookback: int = 60) -> List[Dict[str, Any]]:
+    """
+    比较相邻两个拐点的价格与指标：价格新高而指标未新高为顶背离，价格新低而指标未新低为底背离
+
+    Args:
+        price_high (np.ndarray): 最高价
+        price_low (np.ndarray): 最低价
+        indicator (np.ndarray): 指标序列(如DIF、RSI)
+        pivots (Dict[str, np.ndarray]): pivot_points() 的结果
+        lookback (int): 只报告最近lookback根K线内完成的背离
+
+    Returns:
+        List[Dict[str, Any]]: [{'type': '顶背离'|'底背离', 'from': 位置, 'to': 位置}]，按完成时间排序
+    """
+    indicator = np.asarray(indicator, dtype=np.float64)
+    start = len(indicator) - lookback
+    found = []
+    for kind, price, sign in (('顶背离', price_high, 1), ('底背离', price_low, -1)):
+        idx = pivots['high' if sign > 0 else 'low']
+        if len(idx) < 2:
+            continue
+        p1, p2 = idx[:-1], idx[1:]
+        with np.errstate(invalid='ignore'):
+            hit = (sign * (price[p2] - price[p1]) > 0) & (sign * (indicator[p2] - indicator[p1]) < 0) & (p2 >= start)
+        found += [{'type': kind, 'from': int(a), 'to': int(b)} for a, b in zip(p1[hit], p2[hit])]
+    return sorted(found, key=lambda d: d['to'])
+
+
+def trend_stats(df: pd.DataFrame, windows=(20, 60)) -> Dict[str, Any]:
+    """
+    趋势统计：区间涨跌幅、线性回归斜率(每日%)与拟合度、波动率、最大回撤、量比、均线排列
+
+    Args:
+        df (pd.DataFrame): 含 close/volume 列的K线数据
+        windows: 计算回归斜率的周期
+
+    Returns:
+        Dict[str, Any]: 统计结果
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    n = len(close)
+    last = close[-1]
+    stats: Dict[str, Any] = {}
+    for N in (5, 20, 60):
+        if n > N:
+            stats[f'{N}日涨跌幅%'] = (last / close[-N - 1] - 1) * 100
+    for N in windows:
+        if n >= N:
+            slope, intercept = _kn.rolling_linreg(close, N)
+            fit = intercept[-1] + slope[-1] * np.arange(N)
+            window = close[-N:]
+            ss_tot = ((window - window.mean()) ** 2).sum()
+            stats[f'{N}日回归斜率%/日'] = slope[-1] / last * 100
+            stats[f'{N}日回归R2'] = 1 - ((window - fit) ** 2).sum() / ss_tot if ss_tot > 0 else 0.0
+    returns = np.diff(np.log(close))
+    if len(returns) >= 20:
+        stats['20日年化波动率%'] = returns[-20:].std() * np.sqrt(250) * 100
+    stats['区间最大回撤%'] = ((close / np.maximum.accumulate(close)) - 1).min() * 100
+    stats['距区间最高价%'] = (last / close.max() - 1) * 100
+    stats['距区间最低价%'] = (last / close.min() - 1) * 100
+    if n >= 20:
+        stats['5日/20日量比'] = volume[-5:].mean() / volume[-20:].mean()
+        mas = [close[-N:].mean() for N in (5, 10, 20, 60) if n >= N]
+        if len(mas) >= 3:
+            stats['均线排列'] = '多头排列' if all(np.diff(mas) < 0) else '空头排列' if all(np.diff(mas) > 0) else '交织'
+    return stats
+
+
+def _round(value: Any) -> Any:
+    if isinstance(value, (float, np.floating)):
+        return round(float(value), 2)
+    if isinstance(value, dict):
+        return {k: _round(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round(v) for v in value]
+    return value
+
+
+def extract_features(df: pd.DataFrame, indicators: Optional[pd.DataFrame] = None, window: int = 5,
+                     lookback: int = 60) -> Dict[str, Any]:
+    """
+    提取供提示词使用的全部特征
+
+    Args:
+        df (pd.DataFrame): K线数据(open/high/low/close/volume，日期索引)
+        indicators (pd.DataFrame): 技术指标数据，需含 DIF 和 RSI 列才会计算背离
+        window (int): 拐点识别窗口
+        lookback (int): 背离的回看周期
+
+    Returns:
+        Dict[str, Any]: 以中文为键、数值保留两位小数的特征字典
+    """
+    high, low = df['high'].to_numpy(dtype=np.float64), df['low'].to_numpy(dtype=np.float64)
+    dates = df.index.strftime('%Y-%m-%d') if isinstance(df.index, pd.DatetimeIndex) else df.index.astype(str)
+    pivots = pivot_points(high, low, window)
+    levels = support_resistance(df, window)
+    profile = volume_profile(df)
+
+    features = {
+        "支撑位": [{"价位": lv['price'], "触及次数": lv['touches']} for lv in levels['support']],
+        "压力位": [{"价位": lv['price'], "触及次数": lv['touches']} for lv in levels['resistance']],
+        "近期拐点": {
+            "高点": [{"日期": dates[i], "价格": high[i]} for i in pivots['high'][-3:]],
+            "低点": [{"日期": dates[i], "价格": low[i]} for i in pivots['low'][-3:]],
+        },
+        "成交量分布": {
+            "最大成交价位": profile['poc'],
+            "价值区域": [profile['value_area_low'], profile['value_area_high']],
+            "高成交量价位": profile['high_volume_nodes'],
+        },
+        "趋势统计": trend_stats(df),
+    }
+    if indicators is not None:
+        found = []
+        for name, column in (('MACD', 'DIF'), ('RSI', 'RSI')):
+            if column in indicators:
+                for d in divergences(high, low, indicators[column].to_numpy(), pivots, lookback):
+                    found.append({"指标": name, "类型": d['type'], "起点": dates[d['from']], "终点": dates[d['to']]})
+        features["指标背离"] = found or "近期无明显背离"
+    return _round(features)
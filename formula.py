@@ -0,0 +1,378 @@
+"""
+通达信/同花顺(麦语言)公式编译器
+
+把公式源码解析为表达式DAG，多个公式编译到同一张图中，结构相同的子表达式只保留一个节点
+(公共子表达式消除)，执行时按拓扑序逐节点调用MyTT的NumPy原语，每个节点只计算一次。
+例如 WR 中两次出现的 HHV(HIGH,N)、KDJ 中两次出现的 LLV(LOW,N)，以及 ATR/DMI/VR/BRAR/RSI
+共同用到的 REF(CLOSE,1)，在整套指标中都只计算一次。
+
+语法:
+    RSV:=(C-LLV(L,N))/(HHV(H,N)-LLV(L,N))*100;   中间变量，不输出
+    K:EMA(RSV,M1*2-1);                           输出变量
+    支持 + - * / 比较运算(> < >= <= = <>)、AND/OR、括号、{注释}，行情变量 O/H/L/C/V 及全称
+
+用法:
+    program = compile_formulas({'KDJ': ('RSV:=...;K:...;', {'N': 9, 'M1': 3})})
+    result = program.run({'CLOSE': close, 'HIGH': high, 'LOW': low})
+    result['KDJ.K']
+"""
+import re
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+import MyTT as mt
+
+
+class FormulaError(Exception):
+    """公式语法或语义错误"""
+    pass
+
+
+# 行情变量别名
+DATA_ALIASES = {
+    'C': 'CLOSE', 'CLOSE': 'CLOSE', 'O': 'OPEN', 'OPEN': 'OPEN', 'H': 'HIGH', 'HIGH': 'HIGH',
+    'L': 'LOW', 'LOW': 'LOW', 'V': 'VOL', 'VOL': 'VOL', 'VOLUME': 'VOL',
+}
+
+# 可用函数: 名称 -> (实现, 最少参数个数, 默认参数)
+FUNCTIONS = {
+    'MA': (mt.MA, 2, ()), 'EMA': (mt.EMA, 2, ()), 'SMA': (mt.SMA, 2, (1,)), 'REF': (mt.REF, 1, (1,)),
+    'DIFF': (mt.DIFF, 1, (1,)), 'STD': (mt.STD, 2, ()), 'SUM': (mt.SUM, 2, ()), 'HHV': (mt.HHV, 2, ()),
+    'LLV': (mt.LLV, 2, ()), 'AVEDEV': (mt.AVEDEV, 2, ()), 'COUNT': (mt.COUNT, 2, ()),
+    'ABS': (np.abs, 1, ()), 'MAX': (np.maximum, 2, ()), 'MIN': (np.minimum, 2, ()),
+    'IF': (mt.IF, 3, ()), 'CROSS': (mt.CROSS, 2, ()), 'RD': (mt.RD, 1, (3,)),
+    'SLOPE': (mt.SLOPES, 2, ()), 'FORCAST': (mt.FORCASTS, 2, ()), 'BARSLAST': (mt.BARSLASTS, 1, ()),
+}
+
+BINARY_OPS = {
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide,
+    '>': np.greater, '<': np.less, '>=': np.greater_equal, '<=': np.less_equal,
+    '=': np.equal, '<>': np.not_equal, 'AND': np.logical_and, 'OR': np.logical_or,
+}
+
+# 运算符优先级，数值越大结合越紧
+PRECEDENCE = {'OR': 1, 'AND': 2, '>': 3, '<': 3, '>=': 3, '<=': 3, '=': 3, '<>': 3, '+': 4, '-': 4, '*': 5, '/': 5}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|\{[^}]*\})
+  | (?P<num>\d+\.?\d*|\.\d+)
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<op>:=|>=|<=|<>|&&|\|\||[-+*/()<>=,:;])
+""", re.VERBOSE)
+
+
+def _tokenize(source: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    while pos < len(source):
+        m = _TOKEN_RE.match(source, pos)
+        if not m:
+            raise FormulaError(f"无法识别的字符: {source[pos:pos + 10]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'ws':
+            continue
+        text = m.group()
+        if kind == 'name':
+            text = text.upper()
+            if text in ('AND', 'OR'):
+                kind = 'op'
+        elif text == '&&':
+            text = 'AND'
+        elif text == '||':
+            text = 'OR'
+        tokens.append((kind, text))
+    return tokens
+
+
+class Graph:
+    """表达式DAG，节点按结构去重，节点编号即拓扑序"""
+
+    def __init__(self):
+        self.nodes: List[tuple] = []
+        self._index: Dict[tuple, int] = {}
+        self.reused = 0
+
+    def add(self, node: tuple) -> int:
+        """加入节点，已存在相同结构的节点时直接复用"""
+        if node in self._index:
+            self.reused += 1
+            return self._index[node]
+        self._index[node] = len(self.nodes)
+        self.nodes.append(node)
+        return self._index[node]
+
+    def const(self, value: float) -> int:
+        value = float(value)
+        return self.add(('const', int(value) if value.is_integer() else value))
+
+    def const_value(self, ref: int) -> Optional[Union[int, float]]:
+        node = self.nodes[ref]
+        return node[1] if node[0] == 'const' else None
+
+
+class _Parser:
+    """单个公式的递归下降解析器，解析结果直接写入共享的 Graph"""
+
+    def __init__(self, graph: Graph, tokens: List[Tuple[str, str]], scope: Dict[str, int]):
+        self.graph = graph
+        self.tokens = tokens
+        self.pos = 0
+        self.scope = scope
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ('eof', '')
+
+    def take(self, text: Optional[str] = None) -> Tuple[str, str]:
+        token = self.peek()
+        if text is not None and token[1] != text:
+            raise FormulaError(f"期望 {text!r}，实际为 {token[1]!r}")
+        self.pos += 1
+        return token
+
+    def statements(self) -> List[Tuple[str, int]]:
+        """解析全部语句，返回输出变量列表 [(名称, 节点)]"""
+        outputs = []
+        while self.peek()[0] != 'eof':
+            if self.peek()[1] == ';':
+                self.take()
+                continue
+            kind, name = self.peek()
+            nxt = self.tokens[self.pos + 1][1] if self.pos + 1 < len(self.tokens) else ''
+            if kind == 'name' and nxt in (':=', ':'):
+                self.pos += 2
+                ref = self.expression()
+                self.scope[name] = ref
+                if nxt == ':':
+                    outputs.append((name, ref))
+            else:
+                ref = self.expression()
+                outputs.append((f'OUT{len(outputs) + 1}', ref))
+            if self.peek()[0] != 'eof':
+                self.take(';')
+        return outputs
+
+    def expression(self, min_prec: int = 0) -> int:
+        left = self.unary()
+        while True:
+            kind, op = self.peek()
+            prec = PRECEDENCE.get(op) if kind == 'op' else None
+            if prec is None or prec <= min_prec:
+                return left
+            self.take()
+            right = self.expression(prec)
+            left = self.binary(op, left, right)
+
+    def binary(self, op: str, left: int, right: int) -> int:
+        a, b = self.graph.const_value(left), self.graph.const_value(right)
+        if a is not None and b is not None and op in ('+', '-', '*', '/'):   # 常量折叠，如 M1*2-1
+            return self.graph.const(BINARY_OPS[op](a, b))
+        return self.graph.add(('op', op, left, right))
+
+    def unary(self) -> int:
+        if self.peek()[1] == '-':
+            self.take()
+            operand = self.unary()
+            value = self.graph.const_value(operand)
+            return self.graph.const(-value) if value is not None else self.binary('-', self.graph.const(0), operand)
+        if self.peek()[1] == '+':
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self) -> int:
+        kind, text = self.take()
+        if kind == 'num':
+            return self.graph.const(float(text))
+        if text == '(':
+            ref = self.expression()
+            self.take(')')
+            return ref
+        if kind != 'name':
+            raise FormulaError(f"意外的符号 {text!r}")
+        if self.peek()[1] == '(':
+            return self.call(text)
+        if text in self.scope:
+            return self.scope[text]
+        if text in DATA_ALIASES:
+            return self.graph.add(('data', DATA_ALIASES[text]))
+        raise FormulaError(f"未定义的变量或参数: {text}")
+
+    def call(self, name: str) -> int:
+        if name not in FUNCTIONS:
+            raise FormulaError(f"不支持的函数: {name}")
+        self.take('(')
+        args = []
+        if self.peek()[1] != ')':
+            args.append(self.expression())
+            while self.peek()[1] == ',':
+                self.take()
+                args.append(self.expression())
+        self.take(')')
+        _, min_args, defaults = FUNCTIONS[name]
+        if len(args) < min_args:
+            raise FormulaError(f"函数 {name} 至少需要 {min_args} 个参数")
+        missing = min_args + len(defaults) - len(args)
+        if missing > 0:
+            args += [self.graph.const(d) for d in defaults[len(defaults) - missing:]]
+        return self.graph.add(('call', name) + tuple(args))
+
+
+class Program:
+    """编译后的指标程序"""
+
+    def __init__(self, graph: Graph, outputs: Dict[str, int]):
+        self.graph = graph
+        self.outputs = outputs
+        # 只执行输出实际依赖的节点
+        needed = set()
+        stack = list(outputs.values())
+        while stack:
+            ref = stack.pop()
+            if ref in needed:
+                continue
+            needed.add(ref)
+            stack.extend(self._children(graph.nodes[ref]))
+        self.order = sorted(needed)
+        # 预先展开为执行步骤，常量直接写入值表模板
+        self._template: List[Any] = [None] * len(graph.nodes)
+        self._inputs: List[Tuple[int, str]] = []
+        self._steps: List[Tuple[int, Any, Tuple[int, ...]]] = []
+        for ref in self.order:
+            node = graph.nodes[ref]
+            if node[0] == 'const':
+                self._template[ref] = node[1]
+            elif node[0] == 'data':
+                self._inputs.append((ref, node[1]))
+            elif node[0] == 'op':
+                self._steps.append((ref, BINARY_OPS[node[1]], node[2:]))
+            else:
+                self._steps.append((ref, FUNCTIONS[node[1]][0], node[2:]))
+
+    @staticmethod
+    def _children(node: tuple) -> Tuple[int, ...]:
+        return node[2:] if node[0] in ('op', 'call') else ()
+
+    @property
+    def data_fields(self) -> List[str]:
+        """程序需要的行情字段"""
+        return sorted({self.graph.nodes[r][1] for r in self.order if self.graph.nodes[r][0] == 'data'})
+
+    def run(self, data: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        """
+        执行程序
+
+        Args:
+            data (Mapping[str, Any]): 行情数据，键为 OPEN/HIGH/LOW/CLOSE/VOL(也接受 VOLUME 及小写列名)
+
+        Returns:
+            Dict[str, np.ndarray]: 输出名称('公式名.变量名')到序列的映射
+        """
+        fields = {}
+        for key, value in data.items():
+            alias = DATA_ALIASES.get(str(key).upper())
+            if alias:
+                fields[alias] = np.asarray(value, dtype=np.float64)
+        values = list(self._template)
+        for ref, field in self._inputs:
+            if field not in fields:
+                raise FormulaError(f"缺少行情数据: {field}")
+            values[ref] = fields[field]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for ref, func, args in self._steps:
+                values[ref] = func(*[values[a] for a in args])
+        n = len(next(iter(fields.values()))) if fields else 0
+        return {name: np.asarray(values[ref], dtype=np.float64) if np.ndim(values[ref])
+                else np.full(n, values[ref], dtype=np.float64)
+                for name, ref in self.outputs.items()}
+
+    def stats(self) -> Dict[str, int]:
+        """节点数与公共子表达式复用次数"""
+        return {'nodes': len(self.order), 'reused': self.graph.reused}
+
+
+FormulaSpec = Union[str, Tuple[str, Mapping[str, float]]]
+
+
+def compile_formulas(formulas: Union[str, Mapping[str, FormulaSpec]], params: Optional[Mapping[str, float]] = None) -> Program:
+    """
+    编译一组公式到同一个程序，公式之间共享公共子表达式
+
+    Args:
+        formulas: 单个公式源码，或 {公式名: 源码 或 (源码, 参数)}
+        params: 所有公式共用的参数，公式自带的参数优先
+
+    Returns:
+        Program: 编译后的程序，输出名称为 '公式名.变量名'
+    """
+    if isinstance(formulas, str):
+        formulas = {'F': formulas}
+    graph = Graph()
+    outputs = {}
+    for name, spec in formulas.items():
+        source, own_params = (spec, {}) if isinstance(spec, str) else spec
+        merged = dict(params or {})
+        merged.update(own_params)
+        scope = {k.upper(): graph.const(v) for k, v in merged.items()}
+        for var, ref in _Parser(graph, _tokenize(source), scope).statements():
+            outputs[f'{name}.{var}'] = ref
+    return Program(graph, outputs)
+
+
+# MyTT 2级指标的公式版本，与 MyTT.py 中的实现逐项对应(包括RD取整的位置)
+BUILTIN: Dict[str, Tuple[str, Dict[str, float]]] = {
+    'MACD': ("""DIF0:=EMA(CLOSE,SHORT)-EMA(CLOSE,LONG); DEA0:=EMA(DIF0,M);
+                DIF:RD(DIF0); DEA:RD(DEA0); MACD:RD((DIF0-DEA0)*2);""", {'SHORT': 12, 'LONG': 26, 'M': 9}),
+    'KDJ': ("""RSV:=(CLOSE-LLV(LOW,N))/(HHV(HIGH,N)-LLV(LOW,N))*100;
+               K:EMA(RSV,M1*2-1); D:EMA(K,M2*2-1); J:K*3-D*2;""", {'N': 9, 'M1': 3, 'M2': 3}),
+    'RSI': ("""DIF:=CLOSE-REF(CLOSE,1); RSI:RD(SMA(MAX(DIF,0),N)/SMA(ABS(DIF),N)*100);""", {'N': 24}),
+    'WR': ("""WR:RD((HHV(HIGH,N)-CLOSE)/(HHV(HIGH,N)-LLV(LOW,N))*100);
+              WR1:RD((HHV(HIGH,N1)-CLOSE)/(HHV(HIGH,N1)-LLV(LOW,N1))*100);""", {'N': 10, 'N1': 6}),
+    'BIAS': ("""BIAS1:RD((CLOSE-MA(CLOSE,L1))/MA(CLOSE,L1)*100);
+                BIAS2:RD((CLOSE-MA(CLOSE,L2))/MA(CLOSE,L2)*100);
+                BIAS3:RD((CLOSE-MA(CLOSE,L3))/MA(CLOSE,L3)*100);""", {'L1': 6, 'L2': 12, 'L3': 24}),
+    'BOLL': ("""MID0:=MA(CLOSE,N);
+                UPPER:RD(MID0+STD(CLOSE,N)*P); MID:RD(MID0); LOWER:RD(MID0-STD(CLOSE,N)*P);""", {'N': 20, 'P': 2}),
+    'PSY': ("""PSY0:=COUNT(CLOSE>REF(CLOSE,1),N)/N*100; PSY:RD(PSY0); PSYMA:RD(MA(PSY0,M));""", {'N': 12, 'M': 6}),
+    'CCI': ("""TP:=(HIGH+LOW+CLOSE)/3; CCI:(TP-MA(TP,N))/(0.015*AVEDEV(TP,N));""", {'N': 14}),
+    'ATR': ("""TR:=MAX(MAX((HIGH-LOW),ABS(REF(CLOSE,1)-HIGH)),ABS(REF(CLOSE,1)-LOW)); ATR:MA(TR,N);""", {'N': 20}),
+    'BBI': ("""BBI:(MA(CLOSE,M1)+MA(CLOSE,M2)+MA(CLOSE,M3)+MA(CLOSE,M4))/4;""", {'M1': 3, 'M2': 6, 'M3': 12, 'M4': 20}),
+    'DMI': ("""TR:=SUM(MAX(MAX(HIGH-LOW,ABS(HIGH-REF(CLOSE,1))),ABS(LOW-REF(CLOSE,1))),M1);
+               HD:=HIGH-REF(HIGH,1); LD:=REF(LOW,1)-LOW;
+               DMP:=SUM(IF(HD>0 AND HD>LD,HD,0),M1); DMM:=SUM(IF(LD>0 AND LD>HD,LD,0),M1);
+               PDI:DMP*100/TR; MDI:DMM*100/TR;
+               ADX:MA(ABS(MDI-PDI)/(PDI+MDI)*100,M2); ADXR:(ADX+REF(ADX,M2))/2;""", {'M1': 14, 'M2': 6}),
+    'TRIX': ("""TR:=EMA(EMA(EMA(CLOSE,M1),M1),M1); TRIX:(TR-REF(TR,1))/REF(TR,1)*100; TRMA:MA(TRIX,M2);""",
+             {'M1': 12, 'M2': 20}),
+    'VR': ("""LC:=REF(CLOSE,1); VR:SUM(IF(CLOSE>LC,VOL,0),M1)/SUM(IF(CLOSE<=LC,VOL,0),M1)*100;""", {'M1': 26}),
+    'EMV': ("""VOLUME0:=MA(VOL,N)/VOL; MID:=100*(HIGH+LOW-REF(HIGH+LOW,1))/(HIGH+LOW);
+               EMV:MA(MID*VOLUME0*(HIGH-LOW)/MA(HIGH-LOW,N),N); MAEMV:MA(EMV,M);""", {'N': 14, 'M': 9}),
+    'DPO': ("""DPO:CLOSE-REF(MA(CLOSE,M1),M2); MADPO:MA(DPO,M3);""", {'M1': 20, 'M2': 10, 'M3': 6}),
+    'BRAR': ("""AR:SUM(HIGH-OPEN,M1)/SUM(OPEN-LOW,M1)*100;
+                BR:SUM(MAX(0,HIGH-REF(CLOSE,1)),M1)/SUM(MAX(0,REF(CLOSE,1)-LOW),M1)*100;""", {'M1': 26}),
+    'DMA': ("""DIF:MA(CLOSE,N1)-MA(CLOSE,N2); DIFMA:MA(DIF,M);""", {'N1': 10, 'N2': 50, 'M': 10}),
+    'MTM': ("""MTM:CLOSE-REF(CLOSE,N); MTMMA:MA(MTM,M);""", {'N': 12, 'M': 6}),
+    'ROC': ("""ROC:100*(CLOSE-REF(CLOSE,N))/REF(CLOSE,N); MAROC:MA(ROC,M);""", {'N': 12, 'M': 6}),
+}
+
+
+def builtin(names: Optional[List[str]] = None, overrides: Optional[Mapping[str, Mapping[str, float]]] = None,
+            extra: Optional[Mapping[str, FormulaSpec]] = None) -> Program:
+    """
+    编译内置指标集合
+
+    Args:
+        names: 需要的内置指标，默认全部
+        overrides: 按指标覆盖参数，例如 {'RSI': {'N': 14}}
+        extra: 额外的自定义公式，与内置指标一起做公共子表达式消除
+
+    Returns:
+        Program: 编译后的程序
+    """
+    specs: Dict[str, FormulaSpec] = {}
+    for name in names or BUILTIN:
+        source, params = BUILTIN[name]
+        specs[name] = (source, {**params, **(overrides or {}).get(name, {})})
+    specs.update(extra or {})
+    return compile_formulas(specs)
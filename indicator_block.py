@@ -0,0 +1,89 @@
+"""
+连续存储的技术指标结果
+
+K线和全部技术指标存放在同一个按行连续(C顺序)的 float64 二维数组中，列名映射为列号：
+- frame() 返回直接引用该数组的 DataFrame(单一数据块，不复制)，供图表、导出等按列使用
+- row()/rows()/tail() 一次取出最新一行或最近若干行，报告和提示词不再逐个 .iloc[-1] 读取标量
+- format_row() 一次格式化整行数值
+
+用法:
+    block = IndicatorBlock.from_frame(analyzer.calculate_indicators(code))
+    latest = block.row()                               # {'close': 10.2, 'MACD': 0.03, ...}
+    block.format_row(['MA5', 'MA10'])                  # {'MA5': '10.18', 'MA10': '10.05'}
+    block.tail(20, ['close', 'RSI'])                   # 最近20行的 (20, 2) 数组
+"""
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class IndicatorBlock:
+    """行 x 列 的连续浮点数组及其列名索引"""
+
+    def __init__(self, values: np.ndarray, columns: Sequence[str], index: pd.Index):
+        self.values = values
+        self.columns = tuple(columns)
+        self.index = index
+        self._col = {c: i for i, c in enumerate(self.columns)}
+
+    @classmethod
+    def from_arrays(cls, df: pd.DataFrame, arrays: Mapping[str, np.ndarray]) -> 'IndicatorBlock':
+        """
+        原始K线与指标数组一次写入同一个数组
+
+        Args:
+            df (pd.DataFrame): 原始K线，各列需为数值
+            arrays (Mapping[str, np.ndarray]): 指标列名 -> 与K线等长的数组
+
+        Returns:
+            IndicatorBlock: 列顺序为K线各列在前、指标在后
+        """
+        columns = list(df.columns) + list(arrays)
+        values = np.empty((len(df), len(columns)), dtype=np.float64)
+        values[:, :df.shape[1]] = df.to_numpy(dtype=np.float64)
+        for i, array in enumerate(arrays.values(), df.shape[1]):
+            values[:, i] = array
+        return cls(values, columns, df.index)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'IndicatorBlock':
+        """由 DataFrame 构造，frame() 生成的单块 DataFrame 不复制数据"""
+        return cls(df.to_numpy(dtype=np.float64), df.columns, df.index)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._col
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.values, index=self.index, columns=list(self.columns), copy=False)
+
+    def column(self, column: str) -> np.ndarray:
+        return self.values[:, self._col[column]]
+
+    def _positions(self, columns: Optional[Sequence[str]]) -> List[int]:
+        return list(range(len(self.columns))) if columns is None else [self._col[c] for c in columns]
+
+    def row(self, i: int = -1, columns: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """第 i 行(默认最新一行)的 列名 -> 数值"""
+        names = self.columns if columns is None else columns
+        return dict(zip(names, self.values[i, self._positions(columns)].tolist()))
+
+    def rows(self, k: int, columns: Optional[Sequence[str]] = None) -> List[Dict[str, float]]:
+        """最近 k 行，由新到旧，rows(2) 为 [最新一行, 前一行]"""
+        if k > len(self.values):
+            raise IndexError(f"只有 {len(self.values)} 行数据，不足 {k} 行")
+        names = self.columns if columns is None else columns
+        block = self.values[-1:-k - 1:-1, self._positions(columns)].tolist()
+        return [dict(zip(names, values)) for values in block]
+
+    def tail(self, k: int, columns: Optional[Sequence[str]] = None) -> np.ndarray:
+        """最近 k 行，由旧到新"""
+        return self.values[-k:, self._positions(columns)]
+
+    def format_row(self, columns: Optional[Sequence[str]] = None, fmt: str = '.2f', i: int = -1) -> Dict[str, str]:
+        """第 i 行按同一格式批量格式化"""
+        names = self.columns if columns is None else columns
+        return {name: format(value, fmt) for name, value in zip(names, self.values[i, self._positions(columns)].tolist())}
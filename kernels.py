@@ -0,0 +1,593 @@
+# MyTT 滚动计算内核：纯NumPy实现，ndarray进ndarray出，热路径不经过pandas
+# 与MyTT原pandas实现保持一致的NaN预热行为：前N-1个值为NaN，窗口内有NaN时结果为NaN
+# 可选加速后端：安装了 bottleneck / numba 时按原语自动选用更快的实现，见文末后端注册表
+#   MYTT_BACKEND=auto(默认)|numpy|bottleneck|numba   指定后端，指定的后端未提供的原语仍使用NumPy实现
+#   MYTT_SELF_CHECK=0                                关闭启用加速实现前的数值一致性自检
+# 后端在首次调用任一原语时才选择(numba编译、自检都在此时进行)，只导入不计算时没有额外开销
+
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _arr(S):
+    return np.asarray(S, dtype=np.float64)
+
+
+def _nan_like(x):
+    return np.full(x.shape, np.nan)
+
+
+def rolling_sum(S, N):
+    """N周期滚动求和，基于累加和，O(n)"""
+    x = _arr(S)
+    out = _nan_like(x)
+    N = int(N)
+    if N < 1 or N > len(x):
+        return out
+    nan = np.isnan(x)
+    cs = np.cumsum(np.where(nan, 0.0, x))
+    out[N - 1:] = cs[N - 1:] - np.concatenate(([0.0], cs[:-N]))
+    if nan.any():                                          # 窗口内含NaN时置为NaN
+        cn = np.cumsum(nan)
+        out[N - 1:][(cn[N - 1:] - np.concatenate(([0], cn[:-N]))) > 0] = np.nan
+    return out
+
+
+def rolling_mean(S, N):
+    """N周期简单移动平均"""
+    return rolling_sum(S, N) / int(N)
+
+
+def _window(x, N, reducer):
+    out = _nan_like(x)
+    N = int(N)
+    if N < 1 or N > len(x):
+        return out
+    out[N - 1:] = reducer(sliding_window_view(x, N), axis=1)
+    return out
+
+
+def _blocks(x, N, fill):
+    """按N个一段切分并补齐为 (段数, N) 的矩阵"""
+    segments = -(-len(x) // N)
+    padded = np.full(segments * N, fill)
+    padded[:len(x)] = x
+    return padded.reshape(segments, N)
+
+
+def _rolling_extreme(S, N, ufunc):
+    """
+    滚动最值，van Herk/Gil-Werman 算法，O(n)
+
+    按N个一段切分，窗口 [i-N+1, i] 恰好由某段的后缀和下一段的前缀组成，
+    结果为 max(后缀最值[i-N+1], 前缀最值[i])。np.maximum/np.minimum 传播NaN，窗口内有NaN时结果为NaN
+    """
+    x = _arr(S)
+    out = _nan_like(x)
+    N = int(N)
+    if N < 1 or N > len(x):
+        return out
+    blocks = _blocks(x, N, np.nan)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    n = len(x)
+    out[N - 1:] = ufunc(suffix[:n - N + 1], prefix[N - 1:n])
+    return out
+
+
+def rolling_max(S, N):
+    """N周期最高值，O(n)"""
+    return _rolling_extreme(S, N, np.maximum)
+
+
+def rolling_min(S, N):
+    """N周期最低值，O(n)"""
+    return _rolling_extreme(S, N, np.minimum)
+
+
+def _anchored_segments(x, N):
+    """
+    按N个一段切分，各段减去本段均值(锚点)，供段内累加和使用
+
+    窗口 [i-N+1, i] 由末端所在段 seg 的 0..pos 和前一段 prev 的 pos+1..N-1(共k个)组成，
+    pos == N-1 时窗口恰为一整段，k为0，不使用前一段
+
+    Returns:
+        tuple: (去锚点后的 (段数, N) 矩阵(NaN置0), seg, pos, prev, k, 本段锚点, 前一段锚点 - 本段锚点)
+    """
+    blocks = _blocks(x, N, np.nan)
+    finite = ~np.isnan(blocks)
+    count = finite.sum(axis=1)
+    anchor = np.where(count > 0, np.where(finite, blocks, 0.0).sum(axis=1) / np.maximum(count, 1), 0.0)
+    d = np.where(finite, blocks - anchor[:, None], 0.0)
+    i = np.arange(N - 1, len(x))
+    seg, pos = i // N, i % N
+    prev = seg - 1
+    return d, seg, pos, prev, N - 1 - pos, anchor[seg], anchor[prev] - anchor[seg]
+
+
+def _window_sum(cs, seg, pos, prev, N):
+    """段内累加和 cs 在窗口本段部分和前一段部分上的和"""
+    return cs[seg, pos], cs[prev, N - 1] - cs[prev, pos]
+
+
+def _mask_nan_windows(x, out, N):
+    """窗口内含NaN时置为NaN"""
+    nan = np.isnan(x)
+    if nan.any():
+        cn = np.cumsum(nan)
+        out[N - 1:][(cn[N - 1:] - np.concatenate(([0], cn[:-N]))) > 0] = np.nan
+    return out
+
+
+def rolling_std(S, N):
+    """
+    N周期总体标准差(ddof=0)，O(n)
+
+    不累加全序列的平方和(量级随序列增长，相减时损失精度)：按N个一段切分，各段减去本段均值后段内累加，
+    窗口最多跨两段，把前一段部分的和换算到窗口末端所在段的锚点上，
+    Σ(x-c)² - (Σ(x-c))²/N 中的量只与窗口附近的数据有关，精度与序列长度无关
+    """
+    x = _arr(S)
+    out = _nan_like(x)
+    N = int(N)
+    if N < 1 or N > len(x):
+        return out
+    d, seg, pos, prev, k, base, delta = _anchored_segments(x, N)
+    a1, p1 = _window_sum(np.cumsum(d, axis=1), seg, pos, prev, N)
+    a2, p2 = _window_sum(np.cumsum(d * d, axis=1), seg, pos, prev, N)
+    s1 = a1 + np.where(k > 0, p1 + k * delta, 0.0)
+    s2 = a2 + np.where(k > 0, p2 + 2 * delta * p1 + k * delta * delta, 0.0)
+    out[N - 1:] = np.sqrt(np.maximum(s2 / N - (s1 / N) ** 2, 0.0))
+    return _mask_nan_windows(x, out, N)
+
+
+def rolling_avedev(S, N):
+    """N周期平均绝对偏差"""
+    def avedev(w, axis):
+        return np.abs(w - w.mean(axis=axis, keepdims=True)).mean(axis=axis)
+    return _window(_arr(S), N, avedev)
+
+
+def shift(S, N=1):
+    """整体下移N个位置，空出的位置为NaN；N为负时上移"""
+    x = _arr(S)
+    N = int(N)
+    if N == 0:
+        return x.copy()
+    out = _nan_like(x)
+    if abs(N) >= len(x):
+        return out
+    if N > 0:
+        out[N:] = x[:-N]
+    else:
+        out[:N] = x[-N:]
+    return out
+
+
+def diff(S, N=1):
+    """与N个周期前的差值"""
+    x = _arr(S)
+    return x - shift(x, N)
+
+
+def _recurrence(x, alpha, y0):
+    """
+    一阶线性递推 y[k] = (1-alpha)*y[k-1] + alpha*x[k]，y[-1]=y0
+
+    分块使用闭式解 y[k] = (y0 + alpha*sum(x[j]/d^(j+1))) * d^(k+1) 向量化计算，
+    块长度限制 d^-B 的量级以保证精度，块之间传递末值
+    """
+    d = 1.0 - alpha
+    if d <= 0:                                             # alpha=1时 y=x，保留原实现 0*NaN 向后传播的行为
+        return x + 0.0 * (np.cumsum(x) + y0)
+    out = np.empty_like(x)
+    B = max(1, int(np.log(1e8) / -np.log(d))) if d < 1 else len(x)
+    p = d ** -np.arange(1, min(B, len(x)) + 1)             # d^-(j+1)
+    carry = y0
+    for s in range(0, len(x), B):
+        xs = x[s:s + B]
+        ps = p[:len(xs)]
+        out[s:s + len(xs)] = (carry + alpha * np.cumsum(xs * ps)) / ps
+        carry = out[s + len(xs) - 1]
+    return out
+
+
+def _ewm_loop(x, alpha):
+    """pandas ewm(adjust=False, ignore_na=False) 的逐点实现，用于序列中间有NaN的情况"""
+    out = _nan_like(x)
+    weighted, old_wt = np.nan, 1.0
+    for i, cur in enumerate(x):
+        obs = cur == cur
+        if weighted == weighted:
+            old_wt *= 1.0 - alpha
+            if obs:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif obs:
+            weighted = cur
+        out[i] = weighted
+    return out
+
+
+def ema(S, N):
+    """指数移动平均，等价于 pandas ewm(span=N, adjust=False).mean()"""
+    x = _arr(S)
+    alpha = 2.0 / (N + 1)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0:
+        return _nan_like(x)
+    first = valid[0]
+    if len(valid) != len(x) - first:                       # 中间有NaN，按pandas语义逐点处理
+        return _ewm_loop(x, alpha)
+    out = _nan_like(x)
+    out[first] = x[first]
+    out[first + 1:] = _recurrence(x[first + 1:], alpha, x[first])
+    return out
+
+
+def sma(S, N, M=1):
+    """
+    中国式SMA: Y=(M*X+(N-M)*Y')/N
+
+    与MyTT原实现一致：先取N周期简单平均，从第N+1个位置开始递推
+    """
+    x = _arr(S)
+    out = rolling_mean(x, N)
+    if len(x) > N + 1:
+        out[N + 1:] = _recurrence(x[N + 1:], M / N, out[N])
+    return out
+
+
+def rolling_linreg(S, N):
+    """
+    N周期滚动线性回归，返回 (斜率, 截距) 序列
+
+    窗口内横坐标取 0..N-1(与 np.polyfit(range(N), ...) 一致)，截距即窗口首个位置的拟合值。
+    斜率 = Σ(t-t̄)*y / Σ(t-t̄)²，O(n)：与 rolling_std 相同按N个一段切分，段内累加 y-锚点 及 段内序号*(y-锚点)，
+    窗口的和由本段和前一段的部分和换算到窗口中心和本段锚点上得到。
+    不使用全序列横坐标和原始价格的累加和，参与相减的量只与窗口附近的数据有关，精度与序列长度无关。
+    窗口内有NaN时结果为NaN
+    """
+    x = _arr(S)
+    N = int(N)
+    if N < 2 or N > len(x):
+        return _nan_like(x), _nan_like(x)
+    d, seg, pos, prev, k, base, delta = _anchored_segments(x, N)
+    u = np.arange(N, dtype=np.float64)
+    a0, p0 = _window_sum(np.cumsum(d, axis=1), seg, pos, prev, N)
+    a1, p1 = _window_sum(np.cumsum(u * d, axis=1), seg, pos, prev, N)
+    half = (N - 1) / 2.0
+    # 本段序号u的横坐标(相对窗口中心)为 u-pos+half，前一段为 u-N-pos+half
+    local = a1 + (half - pos) * a0
+    tail_t = (N + pos) * k / 2.0 + k * (half - N - pos)     # 前一段部分横坐标之和
+    tail = p1 + (half - N - pos) * p0 + delta * tail_t
+    slope, mean = _nan_like(x), _nan_like(x)
+    slope[N - 1:] = (local + np.where(k > 0, tail, 0.0)) / (N * (N * N - 1) / 12.0)
+    mean[N - 1:] = base + (a0 + np.where(k > 0, p0 + k * delta, 0.0)) / N
+    return _mask_nan_windows(x, slope, N), _mask_nan_windows(x, mean - slope * half, N)
+
+
+def rolling_slope(S, N):
+    """N周期滚动线性回归斜率"""
+    return rolling_linreg(S, N)[0]
+
+
+def rolling_forecast(S, N):
+    """N周期滚动线性回归对下一周期的预测值，即回归直线在 x=N 处的值"""
+    slope, intercept = rolling_linreg(S, N)
+    return intercept + slope * int(N)
+
+
+def bars_last(S_BOOL):
+    """每个位置距上一次条件成立的周期数，条件当期成立为0，此前从未成立为-1"""
+    cond = np.asarray(S_BOOL, dtype=bool)
+    idx = np.arange(len(cond))
+    last = np.maximum.accumulate(np.where(cond, idx, -1)) if len(cond) else idx
+    return np.where(last >= 0, idx - last, -1)
+
+
+#------------------ MyTT 原pandas实现，作为数值一致性校验的参照 ------------------
+REFERENCE = {
+    'MA': lambda S, N: pd.Series(S).rolling(N).mean().values,
+    'SUM': lambda S, N: pd.Series(S).rolling(N).sum().values,
+    'STD': lambda S, N: pd.Series(S).rolling(N).std(ddof=0).values,
+    'HHV': lambda S, N: pd.Series(S).rolling(N).max().values,
+    'LLV': lambda S, N: pd.Series(S).rolling(N).min().values,
+    'REF': lambda S, N: pd.Series(S).shift(N).values,
+    'DIFF': lambda S, N: pd.Series(S).diff(N).values,
+    'EMA': lambda S, N: pd.Series(S).ewm(span=N, adjust=False).mean().values,
+    'AVEDEV': lambda S, N: pd.Series(S).rolling(N).apply(lambda x: (np.abs(x - x.mean())).mean()).values,
+}
+
+
+def _reference_sma(S, N, M=1):
+    K = pd.Series(S).rolling(N).mean()
+    for i in range(N + 1, len(S)):
+        K[i] = (M * S[i] + (N - M) * K[i - 1]) / N
+    return K.values
+
+
+REFERENCE['SMA'] = _reference_sma
+
+KERNELS = {
+    'MA': rolling_mean, 'SUM': rolling_sum, 'STD': rolling_std, 'HHV': rolling_max, 'LLV': rolling_min,
+    'REF': shift, 'DIFF': diff, 'EMA': ema, 'SMA': sma, 'AVEDEV': rolling_avedev,
+}
+
+
+def _self_check_inputs(n=500, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.standard_normal(n)) * 0.3
+    with_lead_nan = close.copy()
+    with_lead_nan[:8] = np.nan
+    with_gap = close.copy()
+    with_gap[[40, 41, n - 20]] = np.nan
+    return {'close': close, 'lead_nan': with_lead_nan, 'gap': with_gap, 'short': close[:5]}
+
+
+def self_check(kernels=None, rtol=1e-9, atol=1e-9, verbose=True):
+    """
+    对比内核与MyTT原pandas实现的输出，返回不一致项列表
+
+    Args:
+        kernels (dict): 待校验的内核 {名称: 函数}，默认为本模块的NumPy内核
+        rtol, atol: 允许的相对/绝对误差
+    """
+    kernels = kernels or KERNELS
+    failures = []
+    for label, S in _self_check_inputs().items():
+        for name, func in kernels.items():
+            for N in (1, 2, 5, 14, 26, 60):
+                if name == 'SMA' and label == 'gap':
+                    continue                               # 原实现遇到NaN后整体传播，两者一致但无比较意义
+                expect = REFERENCE[name](S, N)
+                got = func(S, N)
+                if not isinstance(got, np.ndarray) or not np.allclose(got, expect, rtol=rtol, atol=atol, equal_nan=True):
+                    failures.append(f"{name}(N={N}, {label})")
+    if verbose:
+        print("内核一致性校验通过" if not failures else f"内核一致性校验失败: {failures}")
+    return failures
+
+
+
+#------------------ 可选加速后端注册表 ------------------
+def _guard(func):
+    """统一输入转换与窗口越界处理，加速实现只需处理 1<=N<=len 的情况"""
+    def wrapper(S, N):
+        x = _arr(S)
+        N = int(N)
+        if N < 1 or N > len(x):
+            return _nan_like(x)
+        return func(x, N)
+    wrapper.__name__ = getattr(func, '__name__', 'kernel')
+    return wrapper
+
+
+def _bottleneck_backend():
+    # 不提供STD：move_std 以全序列的滑动累加计算，长序列、大均值时相对误差约1e-7
+    import bottleneck as bn
+    return {
+        'MA': _guard(lambda x, N: bn.move_mean(x, N)),
+        'SUM': _guard(lambda x, N: bn.move_sum(x, N)),
+        'HHV': _guard(lambda x, N: bn.move_max(x, N)),
+        'LLV': _guard(lambda x, N: bn.move_min(x, N)),
+    }
+
+
+def _numba_backend():
+    import numba
+
+    njit = numba.njit(cache=True, nogil=True)
+
+    @njit
+    def nb_sum(x, N):
+        out = np.full(len(x), np.nan)
+        s, nans = 0.0, 0
+        for i in range(len(x)):
+            if x[i] != x[i]:
+                nans += 1
+            else:
+                s += x[i]
+            if i >= N:
+                if x[i - N] != x[i - N]:
+                    nans -= 1
+                else:
+                    s -= x[i - N]
+            if i >= N - 1 and nans == 0:
+                out[i] = s
+        return out
+
+    @njit
+    def nb_std(x, N):                                      # 滚动Welford算法，每N步按窗口重算一次以抑制累积误差
+        out = np.full(len(x), np.nan)
+        n, mean, m2, nans = 0, 0.0, 0.0, 0
+        for i in range(len(x)):
+            v = x[i]
+            if v != v:
+                nans += 1
+            else:
+                n += 1
+                delta = v - mean
+                mean += delta / n
+                m2 += delta * (v - mean)
+            if i >= N:
+                u = x[i - N]
+                if u != u:
+                    nans -= 1
+                else:
+                    n -= 1
+                    if n == 0:
+                        mean, m2 = 0.0, 0.0
+                    else:
+                        delta = u - mean
+                        mean -= delta / n
+                        m2 -= delta * (u - mean)
+            if i >= N - 1 and (i - N + 1) % N == 0:
+                n, mean, m2 = 0, 0.0, 0.0
+                for j in range(i - N + 1, i + 1):
+                    if x[j] == x[j]:
+                        n += 1
+                        delta = x[j] - mean
+                        mean += delta / n
+                        m2 += delta * (x[j] - mean)
+            if i >= N - 1 and nans == 0:
+                out[i] = np.sqrt(max(m2 / N, 0.0))
+        return out
+
+    @njit
+    def nb_extreme(x, N, sign):                            # 单调队列求滚动最值，sign=1最大，-1最小
+        out = np.full(len(x), np.nan)
+        dq = np.empty(len(x), dtype=np.int64)
+        head, tail, nans = 0, 0, 0
+        for i in range(len(x)):
+            v = x[i]
+            if v != v:
+                nans += 1
+            else:
+                while tail > head and sign * x[dq[tail - 1]] <= sign * v:
+                    tail -= 1
+                dq[tail] = i
+                tail += 1
+            if i >= N and x[i - N] != x[i - N]:
+                nans -= 1
+            while tail > head and dq[head] <= i - N:
+                head += 1
+            if i >= N - 1 and nans == 0:
+                out[i] = x[dq[head]]
+        return out
+
+    @njit
+    def nb_ewm(x, alpha):                                  # 与 pandas ewm(adjust=False) 逐点一致
+        out = np.full(len(x), np.nan)
+        weighted, old_wt = np.nan, 1.0
+        for i in range(len(x)):
+            cur = x[i]
+            if weighted == weighted:
+                old_wt *= 1.0 - alpha
+                if cur == cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                    old_wt = 1.0
+            elif cur == cur:
+                weighted = cur
+            out[i] = weighted
+        return out
+
+    @njit
+    def nb_sma(x, N, M):
+        out = nb_sum(x, N) / N
+        for i in range(N + 1, len(x)):
+            out[i] = (M * x[i] + (N - M) * out[i - 1]) / N
+        return out
+
+    @njit
+    def nb_avedev(x, N):
+        out = np.full(len(x), np.nan)
+        for i in range(N - 1, len(x)):
+            w = x[i - N + 1:i + 1]
+            out[i] = np.abs(w - w.mean()).mean()
+        return out
+
+    return {
+        'MA': _guard(lambda x, N: nb_sum(x, N) / N),
+        'SUM': _guard(nb_sum),
+        'STD': _guard(nb_std),
+        'HHV': _guard(lambda x, N: nb_extreme(x, N, 1.0)),
+        'LLV': _guard(lambda x, N: nb_extreme(x, N, -1.0)),
+        'EMA': lambda S, N: nb_ewm(_arr(S), 2.0 / (N + 1)),
+        'SMA': lambda S, N, M=1: nb_sma(_arr(S), int(N), float(M)),
+        'AVEDEV': _guard(nb_avedev),
+    }
+
+
+_BACKEND_LOADERS = {'bottleneck': _bottleneck_backend, 'numba': _numba_backend}
+
+# 每个原语按顺序选用第一个可用的后端：bottleneck的move_*是C实现的O(n)算法，
+# numba擅长逐点递推(EMA/SMA)，NumPy是兜底实现
+PREFERENCE = {
+    'MA': ('bottleneck', 'numba'), 'SUM': ('bottleneck', 'numba'), 'STD': ('numba',),
+    'HHV': ('bottleneck', 'numba'), 'LLV': ('bottleneck', 'numba'),
+    'EMA': ('numba',), 'SMA': ('numba',), 'AVEDEV': ('numba',),
+}
+
+BACKENDS = {'numpy': KERNELS}        # 已加载的后端 {名称: {原语: 函数}}
+ACTIVE = {}                          # 当前生效的实现 {原语: 函数}，MyTT通过它调用，见文末
+ACTIVE_BACKEND = {}
+
+
+def _load_backend(name):
+    if name not in BACKENDS:
+        try:
+            BACKENDS[name] = _BACKEND_LOADERS[name]()
+        except ImportError:
+            BACKENDS[name] = {}
+    return BACKENDS[name]
+
+
+def _agrees(func, name, inputs):
+    """与NumPy内核比较输出，用于启用加速实现前的自检"""
+    try:
+        for S in inputs:
+            for N in (1, 5, 26):
+                got = func(S, N)
+                if not isinstance(got, np.ndarray) or not np.allclose(got, KERNELS[name](S, N), rtol=1e-9,
+                                                                      atol=1e-9, equal_nan=True):
+                    return False
+        return True
+    except Exception:
+        return False
+
+
+def select_backend(backend=None, check=None):
+    """
+    为每个原语选择实现并更新 ACTIVE
+
+    Args:
+        backend (str): 'auto'、'numpy'、'bottleneck' 或 'numba'，默认读取环境变量 MYTT_BACKEND
+        check (bool): 是否做数值一致性自检，默认读取环境变量 MYTT_SELF_CHECK(默认开启)
+
+    Returns:
+        dict: 原语到所选后端名称的映射
+    """
+    backend = (backend or os.environ.get('MYTT_BACKEND', 'auto')).lower()
+    check = os.environ.get('MYTT_SELF_CHECK', '1') != '0' if check is None else check
+    if backend != 'auto' and backend not in ('numpy',) + tuple(_BACKEND_LOADERS):
+        print(f"未知的MyTT后端 {backend}，使用NumPy实现")
+        backend = 'numpy'
+    inputs = list(_self_check_inputs(n=120).values()) if check else []
+
+    for name in KERNELS:
+        candidates = PREFERENCE.get(name, ()) if backend == 'auto' else (backend,)
+        ACTIVE[name], ACTIVE_BACKEND[name] = KERNELS[name], 'numpy'
+        for candidate in candidates:
+            func = _load_backend(candidate).get(name) if candidate != 'numpy' else None
+            if func is None:
+                continue
+            if check and not _agrees(func, name, inputs):
+                print(f"MyTT后端 {candidate} 的 {name} 与NumPy实现结果不一致，已回退")
+                continue
+            ACTIVE[name], ACTIVE_BACKEND[name] = func, candidate
+            break
+    return dict(ACTIVE_BACKEND)
+
+
+def _deferred(name):
+    """首次调用时才选择后端，之后 ACTIVE 中已是选定的实现"""
+    def call(*args, **kwargs):
+        if ACTIVE.get(name) is call:
+            select_backend()
+        return ACTIVE[name](*args, **kwargs)
+    return call
+
+
+ACTIVE.update({name: _deferred(name) for name in KERNELS})
+
+
+if __name__ == '__main__':
+    self_check()
+    select_backend()
+    print("当前生效的后端:", ACTIVE_BACKEND)
+    self_check(ACTIVE)
@@ -1,10 +1,19 @@
+import asyncio
 import json
 import os
-from typing import Dict, Any, Optional
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
 
 import openai
 import pandas as pd
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from features import extract_features
+from indicator_block import IndicatorBlock
 
 
 def format_analysis_result(result: Dict[str, Any]) -> Dict[str, Any]:
@@ -39,20 +48,21 @@ def _create_system_prompt() -> str:
     Returns:
         str: 系统提示词
     """
-    return """你是一个专业的金融分析师，将收到完整的股票历史数据和技术指标数据进行分析。
+    return """你是一个专业的金融分析师，将收到一只股票的预处理数据和技术指标数据进行分析。
 数据包括：
-1. 历史数据：每日的开盘价、收盘价、最高价、最低价和成交量
-2. 技术指标：所有交易日的各项技术指标数据
-3. 市场趋势：当前的关键趋势数据
+1. 关键特征：由完整历史数据预先计算的支撑位和压力位(含触及次数)、近期拐点、成交量分布、MACD/RSI与价格的背离以及趋势统计
+2. 近期数据：最近交易日的行情与主要指标，字段顺序见"字段"
+3. 最新指标：最新交易日的全部技术指标
+4. 市场趋势：当前的关键趋势数据
 
-请基于这些完整的历史数据进行深入分析，包括以下方面：
+请基于这些数据进行深入分析，包括以下方面：
 
 1. 技术面分析
-- 通过历史数据分析长期趋势
-- 识别关键的支撑位和压力位
+- 结合趋势统计分析长期趋势
+- 依据给出的支撑位和压力位判断关键价位
 - 分析重要的技术形态
 - 对所有技术指标进行综合研判
-- 寻找指标之间的背离现象
+- 结合给出的背离信息研判指标与价格的关系
 
 2. 走势研判
 - 判断当前趋势的强度和可能持续性
@@ -67,16 +77,16 @@ def _create_system_prompt() -> str:
 - 针对不同投资周期给出建议
 
 4. 风险提示
-- 通过历史数据识别潜在风险
+- 结合关键特征识别潜在风险
 - 列出需要警惕的技术信号
 - 提供风险规避的具体建议
 - 说明需要持续关注的指标
 
 请注意：
-- 结合全部历史数据做出判断
+- 以给出的关键特征和近期数据为依据做出判断
 - 分析结果要有数据支持
 - 避免过度简化或主观判断
-- 必要时引用具体的历史数据点
+- 必要时引用具体的价位和日期
 - 结合多个维度的指标进行交叉验证
 
 按照以下固定格式输出分析结果,不要包含任何markdown标记：
@@ -152,101 +162,109 @@ RSI指标
 """
 
 
-def _format_data_for_prompt(df: pd.DataFrame, technical_indicators: pd.DataFrame) -> str:
+# 提示词中逐日列出的最近交易日数量，更早的走势以预先计算的特征概括
+RECENT_DAYS = 20
+
+# 近期数据表的列: (表头, 列名)
+RECENT_COLUMNS = [
+    ("日期", None), ("开盘", "open"), ("最高", "high"), ("最低", "low"), ("收盘", "close"), ("成交量", "volume"),
+    ("DIF", "DIF"), ("DEA", "DEA"), ("MACD", "MACD"), ("K", "K"), ("D", "D"), ("J", "J"), ("RSI", "RSI"),
+]
+
+
+def _indicator_snapshot(row: Dict[str, float]) -> Dict[str, Any]:
     """
-    将数据格式化为提示词，对早期数据进行采样处理
+    单个交易日的全部技术指标，按类别分组
 
     Args:
-        df (pd.DataFrame): 原始股票数据
-        technical_indicators (pd.DataFrame): 技术指标数据
+        row (Dict[str, float]): 技术指标数据的一行，见 IndicatorBlock.row()
 
     Returns:
-        str: 格式化后的数据字符串
+        Dict[str, Any]: 分组后的指标值
     """
-    # 复制数据框以避免修改原始数据
-    df_dict = df.copy()
-    technical_indicators_dict = technical_indicators.copy()
+    return {
+        "趋势指标": {
+            "MACD": f"{row['MACD']:.2f}",
+            "DIF": f"{row['DIF']:.2f}",
+            "DEA": f"{row['DEA']:.2f}",
+            "MA5": f"{row['MA5']:.2f}",
+            "MA10": f"{row['MA10']:.2f}",
+            "MA20": f"{row['MA20']:.2f}",
+            "MA60": f"{row['MA60']:.2f}",
+            "TRIX": f"{row['TRIX']:.2f}",
+            "TRMA": f"{row['TRMA']:.2f}"
+        },
+        "摆动指标": {
+            "KDJ-K": f"{row['K']:.2f}",
+            "KDJ-D": f"{row['D']:.2f}",
+            "KDJ-J": f"{row['J']:.2f}",
+            "RSI": f"{row['RSI']:.2f}",
+            "CCI": f"{row['CCI']:.2f}",
+            "BIAS1": f"{row['BIAS1']:.2f}",
+            "BIAS2": f"{row['BIAS2']:.2f}",
+            "BIAS3": f"{row['BIAS3']:.2f}"
+        },
+        "布林带": {
+            "上轨": f"{row['BOLL_UP']:.2f}",
+            "中轨": f"{row['BOLL_MID']:.2f}",
+            "下轨": f"{row['BOLL_LOW']:.2f}"
+        },
+        "动向指标": {
+            "PDI": f"{row['PDI']:.2f}",
+            "MDI": f"{row['MDI']:.2f}",
+            "ADX": f"{row['ADX']:.2f}",
+            "ADXR": f"{row['ADXR']:.2f}"
+        },
+        "成交量指标": {
+            "VR": f"{row['VR']:.2f}",
+            "AR": f"{row['AR']:.2f}",
+            "BR": f"{row['BR']:.2f}",
+        },
+        "动量指标": {
+            "ROC": f"{row['ROC']:.2f}",
+            "MAROC": f"{row['MAROC']:.2f}",
+            "MTM": f"{row['MTM']:.2f}",
+            "MTMMA": f"{row['MTMMA']:.2f}",
+            "DPO": f"{row['DPO']:.2f}",
+            "MADPO": f"{row['MADPO']:.2f}"
+        },
+        "其他指标": {
+            "EMV": f"{row['EMV']:.2f}",
+            "MAEMV": f"{row['MAEMV']:.2f}",
+            "DIF_DMA": f"{row['DIF_DMA']:.2f}",
+            "DIFMA_DMA": f"{row['DIFMA_DMA']:.2f}"
+        }
+    }
 
-    # 将时间索引转换为字符串格式
-    df_dict.index = df_dict.index.strftime('%Y-%m-%d')
-    technical_indicators_dict.index = technical_indicators_dict.index.strftime('%Y-%m-%d')
 
-    # 分割数据：最近60天的数据和之前的数据
-    recent_dates = list(df_dict.index)[-60:]
-    early_dates = list(df_dict.index)[:-60]
+def _format_data_for_prompt(df: pd.DataFrame, technical_indicators: pd.DataFrame,
+                            recent_days: int = RECENT_DAYS) -> str:
+    """
+    将数据格式化为提示词：预先计算的关键特征 + 最近若干交易日的数据 + 最新指标
+
+    支撑/压力位、背离和趋势统计在本地计算(见 features.py)，不再逐行发送完整历史
 
-    # 对早期数据进行采样（每2天取一个点）
-    sampled_early_dates = early_dates[::2]
+    Args:
+        df (pd.DataFrame): 原始股票数据
+        technical_indicators (pd.DataFrame): 技术指标数据
+        recent_days (int): 逐日列出的最近交易日数量
 
-    # 合并采样后的日期和最近日期
-    selected_dates = sampled_early_dates + recent_dates
+    Returns:
+        str: 格式化后的数据字符串
+    """
+    block = IndicatorBlock.from_frame(technical_indicators)
+    columns = [column for _, column in RECENT_COLUMNS[1:]]
+    dates = block.index[-recent_days:].strftime('%Y-%m-%d')
+    rows = [[date] + [int(x) if column == 'volume' else round(x, 2) for column, x in zip(columns, values)]
+            for date, values in zip(dates, block.tail(recent_days, columns).tolist())]
 
-    # 构建完整的数据字典，只包含选定的日期
     data_dict = {
-        "历史数据": {
-            date: {
-                "开盘价": f"{df_dict.loc[date, 'open']:.2f}",
-                "收盘价": f"{df_dict.loc[date, 'close']:.2f}",
-                "最高价": f"{df_dict.loc[date, 'high']:.2f}",
-                "最低价": f"{df_dict.loc[date, 'low']:.2f}",
-                "成交量": f"{int(df_dict.loc[date, 'volume']):,}"
-            } for date in selected_dates
+        "关键特征": extract_features(df, technical_indicators),
+        "近期数据": {
+            "字段": [title for title, _ in RECENT_COLUMNS],
+            "数据": rows
         },
-        "技术指标": {
-            date: {
-                "趋势指标": {
-                    "MACD": f"{technical_indicators_dict.loc[date, 'MACD']:.2f}",
-                    "DIF": f"{technical_indicators_dict.loc[date, 'DIF']:.2f}",
-                    "DEA": f"{technical_indicators_dict.loc[date, 'DEA']:.2f}",
-                    "MA5": f"{technical_indicators_dict.loc[date, 'MA5']:.2f}",
-                    "MA10": f"{technical_indicators_dict.loc[date, 'MA10']:.2f}",
-                    "MA20": f"{technical_indicators_dict.loc[date, 'MA20']:.2f}",
-                    "MA60": f"{technical_indicators_dict.loc[date, 'MA60']:.2f}",
-                    "TRIX": f"{technical_indicators_dict.loc[date, 'TRIX']:.2f}",
-                    "TRMA": f"{technical_indicators_dict.loc[date, 'TRMA']:.2f}"
-                },
-                "摆动指标": {
-                    "KDJ-K": f"{technical_indicators_dict.loc[date, 'K']:.2f}",
-                    "KDJ-D": f"{technical_indicators_dict.loc[date, 'D']:.2f}",
-                    "KDJ-J": f"{technical_indicators_dict.loc[date, 'J']:.2f}",
-                    "RSI": f"{technical_indicators_dict.loc[date, 'RSI']:.2f}",
-                    "CCI": f"{technical_indicators_dict.loc[date, 'CCI']:.2f}",
-                    "BIAS1": f"{technical_indicators_dict.loc[date, 'BIAS1']:.2f}",
-                    "BIAS2": f"{technical_indicators_dict.loc[date, 'BIAS2']:.2f}",
-                    "BIAS3": f"{technical_indicators_dict.loc[date, 'BIAS3']:.2f}"
-                },
-                "布林带": {
-                    "上轨": f"{technical_indicators_dict.loc[date, 'BOLL_UP']:.2f}",
-                    "中轨": f"{technical_indicators_dict.loc[date, 'BOLL_MID']:.2f}",
-                    "下轨": f"{technical_indicators_dict.loc[date, 'BOLL_LOW']:.2f}"
-                },
-                "动向指标": {
-                    "PDI": f"{technical_indicators_dict.loc[date, 'PDI']:.2f}",
-                    "MDI": f"{technical_indicators_dict.loc[date, 'MDI']:.2f}",
-                    "ADX": f"{technical_indicators_dict.loc[date, 'ADX']:.2f}",
-                    "ADXR": f"{technical_indicators_dict.loc[date, 'ADXR']:.2f}"
-                },
-                "成交量指标": {
-                    "VR": f"{technical_indicators_dict.loc[date, 'VR']:.2f}",
-                    "AR": f"{technical_indicators_dict.loc[date, 'AR']:.2f}",
-                    "BR": f"{technical_indicators_dict.loc[date, 'BR']:.2f}",
-                },
-                "动量指标": {
-                    "ROC": f"{technical_indicators_dict.loc[date, 'ROC']:.2f}",
-                    "MAROC": f"{technical_indicators_dict.loc[date, 'MAROC']:.2f}",
-                    "MTM": f"{technical_indicators_dict.loc[date, 'MTM']:.2f}",
-                    "MTMMA": f"{technical_indicators_dict.loc[date, 'MTMMA']:.2f}",
-                    "DPO": f"{technical_indicators_dict.loc[date, 'DPO']:.2f}",
-                    "MADPO": f"{technical_indicators_dict.loc[date, 'MADPO']:.2f}"
-                },
-                "其他指标": {
-                    "EMV": f"{technical_indicators_dict.loc[date, 'EMV']:.2f}",
-                    "MAEMV": f"{technical_indicators_dict.loc[date, 'MAEMV']:.2f}",
-                    "DIF_DMA": f"{technical_indicators_dict.loc[date, 'DIF_DMA']:.2f}",
-                    "DIFMA_DMA": f"{technical_indicators_dict.loc[date, 'DIFMA_DMA']:.2f}"
-                }
-            } for date in selected_dates
-        }
+        "最新指标": _indicator_snapshot(block.row())
     }
 
     # 计算关键变化率
@@ -265,7 +283,46 @@ def _format_data_for_prompt(df: pd.DataFrame, technical_indicators: pd.DataFrame
         "平均成交量": f"{int(df['volume'].mean()):,}"
     }
 
-    return json.dumps(data_dict, ensure_ascii=False, indent=2)
+    return json.dumps(data_dict, ensure_ascii=False, separators=(',', ':'))
+
+
+def format_market_context(name: str, df: pd.DataFrame, recent_days: int = RECENT_DAYS) -> str:
+    """
+    将大盘指数数据格式化为本次运行所有股票共用的背景信息
+
+    内容只取决于指数数据本身，同一次运行中逐字节相同，放在提示词前缀中可以命中服务端的前缀缓存
+
+    Args:
+        name (str): 指数名称
+        df (pd.DataFrame): 指数日线数据
+        recent_days (int): 列出的最近交易日数量
+
+    Returns:
+        str: 格式化后的背景信息
+    """
+    recent = df.iloc[-recent_days:]
+    pct = recent['close'].pct_change().mul(100).round(2).fillna(0)
+    data_dict = {
+        "指数": name,
+        "关键特征": extract_features(df),
+        "近期走势": {
+            "字段": ["日期", "收盘", "涨跌幅%"],
+            "数据": [[date.strftime('%Y-%m-%d'), round(float(close), 2), float(p)]
+                   for date, close, p in zip(recent.index, recent['close'], pct)]
+        }
+    }
+    return json.dumps(data_dict, ensure_ascii=False, separators=(',', ':'))
+
+
+def _cached_tokens(usage: Any) -> Optional[int]:
+    """从响应的usage中读取命中前缀缓存的token数，兼容DeepSeek和OpenAI两种字段"""
+    if usage is None:
+        return None
+    hit = getattr(usage, 'prompt_cache_hit_tokens', None)
+    if hit is not None:
+        return hit
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return getattr(details, 'cached_tokens', None) if details is not None else None
 
 
 def _parse_analysis_response(analysis_text: str) -> Dict[str, Any]:
@@ -348,15 +405,132 @@ def _parse_analysis_response(analysis_text: str) -> Dict[str, Any]:
     }
 
 
+# 批量模式下每只股票逐日列出的交易日数量，压缩单只股票的数据量
+BATCH_RECENT_DAYS = 10
+
+# 批量响应中每只股票输出段的分隔行，例如 =====sh600000=====
+_BATCH_MARKER = re.compile(r'^\s*=+\s*(\S+?)\s*=+\s*$', re.M)
+
+
+def _batch_instruction(codes: List[str]) -> str:
+    """批量请求的说明，规定每只股票输出段的分隔格式"""
+    return (f"以下是{len(codes)}只股票的数据，请对每只股票分别独立分析，均按系统提示中的固定格式输出。\n"
+            f"每只股票的输出必须以单独一行 =====股票代码===== 开头，依次为: "
+            f"{', '.join('=====' + code + '=====' for code in codes)}；"
+            f"全部输出结束后单独输出一行 =====END=====，不要在各股票的输出之外添加其他内容。")
+
+
+def _split_batch_response(text: str, codes: List[str]) -> Dict[str, str]:
+    """
+    按分隔行把批量响应拆分为各股票的分析文本
+
+    Args:
+        text (str): 模型输出的完整文本
+        codes (List[str]): 本批次的股票代码
+
+    Returns:
+        Dict[str, str]: 股票代码到分析文本的映射，缺失的股票不在结果中
+    """
+    parts: Dict[str, str] = {}
+    markers = list(_BATCH_MARKER.finditer(text))
+    for i, m in enumerate(markers):
+        code = m.group(1)
+        if code in codes and code not in parts:
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+            parts[code] = text[m.end():end].strip()
+    return parts
+
+
+def _analysis_complete(result: Optional[Dict[str, Any]]) -> bool:
+    """解析结果是否包含全部主要部分"""
+    sections = (result or {}).get("AI分析结果", {})
+    return all(sections.get(name) for name in ("技术分析", "走势分析", "投资建议", "风险提示"))
+
+
 class APIBusyError(Exception):
     """API服务器繁忙时抛出的异常"""
     pass
 
 
+class LLMEndpoint:
+    """一个 LLM 服务端点(地址 + 模型)，记录最近的请求耗时用于路由和对冲"""
+
+    def __init__(self, api_key: str, base_url: str, model: str, client: Optional[AsyncOpenAI] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self._client = client
+        self.latencies: deque = deque(maxlen=50)
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """异步客户端，只在 LLMAnalyzer 的事件循环线程中使用，关闭后下次使用时重新创建"""
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    async def aclose(self) -> None:
+        """关闭客户端的连接池"""
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        """记录一次请求结果，成功时记录耗时，失败时累计连续失败次数"""
+        with self._lock:
+            if ok:
+                self.latencies.append(latency)
+                self.failures = 0
+            else:
+                self.failures += 1
+
+    def quantile(self, q: float = 0.95) -> Optional[float]:
+        """最近请求耗时的分位数，样本不足5个时返回None"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < 5:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __repr__(self) -> str:
+        return f"{self.model}@{self.base_url}"
+
+
+def _load_endpoints_from_env(default_key: str) -> List[Dict[str, str]]:
+    """
+    读取环境变量 LLM_ENDPOINTS 中的备用端点
+
+    格式为JSON数组，例如 [{"base_url": "https://...", "model": "...", "api_key": "..."}]，
+    api_key 省略时使用主端点的密钥
+    """
+    raw = os.environ.get('LLM_ENDPOINTS')
+    if not raw:
+        return []
+    try:
+        entries = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"LLM_ENDPOINTS 格式错误，忽略备用端点: {str(e)}")
+        return []
+    return [{"api_key": e.get("api_key", default_key), "base_url": e["base_url"], "model": e.get("model", "")}
+            for e in entries if e.get("base_url")]
+
+
+def _is_retryable(error: Exception) -> bool:
+    """服务繁忙、超时、连接错误、限流和5xx错误可以重试或切换端点，其余错误(如鉴权失败)直接抛出"""
+    if isinstance(error, (APIBusyError, openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
 class LLMAnalyzer:
     """使用 OpenAI SDK 与 llm API 交互的类"""
 
-    def __init__(self, api_key: str, base_url: str, model: str = None):
+    def __init__(self, api_key: str, base_url: str, model: str = None, endpoints: Optional[List[Dict[str, str]]] = None,
+                 hedge_delay: Optional[float] = None, max_retries: int = 3, backoff: float = 2.0):
         """
         初始化 llm 分析器
 
@@ -364,12 +538,243 @@ class LLMAnalyzer:
             api_key (str): llm API 密钥
             base_url (str): llm API 基础 URL
             model (str): 使用的模型名称，默认为None则使用环境变量或空字符串
+            endpoints (List[Dict[str, str]]): 备用端点 [{"base_url", "model", "api_key"}]，默认读取环境变量 LLM_ENDPOINTS
+            hedge_delay (float): 请求超过该秒数仍未返回时发出对冲请求，默认按端点最近耗时的p95自适应，
+                                 也可用环境变量 LLM_HEDGE_DELAY 指定，0表示关闭对冲
+            max_retries (int): 可重试错误的最大重试次数
+            backoff (float): 指数退避的基础等待秒数
         """
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=base_url
-        )
         self.model = model or os.environ.get('LLM_MODEL', '')
+        # 主端点在前，备用端点按配置顺序排列
+        self.endpoints = [LLMEndpoint(api_key, base_url, self.model)]
+        for e in (endpoints if endpoints is not None else _load_endpoints_from_env(api_key)):
+            self.endpoints.append(LLMEndpoint(e.get("api_key", api_key), e["base_url"], e.get("model") or self.model))
+        env_delay = os.environ.get('LLM_HEDGE_DELAY')
+        self.hedge_delay = hedge_delay if hedge_delay is not None else (float(env_delay) if env_delay else None)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # 请求在后台线程的事件循环中以异步任务执行，对冲落后的请求可以直接取消
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        # 所有股票共用的大盘背景，与系统提示词一起构成稳定的公共前缀
+        self.market_context: Optional[str] = None
+        self.usage = {"请求次数": 0, "输入tokens": 0, "缓存命中tokens": 0}
+        self._usage_lock = threading.Lock()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """所有请求共用的事件循环，首次请求时在后台线程中启动"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name='llm-loop', daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def close(self) -> None:
+        """取消进行中的请求，关闭各端点的连接并停止事件循环；之后再发请求时自动重新启动"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = self._loop_thread = None
+        if loop is None:
+            return
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for endpoint in self.endpoints:
+                await endpoint.aclose()
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=30)
+        except Exception as e:
+            print(f"关闭LLM客户端时出错: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def set_market_context(self, context: Optional[str]) -> None:
+        """设置本次运行共用的大盘背景信息，None表示不附带"""
+        self.market_context = context
+
+    def _build_messages(self, data_str: str, instruction: str = "请分析以下股票数据并给出专业的分析意见：") -> list:
+        """
+        构建请求消息：系统提示词(分析要求与输出格式) + 大盘背景在前，作为所有股票相同的前缀，
+        股票数据放在最后
+
+        Args:
+            data_str (str): 格式化后的股票数据
+            instruction (str): 放在股票数据之前的请求说明
+
+        Returns:
+            list: 消息列表
+        """
+        system_prompt = _create_system_prompt()
+        if self.market_context:
+            system_prompt += f"大盘背景数据(所有股票共用，分析个股时请结合大盘环境)：\n{self.market_context}\n"
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"{instruction}\n{data_str}"}
+        ]
+
+    def _record_usage(self, usage: Any) -> None:
+        """累计并打印token用量，包括服务端报告的前缀缓存命中数"""
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        cached = _cached_tokens(usage)
+        with self._usage_lock:
+            self.usage["请求次数"] += 1
+            self.usage["输入tokens"] += prompt_tokens
+            self.usage["缓存命中tokens"] += cached or 0
+        if cached is None:
+            print(f"输入tokens: {prompt_tokens}，服务端未报告缓存命中数")
+        else:
+            print(f"输入tokens: {prompt_tokens}，缓存命中: {cached} ({cached / max(prompt_tokens, 1):.0%})")
+
+    def usage_summary(self) -> str:
+        """本次运行的token用量汇总"""
+        with self._usage_lock:
+            u = dict(self.usage)
+        ratio = u["缓存命中tokens"] / max(u["输入tokens"], 1)
+        return (f"AI请求 {u['请求次数']} 次，输入tokens {u['输入tokens']}，"
+                f"缓存命中 {u['缓存命中tokens']} ({ratio:.0%})")
+
+    def _route(self) -> List[LLMEndpoint]:
+        """按连续失败次数和最近p95耗时排序端点，没有耗时数据的端点保持配置顺序"""
+        order = {id(ep): i for i, ep in enumerate(self.endpoints)}
+
+        def key(ep):
+            p95 = ep.quantile(0.95)
+            return ep.failures, p95 if p95 is not None else float('inf'), order[id(ep)]
+        return sorted(self.endpoints, key=key)
+
+    def _hedge_after(self, endpoint: LLMEndpoint) -> Optional[float]:
+        """首个请求的对冲等待时间，None表示不对冲"""
+        if self.hedge_delay is not None:
+            return self.hedge_delay or None
+        p95 = endpoint.quantile(0.95)
+        return p95 if p95 is not None else None
+
+    async def _call_endpoint(self, endpoint: LLMEndpoint, messages: list) -> Any:
+        """向单个端点发送请求，空响应视为服务繁忙"""
+        start = time.perf_counter()
+        try:
+            response = await endpoint.client.chat.completions.create(
+                model=endpoint.model,
+                messages=messages,
+                temperature=1.0,
+                stream=False
+            )
+        except Exception as api_e:
+            endpoint.record(None, False)
+            # 检查是否是空响应导致的JSON解析错误
+            if str(api_e).startswith("Expecting value: line 1 column 1 (char 0)"):
+                print(f"端点 {endpoint} 返回空响应，服务器可能繁忙")
+                raise APIBusyError("API服务器繁忙，返回空响应") from api_e
+            raise
+        if not response or not getattr(response, 'choices', None):
+            endpoint.record(None, False)
+            print(f"端点 {endpoint} 返回空响应或响应缺少choices，服务器可能繁忙")
+            raise APIBusyError("API服务器繁忙，响应为空")
+        endpoint.record(time.perf_counter() - start, True)
+        return response
+
+    def _hedged_call(self, messages: list) -> Any:
+        """
+        对冲请求：首选端点超过对冲等待时间仍未返回时，向下一个端点(只有一个端点时为同一端点)
+        发出重复请求，取先完成的结果；端点出错时立即切换到尚未尝试的端点。
+        先完成的请求返回后，其余请求的任务被取消并断开连接，不再等待其生成结果
+
+        Args:
+            messages (list): 消息列表
+
+        Returns:
+            Any: 先成功返回的响应
+        """
+        return asyncio.run_coroutine_threadsafe(self._hedged(messages), self._event_loop()).result()
+
+    async def _hedged(self, messages: list) -> Any:
+        """_hedged_call 在事件循环中的实现"""
+        candidates = self._route()
+        active = set()
+        launched = 0
+        last_error = None
+
+        def launch():
+            nonlocal launched
+            endpoint = candidates[launched % len(candidates)]
+            launched += 1
+            active.add(asyncio.ensure_future(self._call_endpoint(endpoint, messages)))
+
+        launch()
+        hedge_after = self._hedge_after(candidates[0])
+        try:
+            while active:
+                timeout = hedge_after if launched == 1 else None
+                done, _ = await asyncio.wait(active, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print(f"请求超过 {timeout:.1f} 秒未返回，发出对冲请求")
+                    launch()
+                    continue
+                for task in done:
+                    active.discard(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        last_error = e
+                if not active and launched < len(candidates) and _is_retryable(last_error):
+                    print(f"请求失败({str(last_error)})，切换到端点 {candidates[launched % len(candidates)]}")
+                    launch()
+            raise last_error
+        finally:
+            # 取消落后的请求，任务取消时关闭其HTTP连接
+            for task in active:
+                task.cancel()
+            if active:
+                await asyncio.gather(*active, return_exceptions=True)
+
+    def _complete(self, messages: list) -> Optional[str]:
+        """
+        发送一次对话请求并返回模型输出的文本
+
+        Args:
+            messages (list): 消息列表
+
+        Returns:
+            Optional[str]: 分析文本；空响应按服务繁忙处理，与其他可重试错误一起退避重试，重试耗尽后抛出
+        """
+        # 发送请求，可重试的错误按指数退避重试
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._hedged_call(messages)
+                break
+            except Exception as api_e:
+                if not _is_retryable(api_e) or attempt == self.max_retries:
+                    print(f"API请求发送失败: {str(api_e)}")
+                    raise
+                wait_s = self.backoff * 2 ** attempt * (0.5 + random.random())
+                print(f"API请求失败({str(api_e)})，{wait_s:.1f}秒后第{attempt + 1}次重试")
+                time.sleep(wait_s)
+
+        print("API请求发送成功")
+        self._record_usage(getattr(response, 'usage', None))
+
+        # 记录原始响应以便调试
+        print("API 原始响应类型:", type(response))
+        print("API 原始响应内容:", response)
+
+        # 解析响应
+        try:
+            analysis_text = response.choices[0].message.content
+            print("成功获取分析文本内容")
+            print("分析文本:", analysis_text)
+        except Exception as text_e:
+            print(f"获取分析文本失败: {str(text_e)}")
+            raise
+        return analysis_text
 
     def request_analysis(self, df: pd.DataFrame, technical_indicators: pd.DataFrame) -> Optional[Dict[str, Any]]:
         """
@@ -390,57 +795,14 @@ class LLMAnalyzer:
 
             # 构建消息
             print("构建API请求消息...")
-            messages = [
-                {"role": "system", "content": _create_system_prompt()},
-                {"role": "user", "content": f"请分析以下股票数据并给出专业的分析意见：\n{data_str}"}
-            ]
+            messages = self._build_messages(data_str)
             print(f"消息构建完成，系统提示词长度: {len(messages[0]['content'])}")
             print(f"用户消息长度: {len(messages[1]['content'])}")
 
-            # 发送请求
-            print("开始发送API请求...")
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=1.0,
-                    stream=False
-                )
-                print("API请求发送成功")
-            except Exception as api_e:
-                # 检查是否是空响应导致的JSON解析错误
-                if str(api_e).startswith("Expecting value: line 1 column 1 (char 0)"):
-                    print("API返回空响应，服务器可能繁忙")
-                    raise APIBusyError("API服务器繁忙，返回空响应") from api_e
-                print(f"API请求发送失败: {str(api_e)}")
-                raise  # 重新抛出其他类型的异常
-
-            # 记录原始响应以便调试
-            print("API 原始响应类型:", type(response))
-            print("API 原始响应内容:", response)
-
-            # 检查响应内容
-            if not response:
-                print("API返回空响应")
+            analysis_text = self._complete(messages)
+            if analysis_text is None:
                 return format_analysis_result({})
 
-            if not hasattr(response, 'choices'):
-                print(f"API响应缺少choices属性，响应结构: {dir(response)}")
-                return format_analysis_result({})
-
-            if not response.choices:
-                print("API响应的choices为空")
-                return format_analysis_result({})
-
-            # 解析响应
-            try:
-                analysis_text = response.choices[0].message.content
-                print("成功获取分析文本内容")
-                print("分析文本:", analysis_text)
-            except Exception as text_e:
-                print(f"获取分析文本失败: {str(text_e)}")
-                raise
-
             # 将文本响应组织成结构化数据
             print("开始解析分析文本...")
             result = _parse_analysis_response(analysis_text)
@@ -488,3 +850,41 @@ class LLMAnalyzer:
             import traceback
             traceback.print_exc()
             return format_analysis_result({})
+
+    def request_analysis_batch(self, items: Dict[str, Tuple[pd.DataFrame, pd.DataFrame]],
+                               batch_size: int = 5) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        批量分析多只股票：每批的股票数据合并为一次请求，按分隔行拆分响应后逐只解析，
+        请求失败或某只股票的输出无法解析时，该股票改为单独请求
+
+        Args:
+            items (Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]): {股票代码: (原始数据, 技术指标数据)}
+            batch_size (int): 每次请求包含的股票数量
+
+        Returns:
+            Dict[str, Optional[Dict[str, Any]]]: 股票代码到分析结果的映射
+        """
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        codes = list(items)
+        batch_size = max(1, int(batch_size))
+        for start in range(0, len(codes), batch_size):
+            chunk = codes[start:start + batch_size]
+            texts: Dict[str, str] = {}
+            if len(chunk) > 1:
+                print(f"批量请求AI分析: {', '.join(chunk)}")
+                payload = '\n'.join(f"【股票 {code}】\n{_format_data_for_prompt(*items[code], recent_days=BATCH_RECENT_DAYS)}"
+                                    for code in chunk)
+                try:
+                    text = self._complete(self._build_messages(payload, _batch_instruction(chunk)))
+                    texts = _split_batch_response(text or '', chunk)
+                except Exception as e:
+                    print(f"批量请求失败，改为逐只请求: {str(e)}")
+
+            for code in chunk:
+                result = _parse_analysis_response(texts[code]) if code in texts else None
+                if not _analysis_complete(result):
+                    if len(chunk) > 1:
+                        print(f"股票 {code} 的批量分析结果缺失或无法解析，改为单独请求")
+                    result = self.request_analysis(*items[code])
+                results[code] = result
+        return results
@@ -1,16 +1,61 @@
 import base64
+import gzip
+import hashlib
+import json
 import os
 from datetime import datetime
 from io import BytesIO
 from string import Template
 import matplotlib.pyplot as plt
 import numpy as np
-import plotly.graph_objs as go
+import pandas as pd
 import pytz
-from plotly.subplots import make_subplots
 import Ashare as as_api
-import MyTT as mt
-from llm import LLMAnalyzer
+import charts
+import formula
+from indicator_block import IndicatorBlock
+import symbols
+from llm import LLMAnalyzer, format_market_context
+from transport import install_from_env
+
+try:
+    import brotli  # 可选依赖，未安装时只生成gzip压缩版本
+except ImportError:
+    brotli = None
+
+# 作为所有股票共用AI分析背景的大盘指数
+MARKET_INDEX = ('上证指数', 'sh000001')
+
+# 技术指标列名 -> 公式输出名
+INDICATOR_COLUMNS = {
+    'MACD': 'MACD.MACD', 'DIF': 'MACD.DIF', 'DEA': 'MACD.DEA',
+    'K': 'KDJ.K', 'D': 'KDJ.D', 'J': 'KDJ.J',
+    'BOLL_UP': 'BOLL.UPPER', 'BOLL_MID': 'BOLL.MID', 'BOLL_LOW': 'BOLL.LOWER',
+    'RSI': 'RSI.RSI', 'PSY': 'PSY.PSY', 'PSYMA': 'PSY.PSYMA', 'WR': 'WR.WR', 'WR1': 'WR.WR1',
+    'BIAS1': 'BIAS.BIAS1', 'BIAS2': 'BIAS.BIAS2', 'BIAS3': 'BIAS.BIAS3', 'CCI': 'CCI.CCI',
+    'MA5': 'MA.MA5', 'MA10': 'MA.MA10', 'MA20': 'MA.MA20', 'MA60': 'MA.MA60',
+    'ATR': 'ATR.ATR', 'EMV': 'EMV.EMV', 'MAEMV': 'EMV.MAEMV',
+    'DPO': 'DPO.DPO', 'MADPO': 'DPO.MADPO',  # 区间振荡
+    'TRIX': 'TRIX.TRIX', 'TRMA': 'TRIX.TRMA',  # 三重指数平滑平均
+    'PDI': 'DMI.PDI', 'MDI': 'DMI.MDI', 'ADX': 'DMI.ADX', 'ADXR': 'DMI.ADXR',  # 动向指标
+    'VR': 'VR.VR',  # 成交量比率
+    'AR': 'BRAR.AR', 'BR': 'BRAR.BR',  # 人气意愿指标
+    'ROC': 'ROC.ROC', 'MAROC': 'ROC.MAROC',  # 变动率
+    'MTM': 'MTM.MTM', 'MTMMA': 'MTM.MTMMA',  # 动量指标
+    'DIF_DMA': 'DMA.DIF', 'DIFMA_DMA': 'DMA.DIFMA',  # 平行线差指标
+}
+
+# 全部指标编译到同一个程序中，跨指标共享 REF(CLOSE,1)、MA(CLOSE,N) 等公共子表达式
+INDICATOR_PROGRAM = formula.builtin(
+    ['MACD', 'KDJ', 'BOLL', 'RSI', 'PSY', 'WR', 'BIAS', 'CCI', 'ATR', 'EMV', 'DPO', 'TRIX', 'DMI', 'VR', 'BRAR',
+     'ROC', 'MTM', 'DMA'],
+    overrides={'RSI': {'N': 14}},
+    extra={'MA': 'MA5:MA(CLOSE,5); MA10:MA(CLOSE,10); MA20:MA(CLOSE,20); MA60:MA(CLOSE,60);'}
+)
+
+
+# 交易信号用到的列
+SIGNAL_COLUMNS = ('close', 'MACD', 'K', 'D', 'RSI', 'BOLL_UP', 'BOLL_LOW', 'PDI', 'MDI', 'VR', 'ROC', 'MAROC')
 
 
 def generate_trading_signals(df):
@@ -22,46 +67,49 @@ def generate_trading_signals(df):
         return ["数据不足，无法进行技术分析"]
 
     try:
+        # 最新一行和前一行一次取出
+        cur, prev = IndicatorBlock.from_frame(df).rows(2, SIGNAL_COLUMNS)
+
         # MACD信号
-        if df['MACD'].iloc[-1] > 0 >= df['MACD'].iloc[-2]:
+        if cur['MACD'] > 0 >= prev['MACD']:
             signals.append("MACD金叉形成，可能上涨")
-        elif df['MACD'].iloc[-1] < 0 <= df['MACD'].iloc[-2]:
+        elif cur['MACD'] < 0 <= prev['MACD']:
             signals.append("MACD死叉形成，可能下跌")
 
         # KDJ信号
-        if df['K'].iloc[-1] < 20 and df['D'].iloc[-1] < 20:
+        if cur['K'] < 20 and cur['D'] < 20:
             signals.append("KDJ超卖，可能反弹")
-        elif df['K'].iloc[-1] > 80 and df['D'].iloc[-1] > 80:
+        elif cur['K'] > 80 and cur['D'] > 80:
             signals.append("KDJ超买，注意回调")
 
         # RSI信号
-        if df['RSI'].iloc[-1] < 20:
+        if cur['RSI'] < 20:
             signals.append("RSI超卖，可能反弹")
-        elif df['RSI'].iloc[-1] > 80:
+        elif cur['RSI'] > 80:
             signals.append("RSI超买，注意回调")
 
         # BOLL带信号
-        if df['close'].iloc[-1] > df['BOLL_UP'].iloc[-1]:
+        if cur['close'] > cur['BOLL_UP']:
             signals.append("股价突破布林上轨，超买状态")
-        elif df['close'].iloc[-1] < df['BOLL_LOW'].iloc[-1]:
+        elif cur['close'] < cur['BOLL_LOW']:
             signals.append("股价跌破布林下轨，超卖状态")
 
         # DMI信号
-        if df['PDI'].iloc[-1] > df['MDI'].iloc[-1] and df['PDI'].iloc[-2] <= df['MDI'].iloc[-2]:
+        if cur['PDI'] > cur['MDI'] and prev['PDI'] <= prev['MDI']:
             signals.append("DMI金叉，上升趋势形成")
-        elif df['PDI'].iloc[-1] < df['MDI'].iloc[-1] and df['PDI'].iloc[-2] >= df['MDI'].iloc[-2]:
+        elif cur['PDI'] < cur['MDI'] and prev['PDI'] >= prev['MDI']:
             signals.append("DMI死叉，下降趋势形成")
 
         # 成交量分析
-        if df['VR'].iloc[-1] > 160:
+        if cur['VR'] > 160:
             signals.append("VR大于160，市场活跃度高")
-        elif df['VR'].iloc[-1] < 40:
+        elif cur['VR'] < 40:
             signals.append("VR小于40，市场活跃度低")
 
         # ROC动量分析
-        if df['ROC'].iloc[-1] > df['MAROC'].iloc[-1] and df['ROC'].iloc[-2] <= df['MAROC'].iloc[-2]:
+        if cur['ROC'] > cur['MAROC'] and prev['ROC'] <= prev['MAROC']:
             signals.append("ROC上穿均线，上升动能增强")
-        elif df['ROC'].iloc[-1] < df['MAROC'].iloc[-1] and df['ROC'].iloc[-2] >= df['MAROC'].iloc[-2]:
+        elif cur['ROC'] < cur['MAROC'] and prev['ROC'] >= prev['MAROC']:
             signals.append("ROC下穿均线，上升动能减弱")
 
     except Exception as e:
@@ -80,6 +128,41 @@ def plot_to_base64(fig):
     return image_base64
 
 
+def write_report(html_report, output_path='public/index.html'):
+    """
+    写出HTML报告及其预压缩版本(.br/.gz)和清单文件 report-manifest.json
+
+    清单中的内容哈希供 worker.js 生成强ETag，压缩版本按 Accept-Encoding 直接返回，避免每次请求在线压缩
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    body = html_report.encode('utf-8')
+    variants = {'identity': (output_path, body), 'gzip': (output_path + '.gz', gzip.compress(body, 9, mtime=0))}
+    if brotli is not None:
+        variants['br'] = (output_path + '.br', brotli.compress(body, quality=11))
+
+    for path, data in variants.values():
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    manifest = {
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "generated": datetime.now(pytz.timezone('Asia/Shanghai')).isoformat(timespec='seconds'),
+        "files": {enc: os.path.basename(path) for enc, (path, _) in variants.items()},
+        "sizes": {enc: len(data) for enc, (_, data) in variants.items()},
+    }
+    # 清单同样先写临时文件再替换，部署时不会读到写了一半的清单
+    manifest_path = os.path.join(output_dir, 'report-manifest.json')
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    print(f"报告大小: " + "，".join(f"{enc} {size / 1024:.0f}KB" for enc, size in manifest["sizes"].items()))
+    return output_path
+
+
 def _get_value_class(value):
     """根据数值返回CSS类名"""
     try:
@@ -104,7 +187,8 @@ def _generate_table_row(key, value):
 
 
 class StockAnalyzer:
-    def __init__(self, _stock_info, count=120, llm_api_key=None, llm_base_url=None, llm_model=None):
+    def __init__(self, _stock_info, count=120, llm_api_key=None, llm_base_url=None, llm_model=None, llm_batch_size=1,
+                 processes=0):
         """
         初始化股票分析器
 
@@ -114,11 +198,21 @@ class StockAnalyzer:
             llm_api_key: llm API密钥，默认从环境变量LLM_API_KEY获取
             llm_base_url: llm API基础URL，默认从环境变量LLM_BASE_URL获取
             llm_model: llm 模型名称，默认从环境变量LLM_MODEL获取
+            llm_batch_size: 每次AI请求包含的股票数量，大于1时生成报告前批量请求AI分析
+            processes: 大于1时获取数据后通过共享内存面板多进程计算全部技术指标
         """
-        self.stock_codes = list(_stock_info.values())
+        self.stock_codes = symbols.normalize_codes(_stock_info.values())
         self.stock_names = _stock_info
+        # 代码 -> 名称，只构建一次
+        self._code_names = dict(zip(self.stock_codes, _stock_info.keys()))
         self.count = count
         self.data = {}
+        # 技术指标缓存: code -> (计算时使用的原始数据, 指标结果)，原始数据被替换后自动失效
+        self._indicator_cache = {}
+        self.llm_batch_size = llm_batch_size
+        self.processes = processes
+        # 批量请求得到的AI分析结果，由 generate_analysis_data 取用
+        self._ai_results = {}
         plt.rcParams['font.sans-serif'] = ['SimHei']
         plt.rcParams['axes.unicode_minus'] = False
 
@@ -132,41 +226,96 @@ class StockAnalyzer:
 
     def get_stock_name(self, code):
         """根据股票代码获取股票名称"""
-        return {v: k for k, v in self.stock_names.items()}.get(code, code)
+        name = self._code_names.get(code)
+        return name if name is not None else symbols.registry().name(code, code)
+
+    def prepare_market_context(self, refresh=False):
+        """
+        准备大盘指数背景信息，作为本次运行所有股票AI分析提示词的公共前缀
+
+        已准备过时直接返回，refresh为True时重新获取指数数据
+        """
+        if not self.llm or (self.llm.market_context is not None and not refresh):
+            return
+        name, code = MARKET_INDEX
+        try:
+            df = self.data.get(code) if not refresh else None
+            if df is None:
+                df = as_api.get_price(code, count=self.count, frequency='1d')
+            self.llm.set_market_context(format_market_context(name, df) if df is not None and not df.empty else '')
+        except Exception as e:
+            print(f"获取大盘背景数据失败，AI分析将不附带大盘信息: {str(e)}")
+            self.llm.set_market_context('')
+
+    def prefetch_ai_analysis(self, codes=None):
+        """按 llm_batch_size 分批请求AI分析，结果暂存后由 generate_analysis_data 直接取用"""
+        if not self.llm:
+            return
+        self.prepare_market_context()
+        items = {}
+        for code in codes or self.stock_codes:
+            if code in self.data:
+                indicators = self.calculate_indicators(code)
+                if indicators is not None:
+                    items[code] = (self.data[code], indicators)
+        if items:
+            self._ai_results.update(self.llm.request_analysis_batch(items, self.llm_batch_size))
+
+    def close(self):
+        """释放AI分析的连接和后台线程，之后再请求时自动重新建立"""
+        if self.llm:
+            self.llm.close()
 
     def fetch_data(self):
         """获取股票数据"""
         for code in self.stock_codes:
-            stock_name = self.get_stock_name(code)
-            try:
-                print(f"正在获取股票 {stock_name} ({code}) 的数据...")
-                df = as_api.get_price(code, count=self.count, frequency='1d')
+            self.fetch_stock(code)
 
-                # 检查数据是否有效
-                if df is None or df.empty:
-                    print(f"警告：股票 {stock_name} ({code}) 返回空数据")
-                    print(f"请检查股票代码是否正确。常见格式:")
-                    print(f"  - 上交所: sh000001 (上证指数), sh600000 (浦发银行)")
-                    print(f"  - 深交所: sz399001 (深证成指), sz000001 (平安银行)")
-                    continue
-
-                print(f"成功获取 {stock_name} ({code}) 数据，共 {len(df)} 条记录")
-                print(f"数据时间范围: {df.index[0]} 到 {df.index[-1]}")
-                self.data[code] = df
+    def fetch_stock(self, code):
+        """获取单只股票数据，成功返回True"""
+        stock_name = self.get_stock_name(code)
+        try:
+            print(f"正在获取股票 {stock_name} ({code}) 的数据...")
+            df = as_api.get_price(code, count=self.count, frequency='1d')
+
+            # 检查数据是否有效
+            if df is None or df.empty:
+                print(f"警告：股票 {stock_name} ({code}) 返回空数据")
+                print(f"请检查股票代码是否正确。常见格式:")
+                print(f"  - 上交所: sh000001 (上证指数), sh600000 (浦发银行)")
+                print(f"  - 深交所: sz399001 (深证成指), sz000001 (平安银行)")
+                return False
+
+            print(f"成功获取 {stock_name} ({code}) 数据，共 {len(df)} 条记录")
+            print(f"数据时间范围: {df.index[0]} 到 {df.index[-1]}")
+            self.data[code] = df
+            return True
 
-            except Exception as e:
-                print(f"获取股票 {stock_name} ({code}) 数据失败: {str(e)}")
-                print(f"建议检查:")
-                print(f"  1. 股票代码格式是否正确 (如: sz002640 而不是 sh002640)")
-                print(f"  2. 网络连接是否正常")
-                print(f"  3. 股票是否已停牌或退市")
+        except Exception as e:
+            print(f"获取股票 {stock_name} ({code}) 数据失败: {str(e)}")
+            print(f"建议检查:")
+            print(f"  1. 股票代码格式是否正确 (如: sz002640 而不是 sh002640)")
+            print(f"  2. 网络连接是否正常")
+            print(f"  3. 股票是否已停牌或退市")
+            return False
 
     def calculate_indicators(self, code):
-        """计算技术指标"""
+        """计算技术指标，同一份数据只计算一次"""
         if code not in self.data:
             print(f"错误: 股票代码 {code} 没有数据")
             return None
 
+        cached = self._indicator_cache.get(code)
+        if cached is not None and cached[0] is self.data[code]:
+            return cached[1]
+
+        df = self._compute_indicators(code)
+        if df is not None:
+            self._indicator_cache[code] = (self.data[code], df)
+        return df
+
+    def _compute_indicators(self, code):
+        """计算技术指标"""
         df = self.data[code].copy()
 
         # 检查数据量是否足够计算技术指标
@@ -174,87 +323,12 @@ class StockAnalyzer:
             print(f"警告: 股票 {code} 数据量不足 ({len(df)} 条)，可能影响技术指标计算准确性")
 
         try:
-            close = np.array(df['close'])
-            open_price = np.array(df['open'])
-            high = np.array(df['high'])
-            low = np.array(df['low'])
-            volume = np.array(df['volume'])
-
-            # 计算基础指标
-            dif, dea, macd = mt.MACD(close)
-            k, d, j = mt.KDJ(close, high, low)
-            upper, mid, lower = mt.BOLL(close)
-            rsi = mt.RSI(close, N=14)
-            rsi = np.nan_to_num(rsi, nan=50)
-            psy, psyma = mt.PSY(close)
-            wr, wr1 = mt.WR(close, high, low)
-            bias1, bias2, bias3 = mt.BIAS(close)
-            cci = mt.CCI(close, high, low)
-
-            # 计算均线
-            ma5 = mt.MA(close, 5)
-            ma10 = mt.MA(close, 10)
-            ma20 = mt.MA(close, 20)
-            ma60 = mt.MA(close, 60)
-
-            # 计算ATR和EMV
-            atr = mt.ATR(close, high, low)
-            emv, maemv = mt.EMV(high, low, volume)
-
-            # 新增指标计算
-            dpo, madpo = mt.DPO(close)  # 区间振荡
-            trix, trma = mt.TRIX(close)  # 三重指数平滑平均
-            pdi, mdi, adx, adxr = mt.DMI(close, high, low)  # 动向指标
-            vr = mt.VR(close, volume)  # 成交量比率
-            ar, br = mt.BRAR(open_price, close, high, low)  # 人气意愿指标
-            roc, maroc = mt.ROC(close)  # 变动率
-            mtm, mtmma = mt.MTM(close)  # 动量指标
-            dif_dma, difma_dma = mt.DMA(close)  # 平行线差指标
-
-            df['MACD'] = macd
-            df['DIF'] = dif
-            df['DEA'] = dea
-            df['K'] = k
-            df['D'] = d
-            df['J'] = j
-            df['BOLL_UP'] = upper
-            df['BOLL_MID'] = mid
-            df['BOLL_LOW'] = lower
-            df['RSI'] = rsi
-            df['PSY'] = psy
-            df['PSYMA'] = psyma
-            df['WR'] = wr
-            df['WR1'] = wr1
-            df['BIAS1'] = bias1
-            df['BIAS2'] = bias2
-            df['BIAS3'] = bias3
-            df['CCI'] = cci
-            df['MA5'] = ma5
-            df['MA10'] = ma10
-            df['MA20'] = ma20
-            df['MA60'] = ma60
-            df['ATR'] = atr
-            df['EMV'] = emv
-            df['MAEMV'] = maemv
-            df['DPO'] = dpo
-            df['MADPO'] = madpo
-            df['TRIX'] = trix
-            df['TRMA'] = trma
-            df['PDI'] = pdi
-            df['MDI'] = mdi
-            df['ADX'] = adx
-            df['ADXR'] = adxr
-            df['VR'] = vr
-            df['AR'] = ar
-            df['BR'] = br
-            df['ROC'] = roc
-            df['MAROC'] = maroc
-            df['MTM'] = mtm
-            df['MTMMA'] = mtmma
-            df['DIF_DMA'] = dif_dma
-            df['DIFMA_DMA'] = difma_dma
-
-            return df
+            # 整套指标编译为一个公式程序，公共子表达式只计算一次
+            result = INDICATOR_PROGRAM.run({field: df[field].to_numpy() for field in ('open', 'high', 'low', 'close', 'volume')})
+            indicators = {column: result[output] for column, output in INDICATOR_COLUMNS.items()}
+            indicators['RSI'] = np.nan_to_num(indicators['RSI'], nan=50)
+            # K线和指标写入同一个连续数组，返回的 DataFrame 只有一个数据块
+            return IndicatorBlock.from_arrays(df, indicators).frame()
 
         except Exception as e:
             print(f"计算技术指标时出错: {str(e)}")
@@ -262,8 +336,8 @@ class StockAnalyzer:
 
     def plot_analysis(self, code):
         """
-        将原复合图表拆分为四个独立的图表，每个图表单独渲染
-        美化版本：增强视觉效果、配色方案和交互体验
+        生成价格、MACD、KDJ、RSI四个独立的交互式图表
+        图表JSON由 charts 模块直接从指标数组拼装，不经过 plotly.graph_objs 逐属性校验
         """
         if code not in self.data:
             print(f"错误: 无法绘制图表，股票代码 {code} 没有数据")
@@ -274,403 +348,14 @@ class StockAnalyzer:
             print(f"错误: 无法计算技术指标，跳过图表生成")
             return None
 
-        stock_name = self.get_stock_name(code)
-
         try:
-            # 定义专业的配色方案
-            colors = {
-                'close': '#2E86AB',  # 深蓝色 - 收盘价
-                'ma5': '#A23B72',  # 玫瑰红 - MA5
-                'ma10': '#F18F01',  # 橙色 - MA10
-                'ma20': '#C73E1D',  # 深红色 - MA20
-                'boll': '#6C757D',  # 灰色 - 布林带
-                'macd_pos': '#28A745',  # 绿色 - MACD正值
-                'macd_neg': '#DC3545',  # 红色 - MACD负值
-                'dif': '#FF6B35',  # 橙红色 - DIF
-                'dea': '#7209B7',  # 紫色 - DEA
-                'k': '#0D6EFD',  # 蓝色 - K线
-                'd': '#FD7E14',  # 橙色 - D线
-                'j': '#198754',  # 绿色 - J线
-                'rsi': '#6F42C1',  # 深紫色 - RSI
-                'overbought': '#DC3545',  # 红色 - 超买线
-                'oversold': '#198754'  # 绿色 - 超卖线
-            }
-
-            charts_html = []
-
-            # 1. 价格走势与技术指标图
-            price_fig = go.Figure()
-
-            # 收盘价
-            price_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['close'],
-                name='收盘价',
-                line=dict(color=colors['close'], width=3),
-                hovertemplate='<b>收盘价</b><br>日期: %{x}<br>价格: ¥%{y:.2f}<extra></extra>'
-            ))
-
-            # 移动平均线
-            price_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['MA5'],
-                name='MA5',
-                line=dict(color=colors['ma5'], width=2, dash='solid'),
-                hovertemplate='<b>MA5</b><br>日期: %{x}<br>价格: ¥%{y:.2f}<extra></extra>'
-            ))
-
-            price_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['MA10'],
-                name='MA10',
-                line=dict(color=colors['ma10'], width=2, dash='solid'),
-                hovertemplate='<b>MA10</b><br>日期: %{x}<br>价格: ¥%{y:.2f}<extra></extra>'
-            ))
-
-            price_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['MA20'],
-                name='MA20',
-                line=dict(color=colors['ma20'], width=2, dash='solid'),
-                hovertemplate='<b>MA20</b><br>日期: %{x}<br>价格: ¥%{y:.2f}<extra></extra>'
-            ))
-
-            # 布林带
-            price_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['BOLL_UP'],
-                name='布林上轨',
-                line=dict(color=colors['boll'], width=1, dash='dot'),
-                hovertemplate='<b>布林上轨</b><br>日期: %{x}<br>价格: ¥%{y:.2f}<extra></extra>'
-            ))
-
-            price_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['BOLL_LOW'],
-                name='布林下轨',
-                line=dict(color=colors['boll'], width=1, dash='dot'),
-                fill='tonexty',
-                fillcolor='rgba(108, 117, 125, 0.1)',
-                hovertemplate='<b>布林下轨</b><br>日期: %{x}<br>价格: ¥%{y:.2f}<extra></extra>'
-            ))
-
-            price_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['BOLL_MID'],
-                name='布林中轨',
-                line=dict(color=colors['boll'], width=1, dash='dash'),
-                hovertemplate='<b>布林中轨</b><br>日期: %{x}<br>价格: ¥%{y:.2f}<extra></extra>'
-            ))
-
-            # 添加当前价格注释
-            current_price = df['close'].iloc[-1]
-            price_fig.add_annotation(
-                x=df.index[-1],
-                y=current_price,
-                text=f"当前价格<br>¥{current_price:.2f}",
-                showarrow=True,
-                arrowhead=2,
-                arrowsize=1,
-                arrowwidth=2,
-                arrowcolor="#2E86AB",
-                bgcolor="rgba(46, 134, 171, 0.8)",
-                bordercolor="#2E86AB",
-                borderwidth=2,
-                font=dict(color="white", size=10)
-            )
-
-            price_fig.update_layout(
-                title=f'📈 {stock_name} ({code}) 价格走势与技术指标',
-                height=500,
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="center",
-                    x=0.5,
-                    bgcolor="rgba(255,255,255,0.9)",
-                    bordercolor="rgba(0,0,0,0.1)",
-                    borderwidth=1
-                ),
-                hovermode='x unified',
-                template='plotly_white',
-                paper_bgcolor='#FAFAFA',
-                plot_bgcolor='white',
-                xaxis=dict(
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='%Y-%m-%d'
-                ),
-                yaxis=dict(
-                    title="价格 (¥)",
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='.2f'
-                )
-            )
-
-            charts_html.append(price_fig.to_html(
-                include_plotlyjs='cdn',
-                full_html=False,
-                config={
-                    'displayModeBar': True,
-                    'displaylogo': False,
-                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
-                    'toImageButtonOptions': {
-                        'format': 'png',
-                        'filename': f'{stock_name}_{code}_price_analysis',
-                        'height': 500,
-                        'width': 1000,
-                        'scale': 2
-                    }
-                }
-            ))
-
-            # 2. MACD指标图
-            macd_fig = go.Figure()
-
-            # MACD柱状图
-            macd_colors = [colors['macd_pos'] if x >= 0 else colors['macd_neg'] for x in df['MACD']]
-            macd_fig.add_trace(go.Bar(
-                x=df.index,
-                y=df['MACD'],
-                name='MACD柱',
-                marker_color=macd_colors,
-                marker_line=dict(width=0),
-                opacity=0.8,
-                hovertemplate='<b>MACD</b><br>日期: %{x}<br>值: %{y:.4f}<extra></extra>'
-            ))
-
-            macd_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['DIF'],
-                name='DIF快线',
-                line=dict(color=colors['dif'], width=2),
-                hovertemplate='<b>DIF</b><br>日期: %{x}<br>值: %{y:.4f}<extra></extra>'
-            ))
-
-            macd_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['DEA'],
-                name='DEA慢线',
-                line=dict(color=colors['dea'], width=2),
-                hovertemplate='<b>DEA</b><br>日期: %{x}<br>值: %{y:.4f}<extra></extra>'
-            ))
-
-            macd_fig.update_layout(
-                title=f'📊 {stock_name} ({code}) MACD指标',
-                height=400,
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="center",
-                    x=0.5,
-                    bgcolor="rgba(255,255,255,0.9)",
-                    bordercolor="rgba(0,0,0,0.1)",
-                    borderwidth=1
-                ),
-                hovermode='x unified',
-                template='plotly_white',
-                paper_bgcolor='#FAFAFA',
-                plot_bgcolor='white',
-                xaxis=dict(
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='%Y-%m-%d'
-                ),
-                yaxis=dict(
-                    title="MACD",
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='.4f'
-                )
-            )
-
-            charts_html.append(macd_fig.to_html(
-                include_plotlyjs=False,
-                full_html=False,
-                config={
-                    'displayModeBar': True,
-                    'displaylogo': False,
-                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
-                    'toImageButtonOptions': {
-                        'format': 'png',
-                        'filename': f'{stock_name}_{code}_macd_analysis',
-                        'height': 400,
-                        'width': 1000,
-                        'scale': 2
-                    }
-                }
-            ))
-
-            # 3. KDJ随机指标图
-            kdj_fig = go.Figure()
-
-            kdj_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['K'],
-                name='K值',
-                line=dict(color=colors['k'], width=2.5),
-                hovertemplate='<b>K值</b><br>日期: %{x}<br>值: %{y:.2f}<extra></extra>'
-            ))
-
-            kdj_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['D'],
-                name='D值',
-                line=dict(color=colors['d'], width=2.5),
-                hovertemplate='<b>D值</b><br>日期: %{x}<br>值: %{y:.2f}<extra></extra>'
-            ))
-
-            kdj_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['J'],
-                name='J值',
-                line=dict(color=colors['j'], width=2.5),
-                hovertemplate='<b>J值</b><br>日期: %{x}<br>值: %{y:.2f}<extra></extra>'
-            ))
-
-            # 添加KDJ参考线
-            kdj_fig.add_hline(y=80, line=dict(color='rgba(220, 53, 69, 0.5)', dash='dash', width=1))
-            kdj_fig.add_hline(y=20, line=dict(color='rgba(25, 135, 84, 0.5)', dash='dash', width=1))
-
-            kdj_fig.update_layout(
-                title=f'📉 {stock_name} ({code}) KDJ随机指标',
-                height=400,
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="center",
-                    x=0.5,
-                    bgcolor="rgba(255,255,255,0.9)",
-                    bordercolor="rgba(0,0,0,0.1)",
-                    borderwidth=1
-                ),
-                hovermode='x unified',
-                template='plotly_white',
-                paper_bgcolor='#FAFAFA',
-                plot_bgcolor='white',
-                xaxis=dict(
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='%Y-%m-%d'
-                ),
-                yaxis=dict(
-                    title="KDJ (%)",
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='.2f'
-                )
-            )
-
-            charts_html.append(kdj_fig.to_html(
-                include_plotlyjs=False,
-                full_html=False,
-                config={
-                    'displayModeBar': True,
-                    'displaylogo': False,
-                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
-                    'toImageButtonOptions': {
-                        'format': 'png',
-                        'filename': f'{stock_name}_{code}_kdj_analysis',
-                        'height': 400,
-                        'width': 1000,
-                        'scale': 2
-                    }
-                }
-            ))
-
-            # 4. RSI相对强弱指标图
-            rsi_fig = go.Figure()
-
-            rsi_fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['RSI'],
-                name='RSI',
-                line=dict(color=colors['rsi'], width=3),
-                hovertemplate='<b>RSI</b><br>日期: %{x}<br>值: %{y:.2f}<extra></extra>'
-            ))
-
-            # RSI参考线和区域
-            rsi_fig.add_hline(y=70, line=dict(color=colors['overbought'], dash='dash', width=2))
-            rsi_fig.add_hline(y=30, line=dict(color=colors['oversold'], dash='dash', width=2))
-
-            # 添加RSI超买超卖区域填充
-            rsi_fig.add_hrect(y0=70, y1=100, fillcolor="rgba(220, 53, 69, 0.1)", line_width=0)
-            rsi_fig.add_hrect(y0=0, y1=30, fillcolor="rgba(25, 135, 84, 0.1)", line_width=0)
-
-            rsi_fig.update_layout(
-                title=f'📋 {stock_name} ({code}) RSI相对强弱指标',
-                height=400,
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="center",
-                    x=0.5,
-                    bgcolor="rgba(255,255,255,0.9)",
-                    bordercolor="rgba(0,0,0,0.1)",
-                    borderwidth=1
-                ),
-                hovermode='x unified',
-                template='plotly_white',
-                paper_bgcolor='#FAFAFA',
-                plot_bgcolor='white',
-                xaxis=dict(
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='%Y-%m-%d'
-                ),
-                yaxis=dict(
-                    title="RSI",
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='rgba(128,128,128,0.2)',
-                    tickformat='.2f',
-                    range=[0, 100]
-                )
-            )
-
-            charts_html.append(rsi_fig.to_html(
-                include_plotlyjs=False,
-                full_html=False,
-                config={
-                    'displayModeBar': True,
-                    'displaylogo': False,
-                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
-                    'toImageButtonOptions': {
-                        'format': 'png',
-                        'filename': f'{stock_name}_{code}_rsi_analysis',
-                        'height': 400,
-                        'width': 1000,
-                        'scale': 2
-                    }
-                }
-            ))
-
-            # 将所有图表HTML合并
-            combined_html = '\n'.join(charts_html)
-            return combined_html
-
+            return charts.render_charts(df, self.get_stock_name(code), code)
         except Exception as e:
             print(f"生成交互式图表时出错: {str(e)}")
             return None
 
-    def generate_analysis_data(self, code):
-        """生成股票分析数据"""
+    def generate_analysis_data(self, code, with_ai=True):
+        """生成股票分析数据，with_ai为False时只生成技术面数据，不调用AI分析"""
         if code not in self.data:
             print(f"错误: 股票代码 {code} 没有数据，无法生成分析")
             stock_name = self.get_stock_name(code)
@@ -718,63 +403,68 @@ class StockAnalyzer:
             }
 
         try:
+            # 最新两行一次取出，最新一行的全部数值一次格式化
+            block = IndicatorBlock.from_frame(latest_df)
+            latest, previous = block.rows(2, ('close', 'volume'))
+            v = block.format_row()
             analysis_data = {
                 "基础数据": {
                     "股票代码": code,
-                    "最新收盘价": f"{df['close'].iloc[-1]:.2f}",
-                    "涨跌幅": f"{((df['close'].iloc[-1] - df['close'].iloc[-2]) / df['close'].iloc[-2] * 100):.2f}%",
-                    "最高价": f"{df['high'].iloc[-1]:.2f}",
-                    "最低价": f"{df['low'].iloc[-1]:.2f}",
-                    "成交量": f"{int(df['volume'].iloc[-1]):,}",
+                    "最新收盘价": v['close'],
+                    "涨跌幅": f"{((latest['close'] - previous['close']) / previous['close'] * 100):.2f}%",
+                    "最高价": v['high'],
+                    "最低价": v['low'],
+                    "成交量": f"{int(latest['volume']):,}",
                 },
                 "技术指标": {
                     "MA指标": {
-                        "MA5": f"{latest_df['MA5'].iloc[-1]:.2f}",
-                        "MA10": f"{latest_df['MA10'].iloc[-1]:.2f}",
-                        "MA20": f"{latest_df['MA20'].iloc[-1]:.2f}",
-                        "MA60": f"{latest_df['MA60'].iloc[-1]:.2f}",
+                        "MA5": v['MA5'],
+                        "MA10": v['MA10'],
+                        "MA20": v['MA20'],
+                        "MA60": v['MA60'],
                     },
                     "趋势指标": {
-                        "MACD (指数平滑异同移动平均线)": f"{latest_df['MACD'].iloc[-1]:.2f}",
-                        "DIF (差离值)": f"{latest_df['DIF'].iloc[-1]:.2f}",
-                        "DEA (讯号线)": f"{latest_df['DEA'].iloc[-1]:.2f}",
-                        "TRIX (三重指数平滑平均线)": f"{latest_df['TRIX'].iloc[-1]:.2f}",
-                        "PDI (上升方向线)": f"{latest_df['PDI'].iloc[-1]:.2f}",
-                        "MDI (下降方向线)": f"{latest_df['MDI'].iloc[-1]:.2f}",
-                        "ADX (趋向指标)": f"{latest_df['ADX'].iloc[-1]:.2f}",
+                        "MACD (指数平滑异同移动平均线)": v['MACD'],
+                        "DIF (差离值)": v['DIF'],
+                        "DEA (讯号线)": v['DEA'],
+                        "TRIX (三重指数平滑平均线)": v['TRIX'],
+                        "PDI (上升方向线)": v['PDI'],
+                        "MDI (下降方向线)": v['MDI'],
+                        "ADX (趋向指标)": v['ADX'],
                     },
                     "摆动指标": {
-                        "RSI (相对强弱指标)": f"{latest_df['RSI'].iloc[-1]:.2f}",
-                        "KDJ-K (随机指标K值)": f"{latest_df['K'].iloc[-1]:.2f}",
-                        "KDJ-D (随机指标D值)": f"{latest_df['D'].iloc[-1]:.2f}",
-                        "KDJ-J (随机指标J值)": f"{latest_df['J'].iloc[-1]:.2f}",
-                        "BIAS (乖离率)": f"{latest_df['BIAS1'].iloc[-1]:.2f}",
-                        "CCI (顺势指标)": f"{latest_df['CCI'].iloc[-1]:.2f}",
+                        "RSI (相对强弱指标)": v['RSI'],
+                        "KDJ-K (随机指标K值)": v['K'],
+                        "KDJ-D (随机指标D值)": v['D'],
+                        "KDJ-J (随机指标J值)": v['J'],
+                        "BIAS (乖离率)": v['BIAS1'],
+                        "CCI (顺势指标)": v['CCI'],
                     },
                     "成交量指标": {
-                        "VR (成交量比率)": f"{latest_df['VR'].iloc[-1]:.2f}",
-                        "AR (人气指标)": f"{latest_df['AR'].iloc[-1]:.2f}",
-                        "BR (意愿指标)": f"{latest_df['BR'].iloc[-1]:.2f}",
+                        "VR (成交量比率)": v['VR'],
+                        "AR (人气指标)": v['AR'],
+                        "BR (意愿指标)": v['BR'],
                     },
                     "动量指标": {
-                        "ROC (变动率)": f"{latest_df['ROC'].iloc[-1]:.2f}",
-                        "MTM (动量指标)": f"{latest_df['MTM'].iloc[-1]:.2f}",
-                        "DPO (区间振荡)": f"{latest_df['DPO'].iloc[-1]:.2f}",
+                        "ROC (变动率)": v['ROC'],
+                        "MTM (动量指标)": v['MTM'],
+                        "DPO (区间振荡)": v['DPO'],
                     },
                     "布林带": {
-                        "BOLL上轨": f"{latest_df['BOLL_UP'].iloc[-1]:.2f}",
-                        "BOLL中轨": f"{latest_df['BOLL_MID'].iloc[-1]:.2f}",
-                        "BOLL下轨": f"{latest_df['BOLL_LOW'].iloc[-1]:.2f}",
+                        "BOLL上轨": v['BOLL_UP'],
+                        "BOLL中轨": v['BOLL_MID'],
+                        "BOLL下轨": v['BOLL_LOW'],
                     }
                 },
                 "技术分析建议": generate_trading_signals(latest_df)
             }
 
             """添加AI分析结果"""
-            if self.llm:
+            if with_ai and self.llm:
                 try:
+                    self.prepare_market_context()
                     print("正在调用AI进行智能分析...")
-                    api_result = self.llm.request_analysis(df, latest_df)
+                    api_result = self._ai_results.pop(code, None) or self.llm.request_analysis(df, latest_df)
                     if api_result:
                         analysis_data.update(api_result)
                         print("AI分析完成")
@@ -782,7 +472,7 @@ class StockAnalyzer:
                         print("AI分析未返回结果")
                 except Exception as e:
                     print(f"AI分析过程出错: {str(e)}")
-            else:
+            elif with_ai:
                 print("未配置LLM API，跳过AI分析")
 
             return analysis_data
@@ -838,16 +528,23 @@ class StockAnalyzer:
         else:
             return str(content)
 
-    def generate_html_report(self):
-        """生成HTML格式的分析报告"""
+    def generate_html_report(self, codes=None):
+        """生成HTML格式的分析报告，codes为空时包含全部股票"""
+        codes = self.stock_codes if codes is None else codes
         # 检查模板文件是否存在
         template_path = 'static/templates/report_template.html'
-        css_path = 'static/css/report.css'
-
         if not os.path.exists(template_path):
             print(f"错误: 模板文件不存在: {template_path}")
             print("请创建模板文件或使用简化版本")
-            return self.generate_simple_html_report()
+            return self.generate_simple_html_report(codes)
+
+        stock_contents = [self.generate_stock_section(code) for code in codes]
+        return self.render_report(stock_contents)
+
+    def render_report(self, stock_contents):
+        """将各股票的HTML片段套入报告模板"""
+        template_path = 'static/templates/report_template.html'
+        css_path = 'static/css/report.css'
 
         if not os.path.exists(css_path):
             print(f"警告: CSS文件不存在: {css_path}")
@@ -864,150 +561,157 @@ class StockAnalyzer:
         tz = pytz.timezone('Asia/Shanghai')
         current_time = datetime.now(tz).strftime('%Y年%m月%d日 %H时%M分%S秒')
 
-        stock_contents = []
-        for code in self.stock_codes:
-            if code in self.data:
+        # 将CSS样式和内容插入到模板中
+        template = Template(html_template)
+        html_content = template.substitute(
+            styles=css_content,
+            generate_time=current_time,
+            content='\n'.join(stock_contents)
+        )
+        return html_content
+
+    def generate_stock_section(self, code, analysis_data=None, chart_html=None):
+        """
+        生成单只股票的报告HTML片段
+
+        可传入已生成的分析数据和图表HTML以避免重复调用AI分析和重复绘图，
+        chart_html 传入空字符串表示图表生成失败
+        """
+        if code in self.data:
+            if analysis_data is None:
                 analysis_data = self.generate_analysis_data(code)
-                chart_base64 = self.plot_analysis(code)
-                stock_name = self.get_stock_name(code)
+            stock_name = self.get_stock_name(code)
 
-                # 生成基础数据部分的HTML
-                basic_data_html = f"""
+            # 生成基础数据部分的HTML
+            basic_data_html = f"""
+            <div class="indicator-section">
+                <h3>基础数据</h3>
+                <table class="data-table">
+                    <tr>
+                        <th>指标</th>
+                        <th>数值</th>
+                    </tr>
+                    {''.join(_generate_table_row(k, v) for k, v in analysis_data['基础数据'].items())}
+                </table>
+            </div>
+            """
+
+            # 生成技术指标部分的HTML
+            indicator_sections = []
+            for section_name, indicators in analysis_data['技术指标'].items():
+                indicator_html = f"""
                 <div class="indicator-section">
-                    <h3>基础数据</h3>
+                    <h3>{section_name}</h3>
                     <table class="data-table">
                         <tr>
                             <th>指标</th>
                             <th>数值</th>
                         </tr>
-                        {''.join(_generate_table_row(k, v) for k, v in analysis_data['基础数据'].items())}
+                        {''.join(_generate_table_row(k, v) for k, v in indicators.items())}
                     </table>
                 </div>
                 """
+                indicator_sections.append(indicator_html)
+
+            # 生成交易信号部分的HTML
+            signals_html = f"""
+            <div class="indicator-section">
+                <h3>交易信号</h3>
+                <ul class="signal-list">
+                    {''.join(f'<li>{signal}</li>' for signal in analysis_data['技术分析建议'])}
+                </ul>
+            </div>
+            """
 
-                # 生成技术指标部分的HTML
-                indicator_sections = []
-                for section_name, indicators in analysis_data['技术指标'].items():
-                    indicator_html = f"""
-                    <div class="indicator-section">
-                        <h3>{section_name}</h3>
-                        <table class="data-table">
-                            <tr>
-                                <th>指标</th>
-                                <th>数值</th>
-                            </tr>
-                            {''.join(_generate_table_row(k, v) for k, v in indicators.items())}
-                        </table>
-                    </div>
-                    """
-                    indicator_sections.append(indicator_html)
-
-                # 生成交易信号部分的HTML
-                signals_html = f"""
-                <div class="indicator-section">
-                    <h3>交易信号</h3>
-                    <ul class="signal-list">
-                        {''.join(f'<li>{signal}</li>' for signal in analysis_data['技术分析建议'])}
-                    </ul>
-                </div>
-                """
-
-                # 生成AI分析结果的HTML
-                ai_analysis_html = ""
-                if "AI分析结果" in analysis_data:
-                    sections = analysis_data["AI分析结果"]
-                    for section_name, content in sections.items():
-                        if section_name != "分析状态":
-                            ai_analysis_html += f"""
-                            <div class="indicator-section">
-                                <h3>{section_name}</h3>
-                                <div class="analysis-content">
-                                    {content}
-                                </div>
+            # 生成AI分析结果的HTML
+            ai_analysis_html = ""
+            if "AI分析结果" in analysis_data:
+                sections = analysis_data["AI分析结果"]
+                for section_name, content in sections.items():
+                    if section_name != "分析状态":
+                        ai_analysis_html += f"""
+                        <div class="indicator-section">
+                            <h3>{section_name}</h3>
+                            <div class="analysis-content">
+                                {content}
                             </div>
-                            """
+                        </div>
+                        """
 
-                # 图表部分
+            # 图表部分
+            if chart_html is None:
                 chart_html = self.plot_analysis(code)
 
-                if chart_base64:
-                    chart_html = f"""
-                    <div class="section-divider">
-                        <h2>技术指标图表</h2>
-                    </div>
-                    <div class="chart-container">
-                        {chart_html}
-                    </div>
-                    """
-                else:
-                    chart_html = f"""
-                    <div class="section-divider">
-                        <h2>技术指标图表</h2>
-                    </div>
-                    
-                    <div class="chart-container">
-                        <p>图表生成失败，请检查数据和配置</p>
-                    </div>
-                    """
-
-                # 组合单个股票的完整内容
-                stock_content = f"""
-                <div class="stock-container">
-                    <h2>{stock_name} ({code}) 分析报告</h2>
-                    
-                    <div class="section-divider">
-                        <h2>基础技术分析</h2>
-                    </div>
-                    
-                    <div class="data-grid">
-                        {basic_data_html}
-                        {signals_html}
-                    </div>
-                    
-                    <div class="section-divider">
-                        <h2>技术指标详情</h2>
-                    </div>
-                    
-                    {''.join(indicator_sections)}
-                    
+            if chart_html:
+                chart_html = f"""
+                <div class="section-divider">
+                    <h2>技术指标图表</h2>
+                </div>
+                <div class="chart-container">
                     {chart_html}
-            
-                    <div class="section-divider">
-                        <h2>人工智能分析报告</h2>
-                    </div>
-                    {ai_analysis_html}
                 </div>
                 """
-                stock_contents.append(stock_content)
             else:
-                stock_name = self.get_stock_name(code)
-                stock_content = f"""
-                <div class="stock-container">
-                    <h2>{stock_name} ({code}) 分析报告</h2>
-                    <div class="error-message">
-                        <h3>数据获取失败</h3>
-                        <p>无法获取股票 {stock_name} ({code}) 的数据</p>
-                        <p>请检查股票代码格式是否正确：</p>
-                        <ul>
-                            <li>上交所: sh000001 (上证指数), sh600036 (招商银行)</li>
-                            <li>深交所: sz399001 (深证成指), sz000001 (平安银行), sz002640 (跨境通)</li>
-                        </ul>
-                    </div>
+                chart_html = f"""
+                <div class="section-divider">
+                    <h2>技术指标图表</h2>
+                </div>
+                
+                <div class="chart-container">
+                    <p>图表生成失败，请检查数据和配置</p>
                 </div>
                 """
-                stock_contents.append(stock_content)
 
-        # 将CSS样式和内容插入到模板中
-        template = Template(html_template)
-        html_content = template.substitute(
-            styles=css_content,
-            generate_time=current_time,
-            content='\n'.join(stock_contents)
-        )
-        return html_content
+            # 组合单个股票的完整内容
+            stock_content = f"""
+            <div class="stock-container">
+                <h2>{stock_name} ({code}) 分析报告</h2>
+                
+                <div class="section-divider">
+                    <h2>基础技术分析</h2>
+                </div>
+                
+                <div class="data-grid">
+                    {basic_data_html}
+                    {signals_html}
+                </div>
+                
+                <div class="section-divider">
+                    <h2>技术指标详情</h2>
+                </div>
+                
+                {''.join(indicator_sections)}
+                
+                {chart_html}
+        
+                <div class="section-divider">
+                    <h2>人工智能分析报告</h2>
+                </div>
+                {ai_analysis_html}
+            </div>
+            """
+            return stock_content
+        else:
+            stock_name = self.get_stock_name(code)
+            stock_content = f"""
+            <div class="stock-container">
+                <h2>{stock_name} ({code}) 分析报告</h2>
+                <div class="error-message">
+                    <h3>数据获取失败</h3>
+                    <p>无法获取股票 {stock_name} ({code}) 的数据</p>
+                    <p>请检查股票代码格式是否正确：</p>
+                    <ul>
+                        <li>上交所: sh000001 (上证指数), sh600036 (招商银行)</li>
+                        <li>深交所: sz399001 (深证成指), sz000001 (平安银行), sz002640 (跨境通)</li>
+                    </ul>
+                </div>
+            </div>
+            """
+            return stock_content
 
-    def generate_simple_html_report(self):
+    def generate_simple_html_report(self, codes=None):
         """生成简化版HTML报告（当模板文件不存在时使用）"""
+        codes = self.stock_codes if codes is None else codes
         tz = pytz.timezone('Asia/Shanghai')
         current_time = datetime.now(tz).strftime('%Y年%m月%d日 %H时%M分%S秒')
 
@@ -1038,7 +742,7 @@ class StockAnalyzer:
             </div>
         """
 
-        for code in self.stock_codes:
+        for code in codes:
             stock_name = self.get_stock_name(code)
             if code in self.data:
                 analysis_data = self.generate_analysis_data(code)
@@ -1080,60 +784,133 @@ class StockAnalyzer:
         return html_content
 
     def run_analysis(self, output_path='public/index.html'):
-        """运行分析并生成报告"""
-        print("开始运行股票分析...")
-
-        # 获取数据
-        print("步骤1: 获取股票数据")
-        self.fetch_data()
-
-        # 检查是否有有效数据
-        if not self.data:
-            print("错误: 没有获取到任何有效的股票数据")
-            print("请检查股票代码格式，常见格式：")
-            print("  上交所: sh000001 (上证指数), sh600036 (招商银行)")
-            print("  深交所: sz399001 (深证成指), sz000001 (平安银行), sz002640 (跨境通)")
-            return None
-
-        print(f"成功获取 {len(self.data)} 只股票的数据")
+        """
+        运行分析并生成报告，结束时释放AI分析的连接
 
-        # 生成报告
-        print("步骤2: 生成HTML报告")
+        不写产物库，中断后无法续跑，需要断点续跑时使用 stages.IncrementalPipeline(--incremental)
+        """
         try:
-            html_report = self.generate_html_report()
-        except Exception as e:
-            print(f"生成HTML报告时出错: {str(e)}")
-            return None
+            print("开始运行股票分析...")
 
-        # 创建输出目录
-        output_dir = os.path.dirname(output_path)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+            # 获取数据
+            print("步骤1: 获取股票数据")
+            self.fetch_data()
 
-        # 写入HTML报告
-        try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_report)
-            print(f"分析报告已生成: {output_path}")
-            return output_path
-        except Exception as e:
-            print(f"写入报告文件时出错: {str(e)}")
-            return None
+            # 检查是否有有效数据
+            if not self.data:
+                print("错误: 没有获取到任何有效的股票数据")
+                print("请检查股票代码格式，常见格式：")
+                print("  上交所: sh000001 (上证指数), sh600036 (招商银行)")
+                print("  深交所: sz399001 (深证成指), sz000001 (平安银行), sz002640 (跨境通)")
+                return None
+
+            print(f"成功获取 {len(self.data)} 只股票的数据")
+
+            if self.processes > 1:
+                from shared_panel import compute_indicators_shared
+                compute_indicators_shared(self, self.processes)
+
+            if self.llm and self.llm_batch_size > 1:
+                print(f"批量AI分析: 每次请求 {self.llm_batch_size} 只股票")
+                self.prefetch_ai_analysis()
+
+            # 生成报告
+            print("步骤2: 生成HTML报告")
+            try:
+                html_report = self.generate_html_report()
+            except Exception as e:
+                print(f"生成HTML报告时出错: {str(e)}")
+                return None
+
+            # 写入HTML报告及预压缩版本
+            try:
+                write_report(html_report, output_path)
+                print(f"分析报告已生成: {output_path}")
+                if self.llm:
+                    print(self.llm.usage_summary())
+                return output_path
+            except Exception as e:
+                print(f"写入报告文件时出错: {str(e)}")
+                return None
+        finally:
+            self.close()
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='A股技术分析报告')
+    parser.add_argument('--incremental', action='store_true', help='按阶段复用本地缓存的产物，只重新计算输入变化的部分')
+    parser.add_argument('--resume', action='store_true', help='从上一次中断的运行继续，只执行未完成的阶段(增量模式)')
+    parser.add_argument('--pipeline', action='store_true', help='获取数据、计算、AI分析分段并发，相互重叠执行')
+    parser.add_argument('--fetch-workers', type=int, default=8, help='流水线模式下获取数据的并发数')
+    parser.add_argument('--compute-workers', type=int, default=2, help='流水线模式下指标计算和绘图的并发数')
+    parser.add_argument('--llm-workers', type=int, default=4, help='流水线模式下同时进行的AI请求数')
+    parser.add_argument('--queue-size', type=int, default=8, help='流水线模式下各段之间队列的容量')
+    parser.add_argument('--processes', type=int, default=0, help='多进程计算技术指标的进程数，数据经共享内存传递')
+    parser.add_argument('--llm-batch', type=int, default=1, help='每次AI请求包含的股票数量，大于1时启用批量分析')
+    parser.add_argument('--skip-non-trading', action='store_true', help='今天不是交易日时不重新生成报告')
+    parser.add_argument('--stock', action='append', default=[], help='股票代码或 名称=代码，可重复')
+    parser.add_argument('--board', action='append', default=[], help='按板块从代码表选取股票(见 symbols.py)，可重复')
+    parser.add_argument('--exclude-st', action='store_true', help='从代码表选取时排除ST股票')
+    parser.add_argument('--limit', type=int, help='从代码表选取的最大数量')
+    parser.add_argument('--export', metavar='DIR', help='把K线、技术指标和交易信号导出为Parquet/Arrow文件(需要pyarrow)')
+    args = parser.parse_args()
+    incremental = args.incremental or args.resume
+    # 流水线、多进程和批量AI分析按整批处理，不经过产物库，不能与增量/续跑模式同时使用
+    batch_modes = [flag for flag, on in (('--pipeline', args.pipeline), ('--processes', args.processes > 1),
+                                         ('--llm-batch', args.llm_batch > 1)) if on]
+    if incremental and batch_modes:
+        parser.error(f"{'--resume' if args.resume else '--incremental'} 不能与 {', '.join(batch_modes)} 同时使用")
+
     # 正确的股票代码示例
     stock_info = {
         '上证指数': 'sh000001'
     }
+    if args.stock or args.board:
+        registry = symbols.registry()
+        stock_info = {}
+        for item in args.stock:
+            name, _, code = item.rpartition('=')
+            code = symbols.normalize_code(code)
+            stock_info[name or registry.name(code, code)] = code
+        if args.board:
+            if not len(registry):
+                parser.error(f"代码表为空，无法按板块选股，请先运行 python symbols.py update 生成 {symbols.SYMBOLS_PATH}")
+            stock_info.update(registry.watchlist(registry.select(boards=args.board, exclude_st=args.exclude_st,
+                                                                 limit=args.limit)))
+
+    # 设置 ASHARE_RECORD / ASHARE_REPLAY 环境变量可录制或回放行情数据
+    install_from_env()
+
+    calendar = None
+    if incremental or args.skip_non_trading:
+        from trade_calendar import load_calendar, market_today
+        calendar = load_calendar()
+        as_api.set_calendar(calendar)
+        if args.skip_non_trading and not calendar.is_trading_day(market_today()[0]):
+            print(f"今天不是交易日，行情与上一交易日 {calendar.last_session(market_today()[0])} 相同，跳过生成报告")
+            raise SystemExit(0)
 
     print("开始股票技术分析...")
     print(f"分析股票: {list(stock_info.keys())}")
 
-    analyzer = StockAnalyzer(stock_info)
-    report_path = analyzer.run_analysis()
+    analyzer = StockAnalyzer(stock_info, llm_batch_size=args.llm_batch, processes=args.processes)
+    if incremental:
+        from stages import IncrementalPipeline
+        report_path = IncrementalPipeline(analyzer, calendar=calendar, resume=args.resume).run()
+    elif args.pipeline:
+        from pipeline import run_pipelined
+        report_path = run_pipelined(analyzer, fetch_workers=args.fetch_workers, compute_workers=args.compute_workers,
+                                    llm_workers=args.llm_workers, queue_size=args.queue_size)
+    else:
+        report_path = analyzer.run_analysis()
+
+    if args.export and analyzer.data:
+        from export import export_run
+        export_run(analyzer, args.export)
 
     if report_path:
         print(f"✅ 分析完成！报告已保存到: {report_path}")
     else:
-        print("❌ 分析失败，请检查错误信息")
\ No newline at end of file
+        print("❌ 分析失败，请检查错误信息")
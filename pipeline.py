@@ -0,0 +1,186 @@
+"""
+流水线并行执行器
+
+把每只股票的分析拆成 获取数据 -> 计算(指标/技术面/图表) -> AI分析 -> 报告片段 四段，
+各段使用独立的线程池，段与段之间用有界队列连接：
+
+- 第1只股票的AI请求可以在第50只股票仍在下载时发出，网络等待与计算相互重叠
+- 下游处理不过来时上游的 put 会阻塞(背压)，内存中同时存在的中间结果数量有上限
+- 报告片段按输入顺序依次生成，与串行运行的输出一致；靠前的一项迟迟未完成(如AI请求卡住)时，
+  后面的项最多领先 各段队列容量与并发数之和 项，结果队列和排序缓冲同样有界
+
+用法:
+    python main.py --pipeline
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from main import write_report
+
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    流水线中的一段
+
+    Args:
+        name (str): 名称
+        func (Callable): 处理函数，输入上一段的输出，返回本段输出
+        workers (int): 并发线程数
+        queue_size (int): 本段输入队列的容量，队列满时上游阻塞
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, queue_size: int = 8):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+
+
+class PipelinedExecutor:
+    """按段并发执行，结果按输入顺序产出"""
+
+    def __init__(self, stages: List[PipelineStage]):
+        self.stages = stages
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def _worker(self, stage: PipelineStage, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        stat = self.stats[stage.name]
+        while True:
+            task = inbox.get()
+            if task is _STOP:
+                return
+            seq, value, error = task
+            if error is None:
+                start = time.perf_counter()
+                try:
+                    value = stage.func(value)
+                except Exception as e:
+                    print(f"流水线阶段 {stage.name} 处理第 {seq + 1} 项时出错: {str(e)}")
+                    error = e
+                with self._lock:
+                    stat['busy'] += time.perf_counter() - start
+                    stat['items'] += 1
+            outbox.put((seq, value, error))
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+        """
+        执行流水线
+
+        Args:
+            items (Iterable[Any]): 输入项
+
+        Yields:
+            Tuple[Any, Any, Optional[Exception]]: 按输入顺序产出 (输入项, 最后一段的输出, 异常)，
+            某一段出错时后续段跳过该项，异常随结果一起返回
+        """
+        items = list(items)
+        self._lock = threading.Lock()
+        self.stats = {s.name: {'busy': 0.0, 'items': 0} for s in self.stages}
+        queues = [queue.Queue(maxsize=s.queue_size) for s in self.stages]
+        # 同时在途(已送入、尚未按顺序产出)的项数上限，产出一项后才放入下一项
+        window = sum(s.queue_size + s.workers for s in self.stages)
+        slots = threading.Semaphore(window)
+        results: queue.Queue = queue.Queue(maxsize=window)
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(self.stages) else results
+            for _ in range(stage.workers):
+                threading.Thread(target=self._worker, args=(stage, queues[i], outbox),
+                                 name=f'pipeline-{stage.name}', daemon=True).start()
+
+        def feed():
+            for seq, item in enumerate(items):
+                slots.acquire()
+                queues[0].put((seq, item, None))
+        threading.Thread(target=feed, name='pipeline-feed', daemon=True).start()
+
+        pending: Dict[int, Tuple[Any, Optional[Exception]]] = {}
+        for seq in range(len(items)):
+            while seq not in pending:
+                done, value, error = results.get()
+                pending[done] = (value, error)
+            value, error = pending.pop(seq)
+            slots.release()
+            yield items[seq], value, error
+
+        # 全部结果已取出，各队列为空，通知各段线程退出(提前中止时线程为守护线程，随进程退出)
+        for i, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                queues[i].put(_STOP)
+
+    def report(self) -> None:
+        """打印各段的累计耗时"""
+        for name, stat in self.stats.items():
+            print(f"阶段 {name}: 处理 {stat['items']} 项，累计耗时 {stat['busy']:.2f}s")
+
+
+def run_pipelined(analyzer, output_path: str = 'public/index.html', fetch_workers: int = 8,
+                  compute_workers: int = 2, llm_workers: int = 4, queue_size: int = 8) -> Optional[str]:
+    """
+    以流水线方式运行 StockAnalyzer 的完整分析并写出报告
+
+    Args:
+        analyzer (StockAnalyzer): 股票分析器
+        output_path (str): 报告输出路径
+        fetch_workers (int): 获取数据的并发数
+        compute_workers (int): 指标计算和绘图的并发数
+        llm_workers (int): 同时进行中的AI请求数
+        queue_size (int): 各段输入队列的容量
+
+    Returns:
+        Optional[str]: 报告路径，没有任何有效数据时返回None
+    """
+    a = analyzer
+
+    def fetch(code):
+        return {'code': code, 'ok': a.fetch_stock(code)}
+
+    def compute(item):
+        if item['ok']:
+            code = item['code']
+            item['indicators'] = a.calculate_indicators(code)
+            item['analysis'] = a.generate_analysis_data(code, with_ai=False)
+            item['chart'] = a.plot_analysis(code) or ''
+        return item
+
+    def ai(item):
+        if item['ok'] and a.llm and item['indicators'] is not None:
+            print(f"正在调用AI分析 {item['code']}...")
+            item['ai'] = a.llm.request_analysis(a.data[item['code']], item['indicators'])
+        return item
+
+    executor = PipelinedExecutor([
+        PipelineStage('fetch', fetch, fetch_workers, queue_size),
+        PipelineStage('compute', compute, compute_workers, queue_size),
+        PipelineStage('ai', ai, llm_workers, queue_size),
+    ])
+
+    print("开始以流水线方式运行股票分析...")
+    start = time.perf_counter()
+    a.prepare_market_context()
+    try:
+        sections = []
+        for code, item, error in executor.run(a.stock_codes):
+            if error is not None or not item['ok']:
+                sections.append(a.generate_stock_section(code, a.generate_analysis_data(code, with_ai=False)))
+                continue
+            analysis_data = dict(item['analysis'])
+            if item.get('ai'):
+                analysis_data.update(item['ai'])
+            sections.append(a.generate_stock_section(code, analysis_data, item['chart']))
+        executor.report()
+        if a.llm:
+            print(a.llm.usage_summary())
+
+        if not a.data:
+            print("错误: 没有获取到任何有效的股票数据")
+            return None
+
+        write_report(a.render_report(sections), output_path)
+        print(f"分析报告已生成: {output_path}，总耗时 {time.perf_counter() - start:.2f}s")
+        return output_path
+    finally:
+        a.close()
@@ -0,0 +1,232 @@
+"""
+盘中调度器
+
+只在A股交易时段(9:30-11:30, 13:00-15:00)运行，按固定间隔批量轮询自选股的实时行情：
+
+- 价格或成交量没有变化的股票什么都不做
+- 有变化的股票把最新行情合并进日线(当日K线更新，或出现新交易日时追加一根)，
+  只重新计算这些股票的技术指标、交易信号、图表和报告片段
+- 只有交易信号状态发生变化时才重新请求AI分析，否则沿用上一次的AI结果
+- 有股票更新时才重新写出报告
+
+收盘后再轮询一次以取得收盘价，非交易时段休眠到下一次开盘。
+CPU和API用量随行情变化的股票数量而非轮询频率增长。
+
+用法:
+    python scheduler.py --stock 上证指数=sh000001 --stock 平安银行=sz000001 --interval 30
+    python scheduler.py --once          # 只轮询一次(调试用)
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, List, Optional
+
+import pandas as pd
+import pytz
+
+import Ashare as as_api
+from main import StockAnalyzer, write_report
+from trade_calendar import TradingCalendar, load_calendar
+from transport import LiveTransport, install_from_env
+
+MARKET_TZ = pytz.timezone('Asia/Shanghai')
+# 交易时段(当日分钟数)
+SESSIONS = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))
+
+
+class MarketScheduler:
+    """按行情变化增量更新分析结果的盘中调度器"""
+
+    def __init__(self, analyzer: StockAnalyzer, calendar: Optional[TradingCalendar] = None,
+                 interval: float = 30.0, output_path: str = 'public/index.html', charts: bool = True):
+        """
+        Args:
+            analyzer (StockAnalyzer): 股票分析器
+            calendar (TradingCalendar): 交易日历，默认由 load_calendar() 读取
+            interval (float): 轮询间隔(秒)
+            output_path (str): 报告输出路径
+            charts (bool): 是否为有变化的股票重新绘图
+        """
+        self.analyzer = analyzer
+        self.calendar = calendar or load_calendar()
+        self.interval = interval
+        self.output_path = output_path
+        self.charts = charts
+        self.quotes: Dict[str, tuple] = {}                 # code -> (价格, 成交量, 行情时间)
+        self.signals: Dict[str, FrozenSet[str]] = {}       # code -> 交易信号状态
+        self.ai: Dict[str, Dict[str, Any]] = {}            # code -> 最近一次AI分析结果
+        self.sections: Dict[str, str] = {}                 # code -> 报告片段
+        self.stats = {'polls': 0, 'changed': 0, 'recomputed': 0, 'ai_requests': 0, 'reports': 0}
+        self._stop = threading.Event()
+
+    def _now(self) -> datetime:
+        return datetime.now(MARKET_TZ)
+
+    def in_session(self, now: datetime) -> bool:
+        """是否处于交易时段"""
+        minute = now.hour * 60 + now.minute
+        return self.calendar.is_trading_day(now.date()) and any(a <= minute < b for a, b in SESSIONS)
+
+    def next_open(self, now: datetime) -> datetime:
+        """下一个交易时段的开始时间"""
+        day = now.date()
+        minute = now.hour * 60 + now.minute
+        for _ in range(30):
+            if self.calendar.is_trading_day(day):
+                for start, _end in SESSIONS:
+                    if day > now.date() or minute < start:
+                        return MARKET_TZ.localize(datetime(day.year, day.month, day.day, start // 60, start % 60))
+            day += timedelta(days=1)
+        return now + timedelta(days=1)
+
+    def _merge_quote(self, code: str, quote: pd.Series) -> bool:
+        """把实时行情合并进日线数据，返回数据是否发生变化"""
+        key = (quote['price'], quote['volume'], quote['time'])
+        previous = self.quotes.get(code)
+        self.quotes[code] = key
+        if previous is not None and previous[:2] == key[:2]:
+            return False
+        df = self.analyzer.data.get(code)
+        if df is None or df.empty or pd.isna(quote['price']) or quote['price'] <= 0 or pd.isna(quote['time']):
+            return False
+
+        day = quote['time'].normalize()
+        bar = {'open': quote['open'], 'high': quote['high'], 'low': quote['low'],
+               'close': quote['price'], 'volume': quote['volume']}
+        if day < df.index[-1]:
+            return False
+        if day == df.index[-1]:
+            last = df.iloc[-1]
+            if all(last[k] == bar[k] for k in bar if k in last):
+                return False
+            df = df.copy()
+            for k, v in bar.items():
+                if k in df.columns:
+                    df.iloc[-1, df.columns.get_loc(k)] = v
+        else:
+            row = pd.DataFrame([bar], index=pd.DatetimeIndex([day]))[df.columns]
+            df = pd.concat([df, row])
+        # 替换数据对象后，StockAnalyzer 的指标缓存对该股票自动失效
+        self.analyzer.data[code] = df
+        return True
+
+    def recompute(self, code: str, force_ai: bool = False) -> None:
+        """重新计算单只股票的分析数据和报告片段，交易信号状态变化时重新请求AI分析"""
+        a = self.analyzer
+        analysis_data = a.generate_analysis_data(code, with_ai=False)
+        state = frozenset(analysis_data.get("技术分析建议", []))
+        flipped = self.signals.get(code) != state
+        self.signals[code] = state
+        if a.llm and (flipped or force_ai) and code in a.data:
+            indicators = a.calculate_indicators(code)
+            if indicators is not None:
+                if code in self.ai:
+                    print(f"{a.get_stock_name(code)} ({code}) 交易信号变化，重新请求AI分析")
+                result = a.llm.request_analysis(a.data[code], indicators)
+                self.stats['ai_requests'] += 1
+                if result:
+                    self.ai[code] = result
+        if code in self.ai:
+            analysis_data = dict(analysis_data, **self.ai[code])
+        chart = (a.plot_analysis(code) or '') if self.charts else ''
+        self.sections[code] = a.generate_stock_section(code, analysis_data, chart)
+        self.stats['recomputed'] += 1
+
+    def write(self) -> None:
+        a = self.analyzer
+        sections = [self.sections[code] for code in a.stock_codes if code in self.sections]
+        write_report(a.render_report(sections), self.output_path)
+        self.stats['reports'] += 1
+
+    def start(self) -> None:
+        """获取日线数据并完成首次完整分析"""
+        a = self.analyzer
+        a.fetch_data()
+        a.prepare_market_context()
+        for code in a.stock_codes:
+            if code in a.data:
+                self.recompute(code, force_ai=True)
+            else:
+                self.sections[code] = a.generate_stock_section(code)
+        self.write()
+
+    def poll_once(self) -> List[str]:
+        """
+        轮询一次实时行情，只更新有变化的股票
+
+        Returns:
+            List[str]: 本次有变化的股票代码
+        """
+        a = self.analyzer
+        self.stats['polls'] += 1
+        try:
+            quotes = as_api.get_quotes([c for c in a.stock_codes if c in a.data])
+        except Exception as e:
+            print(f"获取实时行情失败: {str(e)}")
+            return []
+        changed = [code for code in quotes.index if self._merge_quote(code, quotes.loc[code])]
+        for code in changed:
+            self.recompute(code)
+        if changed:
+            self.stats['changed'] += len(changed)
+            self.write()
+        print(f"[{self._now():%H:%M:%S}] 轮询 {len(quotes)} 只，变化 {len(changed)} 只"
+              + (f": {', '.join(changed)}" if changed else ''))
+        return changed
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        """持续运行直到 stop() 被调用"""
+        self.start()
+        closing_poll = False
+        while not self._stop.is_set():
+            now = self._now()
+            if self.in_session(now):
+                self.poll_once()
+                closing_poll = True
+                self._stop.wait(self.interval)
+                continue
+            if closing_poll:
+                # 离开交易时段后再取一次行情，拿到午间/收盘的最终价格
+                self.poll_once()
+                closing_poll = False
+            wake = self.next_open(now)
+            print(f"非交易时段，休眠至 {wake:%Y-%m-%d %H:%M}  累计: {self.stats}")
+            self._stop.wait(max(1.0, (wake - self._now()).total_seconds()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='盘中按行情变化增量更新分析报告')
+    parser.add_argument('--stock', action='append', default=[], help='自选股，格式: 名称=代码，可重复')
+    parser.add_argument('--interval', type=float, default=30, help='轮询间隔(秒)')
+    parser.add_argument('--output', default='public/index.html', help='报告输出路径')
+    parser.add_argument('--no-charts', action='store_true', help='更新时不重新绘图')
+    parser.add_argument('--once', action='store_true', help='完成首次分析后只轮询一次')
+    args = parser.parse_args()
+
+    stock_info = dict(s.split('=', 1) for s in args.stock) or {'上证指数': 'sh000001'}
+    install_from_env()
+    if as_api.TRANSPORT is None:
+        as_api.set_transport(LiveTransport())
+    calendar = load_calendar()
+    as_api.set_calendar(calendar)
+
+    scheduler = MarketScheduler(StockAnalyzer(stock_info), calendar, args.interval, args.output,
+                                charts=not args.no_charts)
+    if args.once:
+        scheduler.start()
+        scheduler.poll_once()
+        print(scheduler.stats)
+        return
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print(f"已停止  累计: {scheduler.stats}")
+
+
+if __name__ == '__main__':
+    main()
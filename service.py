@@ -0,0 +1,210 @@
+"""
+常驻分析服务
+
+进程内保持 StockAnalyzer、行情数据、技术指标缓存以及HTTP/LLM客户端常驻，
+通过本地 HTTP/JSON 接口按需分析单只股票、刷新自选股或生成报告，
+避免每次运行都重新启动解释器、导入依赖和建立连接。
+
+接口:
+    GET  /health                         服务状态
+    GET  /analyze?code=sh600000          分析单只股票，refresh=1 强制重新获取数据
+    POST /refresh                        刷新自选股数据，可选JSON body: {"codes": [...]}
+    GET  /report[?code=sh600000,...]     生成HTML报告
+
+用法:
+    python service.py --port 8000 --stock 上证指数=sh000001 --stock 平安银行=sz000001
+"""
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import Ashare as as_api
+from main import StockAnalyzer
+from transport import LiveTransport, install_from_env
+
+
+class AnalysisService:
+    """持有常驻状态的分析服务"""
+
+    def __init__(self, stock_info: Dict[str, str], max_age: float = 300, **analyzer_kwargs):
+        """
+        初始化分析服务
+
+        Args:
+            stock_info (Dict[str, str]): 自选股 {股票名称: 股票代码}
+            max_age (float): 行情数据的最长缓存时间(秒)，超时后下次请求会重新获取
+            **analyzer_kwargs: 透传给 StockAnalyzer 的参数
+        """
+        self.analyzer = StockAnalyzer(stock_info, **analyzer_kwargs)
+        self.max_age = max_age
+        self.started_at = time.time()
+        self.fetched_at: Dict[str, float] = {}
+        # 分析结果缓存: code -> (生成时使用的原始数据, 分析数据)
+        self.analysis_cache: Dict[str, tuple] = {}
+        self._code_locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+        # 未配置录制/回放时使用带连接复用的直连传输
+        if as_api.TRANSPORT is None:
+            as_api.set_transport(LiveTransport())
+
+    def _lock_for(self, code: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._code_locks[code]
+
+    def ensure_data(self, code: str, refresh: bool = False) -> bool:
+        """确保股票数据存在且未过期，返回数据是否可用"""
+        with self._lock_for(code):
+            age = time.time() - self.fetched_at.get(code, 0)
+            if refresh or code not in self.analyzer.data or age > self.max_age:
+                if self.analyzer.fetch_stock(code):
+                    self.fetched_at[code] = time.time()
+            return code in self.analyzer.data
+
+    def analyze(self, code: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        分析单只股票，数据未变化时直接返回缓存的分析结果
+
+        Args:
+            code (str): 股票代码
+            refresh (bool): 是否强制重新获取数据
+
+        Returns:
+            Optional[Dict[str, Any]]: 分析数据，数据获取失败时返回None
+        """
+        if not self.ensure_data(code, refresh):
+            return None
+        with self._lock_for(code):
+            df = self.analyzer.data[code]
+            cached = self.analysis_cache.get(code)
+            if cached is not None and cached[0] is df:
+                return cached[1]
+            analysis_data = self.analyzer.generate_analysis_data(code)
+            self.analysis_cache[code] = (df, analysis_data)
+            return analysis_data
+
+    def refresh_watchlist(self, codes: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """重新获取自选股数据"""
+        codes = codes or self.analyzer.stock_codes
+        self.analyzer.prepare_market_context(refresh=True)
+        result = {"refreshed": [], "failed": []}
+        for code in codes:
+            ok = self.ensure_data(code, refresh=True)
+            result["refreshed" if ok else "failed"].append(code)
+        return result
+
+    def render_report(self, codes: Optional[List[str]] = None) -> str:
+        """生成HTML报告，复用缓存的分析结果"""
+        codes = codes or self.analyzer.stock_codes
+        sections = []
+        for code in codes:
+            analysis_data = self.analyze(code)
+            sections.append(self.analyzer.generate_stock_section(code, analysis_data))
+        return self.analyzer.render_report(sections)
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    service: AnalysisService = None
+
+    def _send(self, status: int, body: str, content_type: str = 'application/json; charset=utf-8'):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, status: int, data: Any):
+        self._send(status, json.dumps(data, ensure_ascii=False))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == '/health':
+                self._send_json(200, {
+                    "status": "ok",
+                    "symbols": sorted(self.service.analyzer.data),
+                    "uptime": round(time.time() - self.service.started_at, 1),
+                    "llm_usage": self.service.analyzer.llm.usage if self.service.analyzer.llm else None
+                })
+            elif url.path == '/analyze':
+                code = query.get('code')
+                if not code:
+                    return self._send_json(400, {"error": "缺少参数 code"})
+                start = time.perf_counter()
+                analysis_data = self.service.analyze(code, refresh=query.get('refresh') == '1')
+                if analysis_data is None:
+                    return self._send_json(404, {"error": f"无法获取股票 {code} 的数据"})
+                self._send_json(200, {
+                    "code": code,
+                    "name": self.service.analyzer.get_stock_name(code),
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "data": analysis_data
+                })
+            elif url.path == '/report':
+                codes = query['code'].split(',') if query.get('code') else None
+                self._send(200, self.service.render_report(codes), 'text/html; charset=utf-8')
+            elif url.path == '/refresh':
+                self._send_json(200, self.service.refresh_watchlist())
+            else:
+                self._send_json(404, {"error": "未知接口"})
+        except Exception as e:
+            print(f"处理请求 {self.path} 时出错: {str(e)}")
+            self._send_json(500, {"error": str(e)})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/refresh':
+            return self._send_json(404, {"error": "未知接口"})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+            self._send_json(200, self.service.refresh_watchlist(body.get('codes')))
+        except Exception as e:
+            print(f"处理请求 {self.path} 时出错: {str(e)}")
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {format % args}")
+
+
+def serve(service: AnalysisService, host: str = '127.0.0.1', port: int = 8000) -> ThreadingHTTPServer:
+    """创建绑定到给定服务的HTTP服务器"""
+    handler = type('ServiceHandler', (_ServiceHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻股票分析服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--stock', action='append', default=[], help='自选股，格式: 名称=代码，可重复')
+    parser.add_argument('--max-age', type=float, default=300, help='行情数据缓存时间(秒)')
+    parser.add_argument('--no-warm', action='store_true', help='启动时不预先获取自选股数据')
+    args = parser.parse_args()
+
+    stock_info = dict(s.split('=', 1) for s in args.stock) or {'上证指数': 'sh000001'}
+    install_from_env()
+    service = AnalysisService(stock_info, max_age=args.max_age)
+    if not args.no_warm:
+        print("预热: 获取自选股数据...")
+        service.refresh_watchlist()
+
+    server = serve(service, args.host, args.port)
+    print(f"分析服务已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
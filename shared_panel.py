@@ -0,0 +1,194 @@
+"""
+共享内存行情面板
+
+全部股票的K线和技术指标放在同一块命名共享内存(multiprocessing.shared_memory)中：
+
+    dates   int64[行数]                所有股票的日期依次首尾相接
+    values  float64[字段数, 行数]      每个字段一行，每只股票占其中连续的一段
+
+每只股票的 (偏移, 长度) 记录在索引中，某只股票某个字段的数据是一段连续的一维数组。
+子进程只接收共享内存名称和索引(几KB)，按名称映射同一块内存，直接读取K线、就地写入指标，
+股票的 DataFrame 和指标结果都不需要在进程之间序列化。
+
+用法:
+    python main.py --processes 4
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from indicator_block import IndicatorBlock
+from main import INDICATOR_COLUMNS, INDICATOR_PROGRAM
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+PANEL_FIELDS = BAR_COLUMNS + tuple(INDICATOR_COLUMNS)
+
+# (共享内存名称, 字段, 代码, 偏移, 长度)，传给子进程的全部信息
+PanelSpec = Tuple[str, Tuple[str, ...], Tuple[str, ...], Tuple[int, ...], Tuple[int, ...]]
+
+
+class SharedPanel:
+    """按股票分段存放在一块共享内存中的K线/指标面板"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, fields: Sequence[str], codes: Sequence[str],
+                 offsets: Sequence[int], lengths: Sequence[int], owner: bool = False):
+        self.shm = shm
+        self.fields = tuple(fields)
+        self.codes = tuple(codes)
+        self.offsets = tuple(int(o) for o in offsets)
+        self.lengths = tuple(int(n) for n in lengths)
+        self.owner = owner
+        self.rows = sum(self.lengths)
+        self._field = {f: i for i, f in enumerate(self.fields)}
+        self._slot = {c: (o, o + n) for c, o, n in zip(self.codes, self.offsets, self.lengths)}
+        self.dates = np.ndarray((self.rows,), dtype=np.int64, buffer=shm.buf)
+        self.values = np.ndarray((len(self.fields), self.rows), dtype=np.float64, buffer=shm.buf,
+                                 offset=self.rows * 8)
+
+    @classmethod
+    def create(cls, frames: Dict[str, pd.DataFrame], fields: Sequence[str] = PANEL_FIELDS) -> 'SharedPanel':
+        """
+        分配共享内存并写入K线，其余字段初始化为NaN
+
+        Args:
+            frames (Dict[str, pd.DataFrame]): 代码 -> 日线数据
+            fields: 面板字段，数据中已有的字段会被写入
+
+        Returns:
+            SharedPanel: 由当前进程负责释放的面板
+        """
+        codes = [c for c, df in frames.items() if df is not None and len(df)]
+        lengths = [len(frames[c]) for c in codes]
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int).tolist() if codes else []
+        rows = sum(lengths)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, rows * 8 * (1 + len(fields))))
+        panel = cls(shm, fields, codes, offsets, lengths, owner=True)
+        panel.values.fill(np.nan)
+        for code, start in zip(codes, offsets):
+            df = frames[code]
+            end = start + len(df)
+            panel.dates[start:end] = df.index.values.astype('datetime64[ns]').view(np.int64)
+            present = [f for f in panel.fields if f in df.columns]
+            panel.values[[panel._field[f] for f in present], start:end] = df[present].to_numpy(dtype=np.float64).T
+        return panel
+
+    @classmethod
+    def attach(cls, spec: PanelSpec) -> 'SharedPanel':
+        """按 spec() 的结果映射已存在的面板(零拷贝)"""
+        name, fields, codes, offsets, lengths = spec
+        return cls(shared_memory.SharedMemory(name=name), fields, codes, offsets, lengths)
+
+    def spec(self) -> PanelSpec:
+        return self.shm.name, self.fields, self.codes, self.offsets, self.lengths
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._slot
+
+    def column(self, code: str, field: str) -> np.ndarray:
+        """单只股票单个字段的可写视图"""
+        start, end = self._slot[code]
+        return self.values[self._field[field], start:end]
+
+    def arrays(self, code: str, fields: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        return {f: self.column(code, f) for f in (fields or self.fields)}
+
+    def index(self, code: str) -> pd.DatetimeIndex:
+        start, end = self._slot[code]
+        return pd.DatetimeIndex(self.dates[start:end].view('datetime64[ns]'))
+
+    def frame(self, code: str, fields: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """单只股票的数据(复制到进程内存，面板释放后仍可使用)"""
+        fields = list(fields or self.fields)
+        start, end = self._slot[code]
+        rows = [self._field[f] for f in fields]
+        return pd.DataFrame(self.values[rows, start:end].T.copy(), index=self.index(code).copy(), columns=fields)
+
+    def close(self) -> None:
+        """解除映射，创建者同时释放共享内存"""
+        self.dates = self.values = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> 'SharedPanel':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def compute_into(panel: SharedPanel, codes: Iterable[str]) -> List[str]:
+    """计算技术指标并就地写入面板，与 StockAnalyzer._compute_indicators 的结果一致，返回计算成功的代码"""
+    done = []
+    for code in codes:
+        try:
+            result = INDICATOR_PROGRAM.run(panel.arrays(code, BAR_COLUMNS))
+            for column, output in INDICATOR_COLUMNS.items():
+                panel.column(code, column)[:] = result[output]
+            rsi = panel.column(code, 'RSI')
+            rsi[np.isnan(rsi)] = 50
+            done.append(code)
+        except Exception as e:
+            print(f"计算技术指标时出错 {code}: {str(e)}")
+    return done
+
+
+def _worker(spec: PanelSpec, codes: List[str]) -> List[str]:
+    panel = SharedPanel.attach(spec)
+    try:
+        return compute_into(panel, codes)
+    finally:
+        panel.close()
+
+
+def _chunks(codes: Sequence[str], lengths: Sequence[int], parts: int) -> List[List[str]]:
+    """按K线数量把股票均匀分给各进程"""
+    buckets: List[List[str]] = [[] for _ in range(parts)]
+    load = [0] * parts
+    for code, n in sorted(zip(codes, lengths), key=lambda x: -x[1]):
+        i = load.index(min(load))
+        buckets[i].append(code)
+        load[i] += n
+    return [b for b in buckets if b]
+
+
+def compute_indicators_shared(analyzer, processes: Optional[int] = None) -> int:
+    """
+    多进程计算 StockAnalyzer 全部股票的技术指标，结果写入其指标缓存
+
+    Args:
+        analyzer (StockAnalyzer): 已获取数据的股票分析器
+        processes (int): 进程数，默认为CPU核数
+
+    Returns:
+        int: 成功计算的股票数量
+    """
+    frames = {code: analyzer.data[code] for code in analyzer.stock_codes if code in analyzer.data}
+    if not frames:
+        return 0
+    processes = max(1, min(processes or os.cpu_count() or 1, len(frames)))
+    with SharedPanel.create(frames) as panel:
+        if processes == 1:
+            done = compute_into(panel, panel.codes)
+        else:
+            parts = _chunks(panel.codes, panel.lengths, processes)
+            with ProcessPoolExecutor(processes) as pool:
+                done = [code for codes in pool.map(_worker, [panel.spec()] * len(parts), parts) for code in codes]
+        rows = [panel._field[c] for c in INDICATOR_COLUMNS]
+        columns = list(INDICATOR_COLUMNS)
+        for code in done:
+            df = frames[code]
+            start, end = panel._slot[code]
+            block = panel.values[rows, start:end].T
+            if all(dtype == np.float64 for dtype in df.dtypes):
+                # 与 StockAnalyzer._compute_indicators 相同，K线和指标写入同一个连续数组
+                result = IndicatorBlock.from_arrays(df, dict(zip(columns, block.T))).frame()
+            else:
+                result = pd.concat([df.copy(), pd.DataFrame(block.copy(), index=df.index, columns=columns)], axis=1)
+            analyzer._indicator_cache[code] = (df, result)
+    print(f"已用 {processes} 个进程计算 {len(done)} 只股票的技术指标")
+    return len(done)
@@ -0,0 +1,366 @@
+"""
+按内容哈希缓存的增量分析流水线
+
+每只股票的分析被拆成若干阶段: 获取数据 -> 技术指标 -> 技术面分析 / 图表 / AI分析 -> 报告片段。
+每个阶段的输出按 "输入指纹 + 阶段版本" 的哈希存入本地产物库，输入未变化的阶段直接复用产物：
+
+- 修改CSS或报告模板: 只重新拼装报告
+- 修改图表配色: 只重新绘图和拼装报告，不重新获取个股数据、不调用AI
+- 出现新的K线: 只有该股票的下游阶段重新计算
+
+阶段版本取自实现该阶段的函数源码、MyTT/计算内核/公式编译器/指标存储的源码以及提示词，代码改动后对应阶段自动失效。
+大盘背景(上证指数)是提示词的一部分，按行情时间桶存入产物库，同一时间桶的运行使用同一份，AI阶段的版本保持不变。
+
+断点续跑只依赖产物库：每个阶段完成后立即写入产物库，.cache/run_journal.jsonl 只记录每次运行的行情时间桶和是否完成。
+运行中断(AI服务故障、网络超时、进程被杀)后，`python main.py --resume` 沿用中断运行的时间桶(及该桶的大盘背景)，
+各阶段的键与中断前相同，已完成的阶段全部从产物库读取，只执行剩余的部分。
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+import pytz
+
+import MyTT as mt
+import charts
+import features
+import formula
+import indicator_block
+import kernels
+import llm
+import main
+from main import StockAnalyzer
+
+DEFAULT_STORE_DIR = '.cache/artifacts'
+DEFAULT_JOURNAL_PATH = '.cache/run_journal.jsonl'
+
+
+def _sha1(*parts: Any) -> str:
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def source_hash(*objs: Any) -> str:
+    """函数/模块源码的哈希，作为阶段版本号"""
+    return _sha1(*(inspect.getsource(obj) for obj in objs))[:16]
+
+
+def fingerprint_frame(df: Optional[pd.DataFrame]) -> str:
+    """K线数据的内容指纹（索引 + 全部数值）"""
+    if df is None:
+        return 'none'
+    return _sha1(
+        df.index.asi8.tobytes() if isinstance(df.index, pd.DatetimeIndex) else repr(list(df.index)),
+        ','.join(df.columns),
+        df.to_numpy(dtype='float64').tobytes()
+    )
+
+
+def market_bucket(now: Optional[datetime] = None, calendar=None) -> str:
+    """
+    行情数据的时间桶：同一交易日收盘后的多次运行复用同一份数据，盘中则按分钟区分
+
+    提供交易日历时，非交易日和开盘前的运行归入最近一个交易日的收盘桶，复用该桶中已获取的个股数据
+
+    Args:
+        now (datetime): 当前时间，默认为北京时间
+        calendar (TradingCalendar): 交易日历
+
+    Returns:
+        str: 例如 '2026-10-16/close' 或 '2026-10-16 10:31'
+    """
+    now = now or datetime.now(pytz.timezone('Asia/Shanghai'))
+    minute = now.hour * 60 + now.minute
+    if calendar is not None:
+        if not calendar.is_trading_day(now.date()):
+            return calendar.last_session(now.date()).strftime('%Y-%m-%d') + '/close'
+        if minute < 9 * 60 + 30:
+            return calendar.previous_session(now.date()).strftime('%Y-%m-%d') + '/close'
+    if minute >= 15 * 60:
+        return now.strftime('%Y-%m-%d') + '/close'
+    return now.strftime('%Y-%m-%d %H:%M')
+
+
+class ArtifactStore:
+    """阶段产物库，产物按 阶段/股票代码/输入哈希 存储为pickle文件"""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+
+    def _path(self, stage: str, code: str, key: str) -> str:
+        return os.path.join(self.root, stage, code, key + '.pkl')
+
+    def get(self, stage: str, code: str, key: str) -> Optional[Tuple[Any, str]]:
+        """读取产物，返回 (输出, 输出指纹)，不存在时返回None"""
+        path = self._path(stage, code, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"读取产物 {path} 失败，将重新计算: {str(e)}")
+            return None
+
+    def put(self, stage: str, code: str, key: str, output: Any, fingerprint: str) -> None:
+        """原子写入产物"""
+        path = self._path(stage, code, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((output, fingerprint), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+class RunJournal:
+    """
+    运行日志，每行一个JSON事件，逐条写入磁盘：
+
+        {"event": "start", "bucket": ..., "codes": [...], "time": ...}
+        {"event": "finish", "time": ...}
+
+    各阶段的完成情况不在这里记录，以产物库为准
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._file = None
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start(self, bucket: str, codes: Sequence[str], resume: bool = False) -> None:
+        """开始记录，resume 为True时在原日志后继续追加"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if not resume:
+            self._append({'event': 'start', 'bucket': bucket, 'codes': list(codes),
+                          'time': datetime.now().isoformat(timespec='seconds')})
+
+    def finish(self) -> None:
+        self._append({'event': 'finish', 'time': datetime.now().isoformat(timespec='seconds')})
+        self._file.close()
+        self._file = None
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        读取上一次运行的进度
+
+        Returns:
+            Optional[Dict[str, Any]]: {'bucket', 'codes', 'finished'}，没有日志时返回None
+        """
+        if not os.path.exists(self.path):
+            return None
+        state = None
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # 中断时写了一半的最后一行
+                if event['event'] == 'start':
+                    state = {'bucket': event['bucket'], 'codes': event['codes'], 'finished': False}
+                elif state is not None and event['event'] == 'finish':
+                    state['finished'] = True
+        return state
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+
+    Args:
+        name (str): 阶段名称
+        func (Callable): 计算函数 func(code, *依赖阶段输出)，返回阶段输出
+        deps (Sequence[str]): 依赖的上游阶段名称
+        version (str): 阶段版本，变化时产物失效
+        fingerprint (Callable): 由输出计算指纹的函数，为None时以输入哈希作为输出指纹
+        cacheable (Callable): 判断输出是否可以缓存的函数，为None时总是缓存
+    """
+
+    def __init__(self, name: str, func: Callable, deps: Sequence[str] = (), version: str = '',
+                 fingerprint: Callable = None, cacheable: Callable = None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.version = version
+        self.fingerprint = fingerprint
+        self.cacheable = cacheable
+
+
+def _ai_result_ok(result: Optional[Dict[str, Any]]) -> bool:
+    """AI分析失败的占位结果不缓存，下次运行重试"""
+    if not result:
+        return False
+    return result.get("AI分析结果", {}).get("分析状态") != "分析失败"
+
+
+class IncrementalPipeline:
+    """在 StockAnalyzer 之上按阶段增量执行分析"""
+
+    def __init__(self, analyzer: StockAnalyzer, store: Optional[ArtifactStore] = None,
+                 bucket: Optional[str] = None, calendar=None, journal: Optional[RunJournal] = None,
+                 resume: bool = False):
+        """
+        Args:
+            analyzer (StockAnalyzer): 股票分析器
+            store (ArtifactStore): 产物库，默认为 .cache/artifacts
+            bucket (str): 行情数据时间桶，默认由 market_bucket() 计算
+            calendar (TradingCalendar): 交易日历，用于让非交易日的运行复用上一交易日的数据
+            journal (RunJournal): 运行日志，默认为 .cache/run_journal.jsonl
+            resume (bool): 从上一次未完成的运行继续，沿用其行情时间桶
+        """
+        self.analyzer = analyzer
+        self.store = store or ArtifactStore()
+        self.journal = journal or RunJournal()
+        self.resumed = None
+        if resume:
+            state = self.journal.load()
+            if state is None or state['finished']:
+                print("没有未完成的运行，重新开始")
+            else:
+                self.resumed = state
+                print(f"从断点继续: 沿用上次运行的行情时间桶 {state['bucket']}，已完成的阶段从产物库读取")
+        self.bucket = bucket or (self.resumed['bucket'] if self.resumed else market_bucket(calendar=calendar))
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._prepare_market_context()
+        self.stages = self._build_stages()
+
+    def _prepare_market_context(self) -> None:
+        """大盘背景按行情时间桶存入产物库，同一时间桶的运行(包括断点续跑)不重新获取，提示词保持不变"""
+        a = self.analyzer
+        if not a.llm:
+            return
+        code = main.MARKET_INDEX[1]
+        key = _sha1('market', a.count, self.bucket)
+        cached = self.store.get('market', code, key)
+        if cached is not None:
+            a.llm.set_market_context(cached[0])
+            return
+        a.prepare_market_context()
+        if a.llm.market_context:  # 获取失败时为空，不缓存，下次运行重试
+            self.store.put('market', code, key, a.llm.market_context, key)
+
+    def _build_stages(self) -> Dict[str, Stage]:
+        a = self.analyzer
+        indicator_version = _sha1(source_hash(StockAnalyzer._compute_indicators, mt, kernels, formula, indicator_block),
+                                  main.INDICATOR_COLUMNS)[:16]
+        model = a.llm.model if a.llm else 'none'
+        prompt_version = _sha1(
+            llm._create_system_prompt(), a.llm.market_context if a.llm else '',
+            source_hash(llm._format_data_for_prompt, llm._indicator_snapshot, llm._parse_analysis_response,
+                        llm.LLMAnalyzer._build_messages, features),
+            model
+        )[:16]
+        stages = [
+            Stage('fetch', self._fetch, version=_sha1(a.count, self.bucket)[:16], fingerprint=fingerprint_frame,
+                  cacheable=lambda df: df is not None),
+            Stage('indicators', self._indicators, deps=['fetch'], version=indicator_version),
+            Stage('analysis', lambda code, df, ind: a.generate_analysis_data(code, with_ai=False),
+                  deps=['fetch', 'indicators'],
+                  version=source_hash(StockAnalyzer.generate_analysis_data, main.generate_trading_signals)),
+            Stage('charts', lambda code, df, ind: a.plot_analysis(code) or '',
+                  deps=['fetch', 'indicators'], version=source_hash(StockAnalyzer.plot_analysis, charts)),
+            Stage('ai', lambda code, df, ind: a.llm.request_analysis(df, ind) if a.llm else None,
+                  deps=['fetch', 'indicators'], version=prompt_version,
+                  cacheable=lambda result: a.llm is None or _ai_result_ok(result)),
+            Stage('section', self._section, deps=['analysis', 'charts', 'ai'],
+                  version=source_hash(StockAnalyzer.generate_stock_section, main._generate_table_row,
+                                      main._get_value_class)),
+        ]
+        return {stage.name: stage for stage in stages}
+
+    def _fetch(self, code: str) -> Optional[pd.DataFrame]:
+        return self.analyzer.data[code] if self.analyzer.fetch_stock(code) else None
+
+    def _indicators(self, code: str, df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        return None if df is None else self.analyzer.calculate_indicators(code)
+
+    def _section(self, code: str, analysis_data: Dict[str, Any], chart_html: str,
+                 ai_result: Optional[Dict[str, Any]]) -> str:
+        analysis_data = dict(analysis_data)
+        if ai_result:
+            analysis_data.update(ai_result)
+        return self.analyzer.generate_stock_section(code, analysis_data, chart_html)
+
+    def _restore(self, code: str, name: str, output: Any) -> None:
+        """把复用的上游产物放回分析器，供未命中缓存的下游阶段使用"""
+        a = self.analyzer
+        if name == 'fetch' and output is not None:
+            a.data[code] = output
+        elif name == 'indicators' and output is not None and code in a.data:
+            a._indicator_cache[code] = (a.data[code], output)
+
+    def run_symbol(self, code: str) -> Dict[str, Any]:
+        """
+        按阶段执行单只股票的分析，返回各阶段输出
+
+        Args:
+            code (str): 股票代码
+
+        Returns:
+            Dict[str, Any]: 阶段名称到输出的映射
+        """
+        outputs: Dict[str, Any] = {}
+        fingerprints: Dict[str, str] = {}
+        transient = set()  # 本次未缓存的阶段，下游产物依赖它们时也不缓存(例如AI分析失败后生成的报告片段)
+        for name, stage in self.stages.items():
+            if name != 'fetch' and outputs.get('fetch') is None:
+                outputs[name] = None
+                continue
+
+            key = _sha1(name, stage.version, code, *(fingerprints[d] for d in stage.deps))
+            cached = self.store.get(name, code, key)
+            stat = self.stats.setdefault(name, {'hit': 0, 'miss': 0})
+            if cached is not None:
+                output, fingerprint = cached
+                stat['hit'] += 1
+                self._restore(code, name, output)
+            else:
+                output = stage.func(code, *(outputs[d] for d in stage.deps))
+                fingerprint = stage.fingerprint(output) if stage.fingerprint else key
+                stat['miss'] += 1
+                if (stage.cacheable is None or stage.cacheable(output)) and not transient.intersection(stage.deps):
+                    self.store.put(name, code, key, output, fingerprint)
+                else:
+                    transient.add(name)
+            outputs[name] = output
+            fingerprints[name] = fingerprint
+        return outputs
+
+    def run(self, output_path: str = 'public/index.html') -> Optional[str]:
+        """增量运行全部股票并写出报告"""
+        print("开始增量运行股票分析...")
+        self.journal.start(self.bucket, self.analyzer.stock_codes, resume=self.resumed is not None)
+        try:
+            sections = []
+            for code in self.analyzer.stock_codes:
+                outputs = self.run_symbol(code)
+                sections.append(outputs['section'] or self.analyzer.generate_stock_section(code))
+
+            if not self.analyzer.data:
+                self.journal.finish()
+                print("错误: 没有获取到任何有效的股票数据")
+                return None
+
+            for name, stat in self.stats.items():
+                print(f"阶段 {name}: 复用 {stat['hit']}，重新计算 {stat['miss']}")
+            if self.analyzer.llm:
+                print(self.analyzer.llm.usage_summary())
+
+            main.write_report(self.analyzer.render_report(sections), output_path)
+            self.journal.finish()
+            print(f"分析报告已生成: {output_path}")
+            return output_path
+        finally:
+            self.analyzer.close()
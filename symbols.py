@@ -0,0 +1,229 @@
+"""
+全市场证券代码表
+
+沪深京三个交易所的全部A股代码以列式数组常驻内存，保存为压缩CSV(data/symbols.csv.gz，约100KB，随仓库提交)：
+- 代码 <-> 名称 的O(1)双向查询
+- 批量把 600000.XSHG / 000001.XSHE / 600000.SH / 纯数字 等写法统一为 sh600000 形式
+- 按交易所、板块、上市时间、名称筛选股票池，供大批量运行使用
+
+板块由代码前缀确定：沪市主板、科创板、深市主板、创业板、北交所、指数。
+
+用法:
+    python symbols.py update                      # 从东方财富获取全市场代码表
+    python symbols.py select --board 科创板 --limit 20
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+import Ashare as as_api
+
+SYMBOLS_PATH = 'data/symbols.csv.gz'
+FIELDS = ('code', 'name', 'exchange', 'board', 'list_date')
+
+# 东方财富行情列表：f12代码 f13市场(1沪 0深/京) f14名称 f26上市日期
+EM_URL = ('http://push2.eastmoney.com/api/qt/clist/get?pn={page}&pz={size}&po=0&np=1&fltt=2&invt=2&fid=f12'
+          '&fs=m:1+t:2,m:1+t:23,m:0+t:6,m:0+t:80,m:0+t:81+s:2048&fields=f12,f13,f14,f26')
+EM_PAGE_SIZE = 100
+
+# 代码前缀 -> 板块，按顺序匹配
+BOARDS = (
+    ('sh688', '科创板'), ('sh689', '科创板'), ('sh000', '指数'), ('sh60', '沪市主板'), ('sh900', 'B股'),
+    ('sz399', '指数'), ('sz300', '创业板'), ('sz301', '创业板'), ('sz00', '深市主板'), ('sz200', 'B股'),
+    ('bj', '北交所'),
+)
+# 纯数字代码 -> 交易所(北交所代码以4/8/92开头)
+_EXCHANGE_BY_DIGIT = {'6': 'sh', '5': 'sh', '9': 'sh', '0': 'sz', '1': 'sz', '2': 'sz', '3': 'sz', '4': 'bj', '8': 'bj'}
+_SUFFIXES = {'XSHG': 'sh', 'SH': 'sh', 'SS': 'sh', 'XSHE': 'sz', 'SZ': 'sz', 'BJ': 'bj', 'XBSE': 'bj'}
+
+
+def normalize_code(code: str) -> str:
+    """单个代码转换为 sh600000 形式，无法识别时原样返回"""
+    c = str(code).strip()
+    if '.' in c:
+        digits, suffix = c.split('.', 1)
+        prefix = _SUFFIXES.get(suffix.upper())
+        return prefix + digits if prefix else c
+    low = c.lower()
+    if low[:2] in ('sh', 'sz', 'bj'):
+        return low
+    if len(c) == 6 and c.isdigit():
+        return ('bj' if c.startswith('92') else _EXCHANGE_BY_DIGIT.get(c[0], 'sz')) + c
+    return c
+
+
+def normalize_codes(codes: Iterable[str]) -> List[str]:
+    """批量转换代码写法，重复出现的写法只解析一次"""
+    codes = list(codes)
+    memo = {c: normalize_code(c) for c in dict.fromkeys(codes)}
+    return [memo[c] for c in codes]
+
+
+def board_of(code: str) -> str:
+    """由代码前缀判断板块"""
+    for prefix, board in BOARDS:
+        if code.startswith(prefix):
+            return board
+    return '其他'
+
+
+class SymbolRegistry:
+    """列式存储的证券代码表"""
+
+    def __init__(self, rows: Iterable[Dict[str, str]] = ()):
+        rows = list(rows)
+        self.codes = np.array([r['code'] for r in rows], dtype=object)
+        self.names = np.array([r['name'] for r in rows], dtype=object)
+        self.exchanges = np.array([r.get('exchange') or r['code'][:2] for r in rows], dtype=object)
+        self.boards = np.array([r.get('board') or board_of(r['code']) for r in rows], dtype=object)
+        self.list_dates = np.array([int(r.get('list_date') or 0) for r in rows], dtype=np.int32)   # yyyymmdd，未知为0
+        self._by_code = {c: i for i, c in enumerate(self.codes)}
+        self._by_name: Dict[str, int] = {}
+        for i, name in enumerate(self.names):
+            self._by_name.setdefault(name, i)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return normalize_code(code) in self._by_code
+
+    def name(self, code: str, default: Optional[str] = None) -> Optional[str]:
+        i = self._by_code.get(code)
+        if i is None:
+            i = self._by_code.get(normalize_code(code))
+        return self.names[i] if i is not None else default
+
+    def code(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        i = self._by_name.get(name)
+        return self.codes[i] if i is not None else default
+
+    def info(self, code: str) -> Optional[Dict[str, object]]:
+        """单只证券的全部字段"""
+        i = self._by_code.get(normalize_code(code))
+        if i is None:
+            return None
+        return {'code': self.codes[i], 'name': self.names[i], 'exchange': self.exchanges[i],
+                'board': self.boards[i], 'list_date': int(self.list_dates[i])}
+
+    def select(self, exchanges: Optional[Iterable[str]] = None, boards: Optional[Iterable[str]] = None,
+               listed_before: Optional[int] = None, name_contains: Optional[str] = None,
+               exclude_st: bool = False, limit: Optional[int] = None) -> List[str]:
+        """
+        筛选股票池
+
+        Args:
+            exchanges: 交易所(sh/sz/bj)
+            boards: 板块名称，见 BOARDS
+            listed_before (int): 只保留在该日期(yyyymmdd)之前上市的股票，用于保证历史数据足够
+            name_contains (str): 名称包含的文字
+            exclude_st (bool): 排除ST/*ST股票
+            limit (int): 最多返回的数量
+
+        Returns:
+            List[str]: 代码列表，保持代码表中的顺序
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if exchanges:
+            mask &= np.isin(self.exchanges, list(exchanges))
+        if boards:
+            mask &= np.isin(self.boards, list(boards))
+        if listed_before:
+            mask &= (self.list_dates > 0) & (self.list_dates < listed_before)
+        if name_contains:
+            mask &= np.array([name_contains in n for n in self.names], dtype=bool)
+        if exclude_st:
+            mask &= ~np.array(['ST' in n for n in self.names], dtype=bool)
+        selected = self.codes[mask].tolist()
+        return selected[:limit] if limit else selected
+
+    def watchlist(self, codes: Iterable[str]) -> Dict[str, str]:
+        """代码列表转换为 StockAnalyzer 使用的 {名称: 代码} 字典，未收录的代码以代码作为名称"""
+        return {self.name(c, c): c for c in normalize_codes(codes)}
+
+    def save(self, path: str = SYMBOLS_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(FIELDS)
+        writer.writerows(zip(self.codes, self.names, self.exchanges, self.boards, self.list_dates))
+        tmp = path + '.tmp'
+        with gzip.open(tmp, 'wt', encoding='utf-8', newline='') as f:
+            f.write(buf.getvalue())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = SYMBOLS_PATH) -> 'SymbolRegistry':
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            return cls(csv.DictReader(f))
+
+
+def fetch_registry(page_size: int = EM_PAGE_SIZE) -> SymbolRegistry:
+    """从东方财富行情列表分页获取沪深京全部A股"""
+    rows, page, total = [], 1, None
+    while total is None or len(rows) < total:
+        data = json.loads(as_api.http_get(EM_URL.format(page=page, size=page_size)))['data']
+        if not data or not data.get('diff'):
+            break
+        total = data['total']
+        for item in data['diff']:
+            digits = str(item['f12'])
+            exchange = 'sh' if item['f13'] == 1 else 'bj' if digits[:1] in '48' or digits.startswith('92') else 'sz'
+            rows.append({'code': exchange + digits, 'name': str(item['f14']).replace(' ', ''),
+                         'exchange': exchange, 'list_date': item['f26'] if str(item['f26']).isdigit() else 0})
+        page += 1
+    rows.sort(key=lambda r: r['code'])
+    return SymbolRegistry(rows)
+
+
+_REGISTRY: Optional[SymbolRegistry] = None
+
+
+def registry(path: str = SYMBOLS_PATH) -> SymbolRegistry:
+    """进程内共享的代码表，本地文件不存在时为空表并给出提示"""
+    global _REGISTRY
+    if _REGISTRY is None:
+        try:
+            if os.path.exists(path):
+                _REGISTRY = SymbolRegistry.load(path)
+            else:
+                print(f"警告: 代码表 {path} 不存在，股票名称将显示为代码，按板块选股不可用；"
+                      f"请运行 python symbols.py update 生成并提交该文件")
+                _REGISTRY = SymbolRegistry()
+        except Exception as e:
+            print(f"读取代码表失败: {str(e)}")
+            _REGISTRY = SymbolRegistry()
+    return _REGISTRY
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='沪深京证券代码表')
+    parser.add_argument('command', choices=['update', 'select', 'lookup'])
+    parser.add_argument('--board', action='append', help='板块，可重复')
+    parser.add_argument('--exchange', action='append', help='交易所 sh/sz/bj，可重复')
+    parser.add_argument('--listed-before', type=int, help='上市日期早于 yyyymmdd')
+    parser.add_argument('--exclude-st', action='store_true')
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('query', nargs='*', help='lookup 查询的代码或名称')
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        reg = fetch_registry()
+        reg.save()
+        print(f"已保存 {len(reg)} 只证券到 {SYMBOLS_PATH}")
+    elif args.command == 'select':
+        if not len(registry()):
+            raise SystemExit(f"代码表为空，无法按条件选股: {SYMBOLS_PATH}")
+        for code in registry().select(args.exchange, args.board, args.listed_before,
+                                      exclude_st=args.exclude_st, limit=args.limit):
+            print(code, registry().name(code))
+    else:
+        reg = registry()
+        for q in args.query:
+            print(q, reg.info(q) or reg.info(reg.code(q, '')) or '未收录')
@@ -0,0 +1,127 @@
+"""
+公式编译器测试：运算符优先级、多语句、自定义公式、错误处理和公共子表达式消除
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import formula  # noqa: E402
+import MyTT  # noqa: E402
+from formula import FormulaError, builtin, compile_formulas  # noqa: E402
+
+BASELINE = np.load(os.path.join(os.path.dirname(__file__), 'fixtures', 'mytt_baseline.npz'))
+DATA = {'CLOSE': BASELINE['in_close'], 'HIGH': BASELINE['in_high'], 'LOW': BASELINE['in_low'],
+        'OPEN': BASELINE['in_open'], 'VOL': BASELINE['in_vol']}
+C = DATA['CLOSE']
+
+
+def run(source, **params):
+    return compile_formulas({'F': (source, params)}).run(DATA)
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('1+2*3', 7), ('(1+2)*3', 9), ('10-4-3', 3), ('8/4/2', 1), ('-2*3', -6), ('2*-3', -6), ('-(1+2)', -3),
+    ('2+3>4', 1), ('1>2 OR 3>2 AND 2>1', 1), ('(1>2 OR 3>2) AND 1>2', 0), ('1=1 AND 2<>3', 1), ('1<2 && 2<1 || 1', 1),
+])
+def test_operator_precedence(source, expected):
+    out = run(f'X:{source};')['F.X']
+    assert out.shape == C.shape
+    assert (out == expected).all()
+
+
+def test_precedence_with_series():
+    out = run('X:C-REF(C,1)*2>0 AND C>MA(C,5);')['F.X']
+    with np.errstate(invalid='ignore'):
+        expected = np.logical_and(C - MyTT.REF(C, 1) * 2 > 0, C > MyTT.MA(C, 5))
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_multi_statement_program():
+    out = run("""
+        {中间变量不输出}
+        A:=C*2;
+        B:A+1;
+        A-B;
+        D:B*N;
+    """, N=3)
+    assert set(out) == {'F.B', 'F.OUT2', 'F.D'}
+    np.testing.assert_allclose(out['F.B'], C * 2 + 1)
+    np.testing.assert_allclose(out['F.OUT2'], -1.0)
+    np.testing.assert_allclose(out['F.D'], (C * 2 + 1) * 3)
+
+
+def test_custom_formula_matches_mytt():
+    program = builtin(['MACD'], extra={'MY': ("""
+        TP:=(HIGH+LOW+CLOSE)/3;
+        DEV:TP-MA(TP,N);
+        UP:REF(C)<C;
+        BAND:IF(DEV>0,HHV(H,N),LLV(l,n));
+    """, {'n': 5})})
+    out = program.run({k.lower(): v for k, v in DATA.items()})
+    tp = (DATA['HIGH'] + DATA['LOW'] + C) / 3
+    dev = tp - MyTT.MA(tp, 5)
+    np.testing.assert_allclose(out['MY.DEV'], dev, equal_nan=True)
+    np.testing.assert_array_equal(out['MY.UP'], MyTT.REF(C, 1) < C)
+    np.testing.assert_allclose(out['MY.BAND'], MyTT.IF(dev > 0, MyTT.HHV(DATA['HIGH'], 5), MyTT.LLV(DATA['LOW'], 5)),
+                               equal_nan=True)
+    np.testing.assert_allclose(out['MACD.DIF'], BASELINE['ind_MACD_0'], equal_nan=True)
+    assert program.data_fields == ['CLOSE', 'HIGH', 'LOW']
+
+
+@pytest.mark.parametrize('source, message', [
+    ('X:FOO+1;', '未定义的变量或参数: FOO'),
+    ('X:BAR(C,1);', '不支持的函数: BAR'),
+    ('X:MA(C);', '至少需要 2 个参数'),
+    ('X:C+;', '意外的符号'),
+    ('X:(C+1;', "期望 ')'"),
+    ('X:C+1 Y:C;', "期望 ';'"),
+    ('X:C#1;', '无法识别的字符'),
+])
+def test_errors(source, message):
+    with pytest.raises(FormulaError, match=message.replace('(', r'\(').replace(')', r'\)')):
+        compile_formulas(source)
+
+
+def test_missing_data_field():
+    with pytest.raises(FormulaError, match='缺少行情数据: VOL'):
+        compile_formulas('X:MA(V,5);').run({'CLOSE': C})
+
+
+def test_common_subexpressions_are_evaluated_once(monkeypatch):
+    calls = []
+
+    def counting(func):
+        def call(*args):
+            calls.append(func.__name__)
+            return func(*args)
+        return call
+
+    for name in ('HHV', 'LLV', 'REF'):
+        impl, min_args, defaults = formula.FUNCTIONS[name]
+        monkeypatch.setitem(formula.FUNCTIONS, name, (counting(impl), min_args, defaults))
+
+    program = compile_formulas({
+        'WR': ('WR:(HHV(HIGH,N)-CLOSE)/(HHV(HIGH,N)-LLV(LOW,N))*100;', {'N': 10}),
+        'KDJ': ('RSV:=(C-LLV(L,N))/(HHV(H,N)-LLV(L,N))*100; K:EMA(RSV,5);', {'N': 10}),
+        'X': 'A:REF(C,1); B:REF(CLOSE)+REF(C,1);',
+    })
+    out = program.run(DATA)
+    assert sorted(calls) == ['HHV', 'LLV', 'REF']
+    assert program.stats()['reused'] > 0
+
+    hhv, llv = MyTT.HHV(DATA['HIGH'], 10), MyTT.LLV(DATA['LOW'], 10)
+    np.testing.assert_allclose(out['WR.WR'], (hhv - C) / (hhv - llv) * 100, equal_nan=True)
+    np.testing.assert_allclose(out['X.B'], MyTT.REF(C, 1) * 2, equal_nan=True)
+
+
+def test_builtin_program_matches_baseline():
+    out = builtin(['KDJ', 'BOLL', 'DMI']).run(DATA)
+    for name, outputs in (('KDJ', ('K', 'D', 'J')), ('BOLL', ('UPPER', 'MID', 'LOWER')),
+                          ('DMI', ('PDI', 'MDI', 'ADX', 'ADXR'))):
+        for i, var in enumerate(outputs):
+            np.testing.assert_allclose(out[f'{name}.{var}'], BASELINE[f'ind_{name}_{i}'], rtol=1e-9, atol=1e-9,
+                                       equal_nan=True)
@@ -0,0 +1,99 @@
+"""
+MyTT 内核与原pandas实现的一致性测试
+
+fixtures/mytt_baseline.npz 由改写为内核之前的 MyTT.py(提交 beaa8df，pandas实现)在固定输入上计算得到：
+    in_*          输入K线，in_gap 为含NaN的收盘价
+    prim_<原语>_<输入>_<N>   MA/SUM/STD/HHV/LLV/REF/DIFF/EMA/SMA/AVEDEV
+    scalar_<函数>_<N>        SLOPE/FORCAST 的标量结果
+    ind_<指标>_<序号>        各技术指标的输出
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kernels  # noqa: E402
+import MyTT  # noqa: E402
+
+BASELINE = np.load(os.path.join(os.path.dirname(__file__), 'fixtures', 'mytt_baseline.npz'))
+INPUTS = {'close': BASELINE['in_close'], 'gap': BASELINE['in_gap']}
+BARS = {'CLOSE': BASELINE['in_close'], 'HIGH': BASELINE['in_high'], 'LOW': BASELINE['in_low'],
+        'OPEN': BASELINE['in_open'], 'VOL': BASELINE['in_vol']}
+PRIMITIVES = sorted(k for k in BASELINE.files if k.startswith('prim_'))
+INDICATORS = sorted({k.split('_')[1] for k in BASELINE.files if k.startswith('ind_')})
+BACKENDS = ['numpy'] + [b for b in ('bottleneck', 'numba') if kernels._load_backend(b)]
+
+
+def assert_same(got, expected):
+    np.testing.assert_allclose(np.asarray(got, dtype=np.float64), expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize('key', PRIMITIVES)
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_primitive_matches_baseline(backend, key):
+    _, name, label, N = key.split('_')
+    func = kernels._load_backend(backend).get(name)
+    if func is None:
+        pytest.skip(f'{backend} 未提供 {name}')
+    assert_same(func(INPUTS[label], int(N)), BASELINE[key])
+
+
+@pytest.mark.parametrize('N', [5, 20])
+def test_slope_forcast_match_baseline(N):
+    close = BASELINE['in_close']
+    assert MyTT.SLOPE(close, N) == pytest.approx(BASELINE[f'scalar_SLOPE_{N}'][0], rel=1e-9, abs=1e-12)
+    assert MyTT.FORCAST(close, N) == pytest.approx(BASELINE[f'scalar_FORCAST_{N}'][0], rel=1e-9, abs=1e-12)
+    assert MyTT.SLOPES(close, N)[-1] == pytest.approx(BASELINE[f'scalar_SLOPE_{N}'][0], rel=1e-9, abs=1e-12)
+    assert MyTT.FORCASTS(close, N)[-1] == pytest.approx(BASELINE[f'scalar_FORCAST_{N}'][0], rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize('name', INDICATORS)
+def test_indicator_matches_baseline(name):
+    func = getattr(MyTT, name)
+    params = [p for p in func.__code__.co_varnames[:func.__code__.co_argcount] if p in BARS]
+    result = func(*(BARS[p] for p in params))
+    result = result if isinstance(result, tuple) else (result,)
+    expected = sorted((k for k in BASELINE.files if k.startswith(f'ind_{name}_')), key=lambda k: int(k.rsplit('_', 1)[1]))
+    assert len(result) == len(expected)
+    for got, key in zip(result, expected):
+        assert_same(got, BASELINE[key])
+
+
+@pytest.mark.parametrize('backend', BACKENDS + ['active'])
+def test_rolling_std_is_stable_on_long_series(backend):
+    """滚动标准差在长序列、大均值上与逐窗口两遍计算一致，包括当前生效(自动选择)的实现"""
+    func = kernels.ACTIVE['STD'] if backend == 'active' else kernels._load_backend(backend).get('STD')
+    if func is None:
+        pytest.skip(f'{backend} 未提供 STD')
+    rng = np.random.default_rng(0)
+    x = 1e4 + np.cumsum(rng.standard_normal(200_000))
+    x[1000] = np.nan
+    got = func(x, 20)
+    tail = np.arange(len(x) - 100, len(x))
+    assert_same(got[tail], [x[i - 19:i + 1].std() for i in tail])
+    assert np.isnan(got[1000:1020]).all() and not np.isnan(got[1020])
+
+
+def test_import_does_not_select_backend():
+    """导入时不加载加速后端，首次调用原语时才选择"""
+    import subprocess
+    code = ('import kernels, numpy as np; assert not kernels.ACTIVE_BACKEND; '
+            'kernels.ACTIVE["MA"](np.arange(10.), 3); assert kernels.ACTIVE_BACKEND["MA"]')
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.mark.parametrize('N', [2, 20, 500])
+def test_rolling_linreg_matches_polyfit_on_long_series(N):
+    """O(n) 滚动回归在长序列、大均值上与逐窗口 np.polyfit 一致"""
+    rng = np.random.default_rng(1)
+    x = 1e4 + np.cumsum(rng.standard_normal(100_000))
+    x[2000] = np.nan
+    slope, intercept = kernels.rolling_linreg(x, N)
+    for i in list(range(N - 1, N + 20)) + list(range(len(x) - 20, len(x))):
+        expected_slope, expected_intercept = np.polyfit(np.arange(N), x[i - N + 1:i + 1], 1)
+        assert slope[i] == pytest.approx(expected_slope, rel=1e-6, abs=1e-9)
+        assert intercept[i] == pytest.approx(expected_intercept, rel=1e-12, abs=1e-9)
+    assert np.isnan(slope[2000:2000 + N]).all() and np.isnan(intercept[2000:2000 + N]).all()
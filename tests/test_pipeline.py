@@ -0,0 +1,54 @@
+"""
+流水线执行器测试：结果顺序、出错项和背压上限
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import PipelinedExecutor, PipelineStage  # noqa: E402
+
+
+def test_results_in_input_order_with_errors():
+    def slow_odd(x):
+        time.sleep(0.01 * (x % 3))
+        if x == 4:
+            raise ValueError('bad')
+        return x * 10
+
+    executor = PipelinedExecutor([PipelineStage('a', slow_odd, workers=4, queue_size=2),
+                                  PipelineStage('b', lambda x: x + 1, workers=2, queue_size=2)])
+    out = list(executor.run(range(10)))
+    assert [item for item, _, _ in out] == list(range(10))
+    assert [value for item, value, error in out if error is None] == [x * 10 + 1 for x in range(10) if x != 4]
+    assert isinstance(out[4][2], ValueError)
+
+
+def test_completion_cannot_run_ahead_of_a_stuck_item():
+    """第一项卡住时，后面完成的项数不超过各段队列容量与并发数之和"""
+    release = threading.Event()
+    finished = []
+
+    def first_blocks(x):
+        if x == 0:
+            release.wait(5)
+        return x
+
+    def last(x):
+        finished.append(x)
+        return x
+
+    stages = [PipelineStage('fetch', lambda x: x, workers=2, queue_size=2),
+              PipelineStage('ai', first_blocks, workers=3, queue_size=2),
+              PipelineStage('render', last, workers=1, queue_size=2)]
+    window = sum(s.queue_size + s.workers for s in stages)
+    results = PipelinedExecutor(stages).run(range(100))
+    consumer = threading.Thread(target=lambda: list(results), daemon=True)
+    consumer.start()
+    time.sleep(0.5)
+    assert 0 < len(finished) <= window
+    release.set()
+    consumer.join(5)
+    assert sorted(finished) == list(range(100))
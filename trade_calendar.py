@@ -0,0 +1,284 @@
+"""
+A股交易日历索引
+
+以上证指数的日线日期作为交易日来源，预先计算成紧凑的索引：
+- days: 升序的交易日(自1970-01-01起的天数，int32)
+- _rank: 从第一个交易日起逐日的累计交易日数量，"是否交易日"、"两日期之间的交易日数"、
+  "前第n个交易日" 都只需一次数组下标访问，均为O(1)，并支持对日期数组整体查询
+- 超出已知范围的日期按工作日(周一至周五)估算，只可能多算不会少算，适合用于确定请求条数
+
+索引保存在 .cache/trade_calendar.npz，过期时只按缺少的交易日数量增量获取。
+
+用法:
+    python trade_calendar.py check            # 今天是否交易日，输出 true/false
+    python trade_calendar.py show --count 10  # 最近的交易日
+"""
+import argparse
+import datetime
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import Ashare as as_api
+
+CALENDAR_INDEX = 'sh000001'
+CALENDAR_PATH = '.cache/trade_calendar.npz'
+CALENDAR_BARS = 3000            # 首次构建时获取的日线数量(约12年)
+MARKET_TZ = pytz.timezone('Asia/Shanghai')
+MARKET_CLOSE = 15 * 60          # 收盘时间(分钟)，此后当日K线已完整
+
+
+def _to_days(value) -> np.ndarray:
+    """日期(字符串/date/datetime/Timestamp/DatetimeIndex或其数组)转换为自1970-01-01起的天数"""
+    if isinstance(value, pd.DatetimeIndex):
+        value = value.tz_localize(None) if value.tz is not None else value
+        return value.values.astype('datetime64[D]').astype(np.int64)
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        value = value.date()
+    return np.asarray(value, dtype='datetime64[D]').astype(np.int64)
+
+
+def _to_dates(days):
+    """天数转换回日期，标量返回 datetime.date，数组返回 DatetimeIndex"""
+    days = np.asarray(days, dtype=np.int64)
+    if days.ndim == 0:
+        return days.astype('datetime64[D]').item()
+    return pd.DatetimeIndex(days.astype('datetime64[D]'))
+
+
+def _scalar(result):
+    return result.item() if isinstance(result, np.ndarray) and result.ndim == 0 else result
+
+
+def market_today(now: Optional[datetime.datetime] = None) -> Tuple[datetime.date, bool]:
+    """当前的北京时间日期，以及当日K线是否已完整(已收盘)"""
+    now = now or datetime.datetime.now(MARKET_TZ)
+    return now.date(), now.hour * 60 + now.minute >= MARKET_CLOSE
+
+
+class TradingCalendar:
+    """
+    交易日历索引
+
+    Args:
+        days: 交易日列表(任意 _to_days 支持的格式)
+        known_until: 日历确认完整的最后一天，默认为最后一个交易日；
+            两者之间的日期确定为非交易日，之后的日期按工作日估算
+    """
+
+    def __init__(self, days, known_until=None):
+        days = np.unique(_to_days(days))
+        if len(days) == 0:
+            raise ValueError("交易日历不能为空")
+        self.days = days.astype(np.int32)
+        self.start = int(days[0])
+        self.end = max(int(days[-1]), int(_to_days(known_until)) if known_until is not None else 0)
+        is_open = np.zeros(self.end - self.start + 1, dtype=bool)
+        is_open[days - self.start] = True
+        self._open = is_open
+        self._rank = np.cumsum(is_open, dtype=np.int32)     # 截至当天(含)的交易日数量
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __repr__(self) -> str:
+        return f"TradingCalendar({len(self)} sessions, {_to_dates(self.start)} ~ {_to_dates(self.end)})"
+
+    def _rank_of(self, d: np.ndarray) -> np.ndarray:
+        """截至d(含)的交易日数量，已知范围之外按工作日外推(范围之前为负数)"""
+        inside = self._rank[np.clip(d - self.start, 0, len(self._rank) - 1)].astype(np.int64)
+        if (d > self.end).any():
+            after = np.busday_count(np.datetime64(self.end + 1, 'D'), (d + 1).astype('datetime64[D]'))
+            inside = np.where(d > self.end, len(self.days) + np.maximum(after, 0), inside)
+        if (d < self.start).any():
+            before = np.busday_count((d + 1).astype('datetime64[D]'), np.datetime64(self.start, 'D'))
+            inside = np.where(d < self.start, -np.maximum(before, 0), inside)
+        return inside
+
+    def is_trading_day(self, date):
+        """是否交易日，支持日期数组"""
+        d = _to_days(date)
+        known = (d >= self.start) & (d <= self.end)
+        result = np.where(known, self._open[np.clip(d - self.start, 0, len(self._open) - 1)],
+                          np.is_busday(d.astype('datetime64[D]')))
+        return _scalar(result)
+
+    def sessions_between(self, start, end):
+        """(start, end] 区间内的交易日数量"""
+        return _scalar(self._rank_of(_to_days(end)) - self._rank_of(_to_days(start)))
+
+    def session_offset(self, date, n: int = 0):
+        """
+        date当天或之前最近的交易日再往前数n个交易日
+
+        Args:
+            date: 日期
+            n (int): 往前的交易日数量，0为date当天或之前最近的交易日
+
+        Returns:
+            datetime.date: 交易日，超出已知范围时按工作日估算
+        """
+        d = int(_to_days(date))
+        idx = int(self._rank_of(np.asarray(d))) - 1 - n
+        if 0 <= idx < len(self.days) and d >= self.start:
+            return _to_dates(self.days[idx])
+        return np.busday_offset(np.datetime64(d, 'D'), -n, roll='backward').item()
+
+    def last_session(self, date):
+        """date当天或之前最近的交易日"""
+        return self.session_offset(date, 0)
+
+    def previous_session(self, date, n: int = 1):
+        """date之前(不含当天)的第n个交易日"""
+        return self.session_offset(int(_to_days(date)) - 1, n - 1)
+
+    def sessions(self, start=None, end=None) -> pd.DatetimeIndex:
+        """[start, end] 区间内的已知交易日"""
+        lo = 0 if start is None else int(np.searchsorted(self.days, int(_to_days(start))))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, int(_to_days(end)), side='right'))
+        return _to_dates(self.days[lo:hi])
+
+    def positions(self, dates) -> np.ndarray:
+        """日期在 days 中的位置(各日期当天或之前最近的交易日)，早于日历的日期为-1"""
+        d = _to_days(dates)
+        return np.where(d < self.start, -1, self._rank_of(d) - 1)
+
+    def panel(self, frames: Dict[str, pd.DataFrame], field: str = 'close', start=None,
+              end=None) -> pd.DataFrame:
+        """
+        把多只股票的同一字段对齐到交易日网格上，不经过 reindex/join
+
+        每个日期直接换算为交易日序号写入预先分配的矩阵，停牌日为NaN
+
+        Args:
+            frames (Dict[str, pd.DataFrame]): {股票代码: 日期索引的K线数据}
+            field (str): 取值的列
+            start: 起始日期，默认为各数据中最早的日期
+            end: 结束日期，默认为各数据中最晚的日期
+
+        Returns:
+            pd.DataFrame: 行为交易日、列为股票代码
+        """
+        codes = list(frames)
+        used = [j for j, code in enumerate(codes) if len(frames[code])]
+        # 所有股票的日期和取值拼接后一次性换算位置并写入矩阵
+        d = np.concatenate([_to_days(frames[codes[j]].index) for j in used] or [np.zeros(0, np.int64)])
+        values = np.concatenate([np.asarray(frames[codes[j]].to_numpy()[:, frames[codes[j]].columns.get_loc(field)],
+                                            dtype=np.float64) for j in used] or [np.zeros(0)])
+        column = np.repeat(np.asarray(used, dtype=np.int64), [len(frames[codes[j]]) for j in used])
+        start = int(_to_days(start)) if start is not None else int(d.min()) if len(d) else self.start
+        end = int(_to_days(end)) if end is not None else int(d.max()) if len(d) else self.end
+        lo = int(np.searchsorted(self.days, start))
+        hi = int(np.searchsorted(self.days, end, side='right'))
+        matrix = np.full((max(hi - lo, 0), len(codes)), np.nan)
+        pos = self.positions(d) - lo
+        ok = (pos >= 0) & (pos < len(matrix)) & self._open_at(d)
+        matrix[pos[ok], column[ok]] = values[ok]
+        return pd.DataFrame(matrix, index=_to_dates(self.days[lo:hi]), columns=codes)
+
+    def _open_at(self, d: np.ndarray) -> np.ndarray:
+        known = (d >= self.start) & (d <= self.end)
+        return known & self._open[np.clip(d - self.start, 0, len(self._open) - 1)]
+
+    def save(self, path: str = CALENDAR_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, days=self.days, end=np.int32(self.end))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = CALENDAR_PATH) -> 'TradingCalendar':
+        with np.load(path) as data:
+            return cls(data['days'].astype('datetime64[D]'), known_until=np.datetime64(int(data['end']), 'D'))
+
+    @classmethod
+    def weekdays(cls, start, end) -> 'TradingCalendar':
+        """仅按工作日构建的近似日历(无法获取行情时使用)，不含节假日信息"""
+        days = np.arange(int(_to_days(start)), int(_to_days(end)) + 1)
+        return cls(days[np.is_busday(days.astype('datetime64[D]'))].astype('datetime64[D]'))
+
+
+def fetch_sessions(count: int, now: Optional[datetime.datetime] = None) -> Tuple[np.ndarray, datetime.date]:
+    """
+    获取最近count个交易日
+
+    Returns:
+        Tuple[np.ndarray, datetime.date]: (交易日, 确认完整的最后一天)，
+        收盘前当天是否开市尚不确定，确认日期取前一天
+    """
+    today, closed = market_today(now)
+    df = as_api.get_price(CALENDAR_INDEX, count=count, frequency='1d')
+    days = _to_days(df.index)
+    known = today if closed else today - datetime.timedelta(days=1)
+    return days[days <= int(_to_days(known))], known
+
+
+def load_calendar(path: str = CALENDAR_PATH, refresh: bool = False,
+                  now: Optional[datetime.datetime] = None) -> TradingCalendar:
+    """
+    读取交易日历，过期时增量更新并写回缓存
+
+    请求条数按缓存末尾到今天的工作日数量精确确定；获取失败时沿用缓存，
+    没有缓存时退化为工作日近似日历
+
+    Args:
+        path (str): 缓存路径
+        refresh (bool): 忽略缓存重新构建
+        now (datetime): 当前时间，默认为北京时间
+
+    Returns:
+        TradingCalendar: 交易日历
+    """
+    today, closed = market_today(now)
+    known = today if closed else today - datetime.timedelta(days=1)
+    cal = None
+    if not refresh and os.path.exists(path):
+        try:
+            cal = TradingCalendar.load(path)
+        except Exception as e:
+            print(f"读取交易日历缓存失败: {str(e)}")
+    if cal is not None and cal.end >= int(_to_days(known)):
+        return cal
+
+    count = CALENDAR_BARS if cal is None else int(cal.sessions_between(_to_dates(cal.end), known)) + 1
+    try:
+        days, known = fetch_sessions(count, now)
+        if cal is not None:
+            days = np.concatenate((cal.days.astype(np.int64), days))
+        cal = TradingCalendar(days.astype('datetime64[D]'), known_until=known)
+        cal.save(path)
+        print(f"交易日历已更新: {cal}")
+    except Exception as e:
+        print(f"获取交易日历失败: {str(e)}")
+        if cal is None:
+            cal = TradingCalendar.weekdays(today - datetime.timedelta(days=365 * 3), known)
+            print("使用仅按工作日估算的交易日历")
+    return cal
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='A股交易日历')
+    parser.add_argument('command', choices=['check', 'show'])
+    parser.add_argument('--date', help='查询的日期，默认为今天(北京时间)')
+    parser.add_argument('--count', type=int, default=10, help='show 显示的交易日数量')
+    args = parser.parse_args()
+
+    date = args.date or market_today()[0]
+    if args.command == 'check':
+        # 获取失败时保守地按交易日处理，避免误跳过构建
+        try:
+            days, known = fetch_sessions(10)
+            trading = TradingCalendar(days.astype('datetime64[D]'), known_until=known).is_trading_day(date)
+        except Exception as e:
+            print(f"获取交易日历失败: {str(e)}", file=sys.stderr)
+            trading = True
+        print('true' if trading else 'false')
+    else:
+        cal = load_calendar()
+        print(cal)
+        for day in cal.sessions(end=date)[-args.count:]:
+            print(day.strftime('%Y-%m-%d'))
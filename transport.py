@@ -0,0 +1,227 @@
+"""
+Ashare 数据源的可插拔传输层
+
+- LiveTransport: 直连行情接口，复用HTTP连接
+- RecordTransport: 透传请求并按URL录制原始响应，保存为本地压缩归档
+- ReplayTransport: 从归档回放响应，零网络延迟，用于离线/确定性运行
+- StandInServer: 本地HTTP替身服务器，以HTTP代理方式提供归档内容，
+  设置 HTTP_PROXY 后完整的 run_analysis 流程可在不访问外网的情况下压测
+
+用法:
+    python transport.py record quotes.zip -- python main.py
+    python transport.py serve quotes.zip --port 8765 --latency 0.05
+    ASHARE_REPLAY=quotes.zip python main.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import requests
+
+import Ashare as as_api
+
+INDEX_NAME = 'index.json'
+
+
+class ReplayMissError(KeyError):
+    """回放归档中不存在请求的URL时抛出的异常"""
+    pass
+
+
+def _entry_name(url: str) -> str:
+    """URL在归档中的条目名"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.bin'
+
+
+def load_archive(path: str) -> Dict[str, bytes]:
+    """
+    读取录制归档
+
+    Args:
+        path (str): 归档文件路径
+
+    Returns:
+        Dict[str, bytes]: URL到原始响应字节的映射
+    """
+    with zipfile.ZipFile(path, 'r') as zf:
+        index = json.loads(zf.read(INDEX_NAME))
+        return {url: zf.read(name) for url, name in index.items()}
+
+
+def save_archive(path: str, responses: Dict[str, bytes]) -> None:
+    """
+    将响应写入压缩归档，已有归档中的条目会被保留并合并
+
+    Args:
+        path (str): 归档文件路径
+        responses (Dict[str, bytes]): URL到原始响应字节的映射
+    """
+    merged = load_archive(path) if os.path.exists(path) else {}
+    merged.update(responses)
+    tmp_path = path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        index = {}
+        for url, body in merged.items():
+            index[url] = _entry_name(url)
+            zf.writestr(index[url], body)
+        zf.writestr(INDEX_NAME, json.dumps(index, ensure_ascii=False, indent=1))
+    os.replace(tmp_path, path)
+
+
+class LiveTransport:
+    """直连行情接口，使用 requests.Session 复用连接"""
+
+    def __init__(self, timeout: float = 10):
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def get(self, url: str) -> bytes:
+        return self.session.get(url, timeout=self.timeout).content
+
+
+class RecordTransport:
+    """透传请求到下层传输并录制原始响应"""
+
+    def __init__(self, path: str, inner=None):
+        """
+        Args:
+            path (str): 录制归档的保存路径
+            inner: 下层传输，默认为 LiveTransport
+        """
+        self.path = path
+        self.inner = inner or LiveTransport()
+        self.responses: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> bytes:
+        body = self.inner.get(url)
+        with self._lock:
+            self.responses[url] = body
+        return body
+
+    def save(self) -> None:
+        with self._lock:
+            save_archive(self.path, self.responses)
+        print(f"已录制 {len(self.responses)} 条响应到: {self.path}")
+
+
+class ReplayTransport:
+    """从本地归档回放响应，不发起任何网络请求"""
+
+    def __init__(self, path: str, latency: float = 0.0):
+        """
+        Args:
+            path (str): 录制归档路径
+            latency (float): 每次请求模拟的延迟(秒)，默认0
+        """
+        self.responses = load_archive(path)
+        self.latency = latency
+
+    def get(self, url: str) -> bytes:
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return self.responses[url]
+        except KeyError:
+            raise ReplayMissError(f"回放归档中没有该URL的响应: {url}") from None
+
+
+def install_from_env() -> Optional[object]:
+    """
+    根据环境变量安装传输层
+
+    ASHARE_REPLAY=<归档路径> 回放模式；ASHARE_RECORD=<归档路径> 录制模式，进程退出时保存
+
+    Returns:
+        Optional[object]: 已安装的传输层，未配置时返回None
+    """
+    import atexit
+
+    replay_path = os.environ.get('ASHARE_REPLAY')
+    record_path = os.environ.get('ASHARE_RECORD')
+    if replay_path:
+        transport = ReplayTransport(replay_path)
+        print(f"行情数据回放模式: {replay_path} ({len(transport.responses)} 条响应)")
+    elif record_path:
+        transport = RecordTransport(record_path)
+        atexit.register(transport.save)
+        print(f"行情数据录制模式: {record_path}")
+    else:
+        return None
+    as_api.set_transport(transport)
+    return transport
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    本地HTTP替身服务器
+
+    以HTTP代理的形式工作：客户端设置 HTTP_PROXY=http://127.0.0.1:<port> 后，
+    请求行中携带完整URL，服务器据此在归档中查找响应。
+    """
+    daemon_threads = True
+
+    def __init__(self, archive_path: str, port: int = 8765, latency: float = 0.0):
+        self.responses = load_archive(archive_path)
+        self.latency = latency
+        super().__init__(('127.0.0.1', port), _StandInHandler)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server: StandInServer = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        body = server.responses.get(self.path)
+        if body is None:
+            self.send_response(404)
+            body = b'not recorded'
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ashare 数据源录制/回放工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='在录制模式下运行命令，例如: record quotes.zip -- python main.py')
+    rec.add_argument('archive')
+    rec.add_argument('cmd', nargs=argparse.REMAINDER)
+
+    serve = sub.add_parser('serve', help='启动本地替身服务器')
+    serve.add_argument('archive')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--latency', type=float, default=0.0, help='每个请求模拟的延迟(秒)')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        # 只去掉分隔用的第一个 --，被包装命令自己的参数原样传递
+        cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        env = dict(os.environ, ASHARE_RECORD=os.path.abspath(args.archive))
+        sys.exit(subprocess.call(cmd, env=env))
+
+    server = StandInServer(args.archive, port=args.port, latency=args.latency)
+    print(f"替身服务器已启动: http://127.0.0.1:{args.port} ({len(server.responses)} 条响应)")
+    print(f"使用方式: HTTP_PROXY=http://127.0.0.1:{args.port} python main.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
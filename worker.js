@@ -1,22 +1,108 @@
+// 报告由定时任务在工作日 UTC 08:00(北京时间16:00)重新生成，缓存有效期截至下一次构建完成
+const BUILD_HOUR_UTC = 8;
+const BUILD_GRACE_MINUTES = 30; // 预留的构建与部署时间
+
+// 按优先级排列的预压缩编码，文件名见 report-manifest.json
+const ENCODINGS = ["br", "gzip"];
+
+const SECURITY_HEADERS = {
+  "X-Content-Type-Options": "nosniff",
+  "X-Frame-Options": "DENY",
+  "Content-Security-Policy": "default-src 'self' 'unsafe-inline'"
+};
+
+// 清单随部署版本固定，同一实例内成功读取一次后复用
+let manifestPromise = null;
+
+function loadManifest(env, origin) {
+  if (!manifestPromise) {
+    const pending = env.ASSETS.fetch(new Request(new URL("/report-manifest.json", origin)))
+      .then(res => (res.ok ? res.json() : null))
+      .catch(() => null)
+      .then(manifest => {
+        // 读取失败(包括暂时性错误)不缓存，下一个请求重新读取，避免整个实例一直无压缩、无ETag
+        if (!manifest && manifestPromise === pending) manifestPromise = null;
+        return manifest;
+      });
+    manifestPromise = pending;
+  }
+  return manifestPromise;
+}
+
+// 距下一次构建完成的秒数，跳过周末
+function secondsUntilNextBuild(now) {
+  const next = new Date(now);
+  next.setUTCHours(BUILD_HOUR_UTC, BUILD_GRACE_MINUTES, 0, 0);
+  while (next <= now || next.getUTCDay() === 0 || next.getUTCDay() === 6) {
+    next.setUTCDate(next.getUTCDate() + 1);
+  }
+  return Math.max(60, Math.floor((next - now) / 1000));
+}
+
+// 按 Accept-Encoding 选择可用的预压缩版本，q=0 表示不接受
+function pickEncoding(acceptEncoding, files) {
+  const accepted = new Set();
+  for (const part of acceptEncoding.split(",")) {
+    const [name, ...params] = part.trim().toLowerCase().split(";");
+    const q = params.map(p => p.trim()).find(p => p.startsWith("q="));
+    if (name && !(q && parseFloat(q.slice(2)) === 0)) accepted.add(name);
+  }
+  return ENCODINGS.find(enc => files[enc] && (accepted.has(enc) || accepted.has("*"))) || "identity";
+}
+
+function etagMatches(ifNoneMatch, etag) {
+  if (!ifNoneMatch) return false;
+  return ifNoneMatch.split(",").map(t => t.trim().replace(/^W\//, "")).some(t => t === "*" || t === etag);
+}
+
+async function serveUncached(env, origin) {
+  const html = await env.ASSETS.fetch(new Request(new URL("/index.html", origin)));
+  return new Response(html.body, {
+    headers: { ...SECURITY_HEADERS, "content-type": "text/html;charset=UTF-8", "Cache-Control": "no-cache" }
+  });
+}
+
 export default {
   async fetch(request, env) {
     try {
       const url = new URL(request.url);
-      
-      // 所有路由都返回 index.html
-      const html = await env.ASSETS.fetch(new Request("index.html"));
-      return new Response(html.body, {
-        headers: { 
-          "content-type": "text/html;charset=UTF-8",
-          // 添加安全相关头部
-          "X-Content-Type-Options": "nosniff",
-          "X-Frame-Options": "DENY",
-          "Content-Security-Policy": "default-src 'self' 'unsafe-inline'"
-        },
+
+      // 所有路由都返回 index.html；没有清单(旧的构建产物)时按原方式返回
+      const manifest = await loadManifest(env, url.origin);
+      if (!manifest) {
+        return serveUncached(env, url.origin);
+      }
+
+      const encoding = pickEncoding(request.headers.get("Accept-Encoding") || "", manifest.files);
+      const etag = `"${manifest.etag}${encoding === "identity" ? "" : "-" + encoding}"`;
+      const headers = {
+        ...SECURITY_HEADERS,
+        "content-type": "text/html;charset=UTF-8",
+        "ETag": etag,
+        "Cache-Control": `public, max-age=${secondsUntilNextBuild(new Date())}, must-revalidate`,
+        "Vary": "Accept-Encoding"
+      };
+
+      // 内容未变化时只返回304，不读取报告文件
+      if (etagMatches(request.headers.get("If-None-Match"), etag)) {
+        return new Response(null, { status: 304, headers });
+      }
+
+      const asset = await env.ASSETS.fetch(new Request(new URL("/" + manifest.files[encoding], url.origin)));
+      if (!asset.ok) {
+        return serveUncached(env, url.origin);
+      }
+      if (encoding !== "identity") {
+        headers["Content-Encoding"] = encoding;
+      }
+      // 预压缩的内容原样返回，不由运行时再次压缩
+      return new Response(request.method === "HEAD" ? null : asset.body, {
+        headers,
+        encodeBody: encoding === "identity" ? "automatic" : "manual"
       });
-      
+
     } catch (err) {
-      return new Response("Internal Server Error", { 
+      return new Response("Internal Server Error", {
         status: 500,
         headers: { "content-type": "text/plain;charset=UTF-8" }
       });